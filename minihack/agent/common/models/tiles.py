@@ -0,0 +1,78 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import torch
+from torch import nn
+
+from minihack.tiles.glyph_mapper import GLYPH2TILE, TILE_SIZE, get_tile_atlas
+
+
+class TileRenderer(nn.Module):
+    """Renders glyphs into pixels on the learner, as the pixel observations
+    of MiniHack are rendered in the environments.
+
+    Actors can then send the glyphs of the observations, which are much
+    smaller than their images, and pixel-based models render them in their
+    forward pass, e.g. ``renderer(crop(glyphs, coordinates))`` for the crops
+    made by ``Crop``. The tile atlas is held as a buffer, so that rendering
+    happens on the model's device. It is not saved in the state dict.
+
+    Args:
+        tile_size (int):
+            The size of the tiles in pixels, which must divide 16.
+        gray (bool):
+            Whether to render grayscale images, with a single channel.
+        channels_first (bool):
+            Whether to return images of shape [... x C x H' x W'], as
+            expected by convolutions, rather than [... x H' x W' x C] like
+            the pixel observations.
+    """
+
+    def __init__(self, tile_size=TILE_SIZE, gray=False, channels_first=True):
+        super(TileRenderer, self).__init__()
+        self.tile_size = tile_size
+        self.channels_first = channels_first
+
+        atlas = torch.from_numpy(get_tile_atlas(tile_size, gray).copy())
+        glyph2tile = torch.from_numpy(GLYPH2TILE.astype("int64"))
+        self.register_buffer("atlas", atlas, persistent=False)
+        self.register_buffer("glyph2tile", glyph2tile, persistent=False)
+        self.channels = atlas.shape[-1]
+
+    def forward(self, glyphs):
+        """Renders glyphs into images.
+
+        Args:
+           glyphs [... x H x W] glyph ids, e.g. [T x B x H x W]
+
+        Returns:
+           [... x C x H' x W'] (or [... x H' x W' x C]) uint8 images, where
+           H' and W' are H and W times the tile size.
+        """
+        *batch, h, w = glyphs.shape
+        s, c = self.tile_size, self.channels
+
+        # -- [... x H x W x s x s x C]
+        tiles = self.atlas[self.glyph2tile[glyphs.long()]]
+
+        n = len(batch)
+        if self.channels_first:
+            # -- [... x C x H x s x W x s]
+            dims = (n + 4, n, n + 2, n + 1, n + 3)
+            shape = (*batch, c, h * s, w * s)
+        else:
+            # -- [... x H x s x W x s x C]
+            dims = (n, n + 2, n + 1, n + 3, n + 4)
+            shape = (*batch, h * s, w * s, c)
+        return tiles.permute(*range(n), *dims).reshape(shape)
@@ -0,0 +1,110 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+
+import os
+import shutil
+import tempfile
+from typing import IO, Callable
+
+
+class AtomicFile:
+    """A temporary file which atomically replaces a file once committed, so
+    that concurrent readers never see a partially written file.
+
+    The temporary file is created next to the replaced file, so that both
+    are on the same file system. It is given the permissions ``mode`` when
+    committed, as temporary files are only accessible by their owner.
+
+    Used as a context manager, the file is committed when the block exits
+    normally, and discarded if it raises.
+
+    Args:
+        path (str):
+            The path of the file to replace.
+        suffix (str):
+            The suffix of the temporary file. Defaults to ".tmp".
+        mode (int):
+            The permissions of the file. Defaults to 0o644.
+    """
+
+    def __init__(self, path: str, suffix: str = ".tmp", mode: int = 0o644):
+        self.path = path
+        self.mode = mode
+        fd, self.tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), suffix=suffix
+        )
+        os.close(fd)
+
+    def commit(self) -> None:
+        """Replaces the file with the temporary file."""
+        try:
+            os.chmod(self.tmp_path, self.mode)
+            os.replace(self.tmp_path, self.path)
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self) -> None:
+        """Removes the temporary file."""
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "AtomicFile":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+
+def atomic_write(
+    path: str,
+    write_fn: Callable[[IO], None],
+    mode: int = 0o644,
+    binary: bool = True,
+) -> None:
+    """Writes a file which is atomically replaced.
+
+    Args:
+        path (str):
+            The path of the file.
+        write_fn (Callable[[IO], None]):
+            A function writing the contents to the given file object.
+        mode (int):
+            The permissions of the file. Defaults to 0o644.
+        binary (bool):
+            Whether the file is opened in binary mode rather than text mode.
+            Defaults to True.
+    """
+    with AtomicFile(path, mode=mode) as atomic_file:
+        with open(atomic_file.tmp_path, "wb" if binary else "w") as f:
+            write_fn(f)
+
+
+def atomic_link(src: str, dest: str) -> None:
+    """Places the file ``src`` at ``dest``, which is atomically replaced.
+
+    The file is hard-linked when possible and copied otherwise, e.g. across
+    file systems. Raises ``FileNotFoundError`` if ``src`` doesn't exist.
+    """
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    try:
+        try:
+            os.link(src, tmp)
+        except FileExistsError:
+            os.remove(tmp)
+            os.link(src, tmp)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
@@ -1,26 +1,36 @@
 # Copyright (c) Facebook, Inc. and its affiliates.
 
+import hashlib
 import os
 import subprocess
 import random
 import gymnasium as gym
 import numpy as np
 import pkg_resources
+from functools import lru_cache, partial
 from typing import Tuple
 
+import nle
 from nle import _pynethack, nethack
 from nle.nethack.nethack import SCREEN_DESCRIPTIONS_SHAPE, OBSERVATION_DESC
 from nle.env.base import FULL_ACTIONS, NLE_SPACE_ITEMS
 from nle.env.tasks import NetHackStaircase
 from minihack.wiki import NetHackWiki
 from minihack.tiles import GlyphMapper
+from minihack.tiles.glyph_mapper import get_tile_atlas
+from minihack.crop import ObservationCropper
+from minihack.dlb import DlbArchive
+from minihack.level_bank import LevelBank
+from minihack.level_prefetch import LevelPrefetcher
+from minihack.screen_index import ScreenDescriptionIndex
+from minihack.nhdat_cache import (
+    NhdatCache,
+    NHDAT_CACHE_DIR_ENV,
+    DEFAULT_NHDAT_CACHE_SIZE,
+)
 
 PATH_DAT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "dat")
 LIB_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "lib")
-PATCH_SCRIPT = os.path.join(
-    pkg_resources.resource_filename("minihack", "scripts"),
-    "mh_patch_nhdat.sh",
-)
 MH_FULL_ACTIONS = list(FULL_ACTIONS)
 try:
     MH_FULL_ACTIONS.remove(nethack.MiscDirection.UP)
@@ -39,9 +49,12 @@ try:
 except AttributeError:
     NLE_EXTRA_V081_ACTIONS = ()
 HACKDIR = pkg_resources.resource_filename("nle", "nethackdir")
+LEV_COMP = os.path.join(HACKDIR, "lev_comp")
 
 RGB_MAX_VAL = 255
 N_TILE_PIXEL = 16
+# The sizes of the tiles of the downsampled pixel observations, e.g. pixel_8
+PIXEL_TILE_SIZES = (1, 2, 4, 8)
 
 MH_NETHACKOPTIONS = (
     "color",  # Display color for different monsters, objects, etc
@@ -58,6 +71,59 @@ MH_NETHACKOPTIONS = (
 # Autopickup on by default (all items)
 # Manually adding "!autopickup" basen of env flag
 
+
+@lru_cache(maxsize=None)
+def _base_nhdat():
+    """Returns the nhdat archive of the files in ``LIB_DIR``, to which the
+    compiled levels of every environment are added."""
+    return DlbArchive.from_dir(LIB_DIR)
+
+
+@lru_cache(maxsize=None)
+def _nhdat_cache_salt():
+    """Returns a string identifying everything other than the des-file that
+    determines the content of a compiled nhdat archive."""
+    digest = hashlib.sha256(_base_nhdat().tobytes())
+    version = getattr(nle, "__version__", "unknown")
+    return f"nle-{version}:{HACKDIR}:{digest.hexdigest()}"
+
+
+def compile_des_file(des_path, nhdat_path, work_dir):
+    """Compiles a description file into an nhdat archive with ``lev_comp``.
+
+    Args:
+        des_path (str):
+            The path of the description file.
+        nhdat_path (str):
+            The path the nhdat archive is written to.
+        work_dir (str):
+            The directory used for compiling the description file.
+
+    Returns:
+        bool: Whether the archive was built successfully.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    # lev_comp writes the compiled levels to its working directory
+    for fn in os.listdir(work_dir):
+        if fn.endswith(".lev"):
+            os.remove(os.path.join(work_dir, fn))
+    try:
+        returncode = subprocess.call([LEV_COMP, des_path], cwd=work_dir)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Couldn't patch the nhdat file.\n{e}") from e
+    if returncode != 0:
+        return False
+
+    levels = {}
+    for fn in sorted(os.listdir(work_dir)):
+        if fn.endswith(".lev"):
+            with open(os.path.join(work_dir, fn), "rb") as f:
+                levels[fn] = f.read()
+    # Only the level entries differ from the base archive
+    _base_nhdat().replace(levels).write(nhdat_path)
+    return True
+
+
 MINIHACK_SPACE_FUNCS = {
     "glyphs_crop": lambda x, y: gym.spaces.Box(
         low=0,
@@ -101,13 +167,37 @@ MINIHACK_SPACE_FUNCS = {
         shape=(x, y, _pynethack.nethack.NLE_SCREEN_DESCRIPTION_LENGTH),
         dtype=OBSERVATION_DESC["screen_descriptions"]["dtype"],
     ),
-    "pixel_crop": lambda x, y: gym.spaces.Box(
+}
+
+
+def _pixel_space(x, y, tile_size=N_TILE_PIXEL, gray=False):
+    return gym.spaces.Box(
         low=0,
         high=RGB_MAX_VAL,
-        shape=(x * N_TILE_PIXEL, y * N_TILE_PIXEL, 3),
+        shape=(x * tile_size, y * tile_size, 1 if gray else 3),
         dtype=np.uint8,
-    ),
-}
+    )
+
+
+# Maps the pixel observation keys to whether they are cropped, the size of
+# their tiles and whether they are grayscale, e.g. pixel_crop_4_gray
+PIXEL_OBS_MODES = {}
+for _crop in (False, True):
+    for _tile_size in (N_TILE_PIXEL,) + PIXEL_TILE_SIZES:
+        for _gray in (False, True):
+            _key = "pixel"
+            if _crop:
+                _key += "_crop"
+            if _tile_size != N_TILE_PIXEL:
+                _key += f"_{_tile_size}"
+            if _gray:
+                _key += "_gray"
+            PIXEL_OBS_MODES[_key] = (_crop, _tile_size, _gray)
+            if _crop:
+                MINIHACK_SPACE_FUNCS[_key] = partial(
+                    _pixel_space, tile_size=_tile_size, gray=_gray
+                )
+del _crop, _tile_size, _gray, _key
 
 MH_DEFAULT_OBS_KEYS = [
     "glyphs",
@@ -152,6 +242,11 @@ class MiniHack(NetHackStaircase):
         seeds=None,
         include_see_actions=True,
         include_alignment_blstats=True,
+        nhdat_cache_dir=None,
+        nhdat_cache_size=DEFAULT_NHDAT_CACHE_SIZE,
+        prefetch_levels=0,
+        prefetch_workers=1,
+        level_bank=None,
         **kwargs,
     ):
         """Constructs a new MiniHack environment.
@@ -247,6 +342,35 @@ class MiniHack(NetHackStaircase):
                 If True, the agent's observation space includes the alignment
                 information in the blstats. This is introduced in `NLE` 0.9.0
                 release. Defaults to True.
+            nhdat_cache_dir (str or None):
+                The directory of an on-disk cache of compiled nhdat archives,
+                which can be shared between processes. When the same
+                description file is compiled again, the cached archive is used
+                instead. If None, the ``MINIHACK_NHDAT_CACHE_DIR`` environment
+                variable is used, and if that is not set either, no cache is
+                used. Defaults to None.
+            nhdat_cache_size (int):
+                The maximum total size in bytes of the nhdat cache. The least
+                recently used archives are evicted when the cache grows larger.
+                Defaults to 512 MiB.
+            prefetch_levels (int):
+                The number of levels that procedurally generated environments
+                generate and compile in background threads ahead of time, so
+                that resetting only swaps in a ready level. Seeding the
+                environment discards the prefetched levels, so that levels
+                are generated with the seeded state, which also means that
+                prefetching is of no use when ``seeds`` are given. If 0,
+                levels are generated when resetting. Defaults to 0.
+            prefetch_workers (int):
+                The number of background threads used for level prefetching.
+                Defaults to 1.
+            level_bank (str, LevelBank or None):
+                A bank of levels baked ahead of time by
+                ``minihack.scripts.bake_levels``, or its directory. If given,
+                procedurally generated environments sample the compiled
+                levels of the bank when resetting, instead of generating and
+                compiling new ones, and prefetching is not used. Levels are
+                sampled with Python's ``random`` module. Defaults to None.
         """
         # NetHack options
         options: Tuple = MH_NETHACKOPTIONS
@@ -280,11 +404,19 @@ class MiniHack(NetHackStaircase):
         # MiniHack's observation keys are kept separate
         self._minihack_obs_keys = list(observation_keys)
         # Handle RGB pixel observations
-        if any("pixel" in key for key in self._minihack_obs_keys):
+        self._pixel_modes = {
+            key: PIXEL_OBS_MODES[key]
+            for key in self._minihack_obs_keys
+            if key in PIXEL_OBS_MODES
+        }
+        if self._pixel_modes:
             self._glyph_mapper = GlyphMapper()
+            # Downsample the tile atlases of the observations upfront
+            for _, tile_size, gray in self._pixel_modes.values():
+                get_tile_atlas(tile_size, gray)
             # Make sure glyphs_crop is there
             if (
-                "pixel_crop" in self._minihack_obs_keys
+                any(crop for crop, _, _ in self._pixel_modes.values())
                 and "glyphs_crop" not in self._minihack_obs_keys
             ):
                 self._minihack_obs_keys.append("glyphs_crop")
@@ -299,10 +431,33 @@ class MiniHack(NetHackStaircase):
 
         self._level_seeds = seeds
 
+        if nhdat_cache_dir is None:
+            nhdat_cache_dir = os.environ.get(NHDAT_CACHE_DIR_ENV)
+        if nhdat_cache_dir:
+            self._nhdat_cache = NhdatCache(
+                nhdat_cache_dir,
+                max_size=nhdat_cache_size,
+                salt=_nhdat_cache_salt(),
+            )
+        else:
+            self._nhdat_cache = None
+
+        self._prefetch_levels = prefetch_levels
+        self._prefetch_workers = prefetch_workers
+        self._level_prefetcher = None
+
+        if level_bank is not None and not isinstance(level_bank, LevelBank):
+            level_bank = LevelBank(level_bank, salt=_nhdat_cache_salt())
+        self._level_bank = level_bank
+
         super().__init__(*args, **kwargs)
 
-        # Patch the nhdat library by compling the given .des file
-        self.update(des_file)
+        if self._level_bank is not None:
+            # The levels of the bank are already compiled
+            self._use_bank_level()
+        else:
+            # Patch the nhdat library by compling the given .des file
+            self.update(des_file)
 
         self.obs_crop_h = obs_crop_h
         self.obs_crop_w = obs_crop_w
@@ -310,6 +465,9 @@ class MiniHack(NetHackStaircase):
 
         assert self.obs_crop_h % 2 == 1
         assert self.obs_crop_w % 2 == 1
+        self._cropper = ObservationCropper(
+            self.obs_crop_h, self.obs_crop_w, self.obs_crop_pad
+        )
 
         self.reward_win = reward_win
         self.reward_lose = reward_lose
@@ -323,6 +481,12 @@ class MiniHack(NetHackStaircase):
 
         self._previous_obs = None
         self._previous_action = None
+        # The keys of the previous observation used by the reward manager
+        self._previous_obs_keys = None
+        self._snapshot_buffers = ({}, {})
+        self._snapshot_index = 0
+
+        self._screen_index = None
 
         self.use_wiki = use_wiki
         if self.use_wiki:
@@ -348,31 +512,29 @@ class MiniHack(NetHackStaircase):
                 obs_space_dict[key] = space_func(
                     self.obs_crop_h, self.obs_crop_w
                 )
+            elif key in PIXEL_OBS_MODES:
+                _, tile_size, gray = PIXEL_OBS_MODES[key]
+                obs_space_dict[key] = _pixel_space(
+                    *OBSERVATION_DESC["glyphs"]["shape"],
+                    tile_size=tile_size,
+                    gray=gray,
+                )
             else:
-                if "pixel" in self._minihack_obs_keys:
-                    d_shape = OBSERVATION_DESC["glyphs"]["shape"]
-                    shape = (
-                        d_shape[0] * N_TILE_PIXEL,
-                        d_shape[1] * N_TILE_PIXEL,
-                        3,
-                    )
-                    obs_space_dict["pixel"] = gym.spaces.Box(
-                        low=0,
-                        high=RGB_MAX_VAL,
-                        shape=shape,
-                        dtype=np.uint8,
-                    )
-                else:
-                    raise ValueError(f"Observation key {key} is not supported")
+                raise ValueError(f"Observation key {key} is not supported")
 
         return obs_space_dict
 
     def reset(self, *args, sample_seed=True, **kwargs):
         if self.reward_manager is not None:
             self.reward_manager.reset()
+            self._previous_obs_keys = (
+                self.reward_manager.get_previous_observation_keys()
+            )
         if sample_seed and self._level_seeds is not None:
             seed = random.choice(self._level_seeds)
             self.seed(seed, seed, reseed=False)
+        if self._pixel_modes:
+            self._glyph_mapper.reset_incremental()
         return super().reset(*args, **kwargs)
 
     def _reward_fn(self, last_observation, action, observation, end_status):
@@ -392,12 +554,42 @@ class MiniHack(NetHackStaircase):
         return reward + self._get_time_penalty(last_observation, observation)
 
     def step(self, action: int):
-        self._previous_obs = tuple(a.copy() for a in self.last_observation)
+        if self.reward_manager is not None:
+            self._previous_obs = self._snapshot_observation(
+                self._previous_obs_keys
+            )
         self._previous_action = action
         # Within this call, _is_episode_end is called and then _reward_fn,
         # both using self.reward_manager
         return super().step(action)
 
+    def _snapshot_observation(self, keys):
+        """Returns a copy of the given keys of the last observation, with None
+        for all other keys.
+
+        The copies are made into two sets of arrays which are used in turn,
+        so that a snapshot stays valid until the next one but one is taken.
+
+        Args:
+            keys (set or None): The observation keys to copy, or None for all
+                of them.
+        Returns:
+            tuple: The snapshot, ordered like the observation.
+        """
+        self._snapshot_index = 1 - self._snapshot_index
+        buffers = self._snapshot_buffers[self._snapshot_index]
+        snapshot = []
+        for key, array in zip(self._observation_keys, self.last_observation):
+            if keys is not None and key not in keys:
+                snapshot.append(None)
+                continue
+            buffer = buffers.get(key)
+            if buffer is None or buffer.shape != array.shape:
+                buffer = buffers[key] = np.empty_like(array)
+            np.copyto(buffer, array)
+            snapshot.append(buffer)
+        return tuple(snapshot)
+
     def _is_episode_end(self, observation):
         if self.reward_manager is not None:
             # This also calculates reward, to be collected in _reward_fn by
@@ -419,9 +611,39 @@ class MiniHack(NetHackStaircase):
         """Patch the nhdat library. This includes compiling the given
         description file and replacing the new nhdat file in the temporary
         hackdir directory of the environment.
+
+        If an nhdat cache is used, a previously compiled archive of the same
+        description file is reused instead whenever possible.
         """
+        self._build_nhdat(
+            des_file,
+            os.path.join(self.nethack._vardir, "nhdat"),
+            os.path.join(self.nethack._vardir, "lev"),
+        )
+
+    def _build_nhdat(self, des_file, nhdat_path, work_dir):
+        """Build the nhdat library of the given description file.
+
+        Args:
+            des_file (str):
+                The description file, either as a string or as a path.
+            nhdat_path (str):
+                The path the nhdat archive is written to.
+            work_dir (str):
+                The directory used for compiling the description file.
+
+        Returns:
+            bool: Whether the archive was built successfully.
+        """
+        os.makedirs(work_dir, exist_ok=True)
+        cache_key = None
+
         if not des_file.endswith(".des"):
-            fpath = os.path.join(self.nethack._vardir, "mylevel.des")
+            if self._nhdat_cache is not None:
+                cache_key = self._nhdat_cache.key(des_file)
+                if self._nhdat_cache.fetch(cache_key, nhdat_path):
+                    return True
+            fpath = os.path.join(work_dir, "mylevel.des")
             # If the des-file is passed as a string
             with open(fpath, "w") as f:
                 f.writelines(des_file)
@@ -438,18 +660,96 @@ class MiniHack(NetHackStaircase):
                     des_path
                 )
             )
-        try:
-            _ = subprocess.call(
-                [
-                    PATCH_SCRIPT,
-                    self.nethack._vardir,
-                    HACKDIR,
-                    LIB_DIR,
-                    des_path,
-                ]
+        elif self._nhdat_cache is not None and cache_key is None:
+            with open(des_path, "r") as f:
+                cache_key = self._nhdat_cache.key(f.read())
+            if self._nhdat_cache.fetch(cache_key, nhdat_path):
+                return True
+
+        if not compile_des_file(des_path, nhdat_path, work_dir):
+            return False
+
+        if cache_key is not None:
+            self._nhdat_cache.store(cache_key, nhdat_path)
+        return True
+
+    def _generate_des(self):
+        """Returns the description file of a newly generated level.
+
+        Procedurally generated environments override this method and call
+        ``_update_generated_level`` when resetting.
+        """
+        raise NotImplementedError
+
+    def _update_generated_level(self):
+        """Replace the level of the environment with a newly generated one.
+
+        When level prefetching is enabled, the level is taken from the queue
+        of levels generated and compiled in the background instead. When a
+        level bank is used, the level is sampled from the bank.
+        """
+        if self._level_bank is not None:
+            self._use_bank_level()
+            return
+
+        if self._prefetch_levels <= 0:
+            self.update(self._generate_des())
+            return
+
+        if self._level_prefetcher is None:
+            # Started lazily, so that the environment is fully initialised
+            # and possibly already moved to the process it's used in
+            self._level_prefetcher = LevelPrefetcher(
+                self._generate_des,
+                self._build_nhdat,
+                os.path.join(self.nethack._vardir, "prefetch"),
+                size=self._prefetch_levels,
+                num_workers=self._prefetch_workers,
+            )
+        des_file, nhdat_path = self._level_prefetcher.get()
+        if nhdat_path is None:
+            self.update(des_file)
+        else:
+            os.replace(
+                nhdat_path, os.path.join(self.nethack._vardir, "nhdat")
             )
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"Couldn't patch the nhdat file.\n{e}") from e
+
+    def _use_bank_level(self):
+        """Replace the level of the environment with one sampled from the
+        level bank."""
+        index = self._level_bank.sample()
+        self._level_bank.fetch(
+            index, os.path.join(self.nethack._vardir, "nhdat")
+        )
+
+    def get_prefetch_stats(self):
+        """Returns the counters of the level prefetcher.
+
+        Returns:
+            dict: The number of ``hits`` (levels ready when resetting),
+            ``misses`` (resets waiting for a level), ``producer_stalls``
+            (levels waiting for space in the queue) and the number of
+            currently ``queued`` levels. None if prefetching is not used.
+        """
+        if self._level_prefetcher is None:
+            return None
+        return self._level_prefetcher.stats()
+
+    def seed(self, core=None, disp=None, reseed=False):
+        # Producers generate levels with the state of the environment, so
+        # they are stopped before it is seeded, and restarted when resetting
+        self._stop_level_prefetcher()
+        return super().seed(core, disp, reseed)
+
+    def _stop_level_prefetcher(self):
+        """Stops the level prefetcher, discarding the prefetched levels."""
+        if self._level_prefetcher is not None:
+            self._level_prefetcher.close()
+            self._level_prefetcher = None
+
+    def close(self):
+        self._stop_level_prefetcher()
+        super().close()
 
     def _get_observation(self, observation):
         # Overrides parent class's method to allow for cropping, fitlering out
@@ -457,51 +757,47 @@ class MiniHack(NetHackStaircase):
         # Called at the end of step() function in nle base class
         observation = super()._get_observation(observation)
         obs_dict = {}
+        crop_keys = []
         for key in self._minihack_obs_keys:
-            if "pixel" in key:
+            if key in self._pixel_modes:
                 continue
             if key in self._observation_keys:
                 obs_dict[key] = observation[key]
             elif key in MINIHACK_SPACE_FUNCS.keys():
-                orig_key = key.replace("_crop", "")
-                if "tty" in orig_key:
-                    loc = observation["tty_cursor"][::-1]
-                else:
-                    loc = observation["blstats"][:2]
-                obs_dict[key] = self._crop_observation(
-                    observation[orig_key], loc
+                crop_keys.append(key)
+        # All crops are made at once, sharing the computation of the windows
+        obs_dict.update(self._cropper.crop(observation, crop_keys))
+
+        for key, (crop, tile_size, gray) in self._pixel_modes.items():
+            if crop:
+                obs_dict[key] = self._glyph_mapper.to_rgb(
+                    obs_dict["glyphs_crop"], tile_size=tile_size, gray=gray
+                )
+            else:
+                # Only the tiles which changed since the last step are
+                # repainted
+                obs_dict[key] = self._glyph_mapper.to_rgb_incremental(
+                    observation["glyphs"], tile_size=tile_size, gray=gray
                 )
-
-        if "pixel" in self._minihack_obs_keys:
-            obs_dict["pixel"] = self._glyph_mapper.to_rgb(
-                observation["glyphs"]
-            )
-
-        if "pixel_crop" in self._minihack_obs_keys:
-            obs_dict["pixel_crop"] = self._glyph_mapper.to_rgb(
-                obs_dict["glyphs_crop"]
-            )
 
         if self.remove_alignment_blstats and "blstats" in obs_dict:
             obs_dict["blstats"] = obs_dict["blstats"][:-1]
 
         return obs_dict
 
-    def _crop_observation(self, obs, loc):
-        dh = self.obs_crop_h // 2
-        dw = self.obs_crop_w // 2
+    def set_crop_buffers(self, buffers):
+        """Sets the arrays the agent-centred crops are written into.
 
-        (x, y) = loc
-        x += dw
-        y += dh
+        By default, the crops are written into arrays owned by the
+        environment, which are reused (and so overwritten) on every step.
+        This allows e.g. vectorized environments to have the crops written
+        directly into their batched observations.
 
-        obs = np.pad(
-            obs,
-            pad_width=(dw, dh),
-            mode="constant",
-            constant_values=self.obs_crop_pad,
-        )
-        return obs[y - dh : y + dh + 1, x - dw : x + dw + 1]
+        Args:
+            buffers (dict): A mapping from crop keys (e.g. ``glyphs_crop``) to
+                arrays of the shape and dtype of their observation spaces.
+        """
+        self._cropper.set_buffers(buffers)
 
     def key_in_inventory(self, name):
         """Returns key of the given object in the inventory.
@@ -577,8 +873,9 @@ class MiniHack(NetHackStaircase):
         blstats = observation[self._blstats_index]
         x, y = blstats[:2]
 
+        index = self.screen_description_index(observation)
         neighbors = [
-            self.get_screen_description(i, j, observation)
+            index.get(i, j)
             for j in range(y - 1, y + 2)
             for i in range(x - 1, x + 2)
         ]
@@ -594,21 +891,11 @@ class MiniHack(NetHackStaircase):
                 "use_wiki=True to use the wiki"
             )
         neighbors_descriptions = self.get_neighbor_descriptions(observation)
-        neighbor_pages = [
-            self.wiki.get_page_text(description)
-            for description in neighbors_descriptions
-        ]
-        return neighbor_pages
+        return self.wiki.get_pages_text(neighbors_descriptions)
 
     def get_screen_description(self, x, y, observation=None):
         """Returns the description of the screen on (x,y) coordinates."""
-        if observation is None:
-            observation = self.last_observation
-
-        des_arr = observation[self._scr_descr_index][y, x]
-        symb_len = np.where(des_arr == 0)[0][0]
-
-        return des_arr[:symb_len].tobytes().decode("utf-8")
+        return self.screen_description_index(observation).get(x, y)
 
     def get_screen_wiki_page(self, x, y, observation=None):
         """Returns the wiki page matching the object on (x,y) coordinates."""
@@ -631,14 +918,27 @@ class MiniHack(NetHackStaircase):
         Returns:
             bool: True if the name is contained on the screen, False otherwise.
         """
+        return self.screen_description_index(observation).contains(name)
+
+    def screen_description_index(self, observation=None):
+        """Returns the index of the screen descriptions of the observation.
+
+        The index is rebuilt only when the screen descriptions change, which
+        also covers observations updated in place by stepping the underlying
+        NetHack game directly.
+
+        Args:
+            observation (dict): Agent observation. Defaults to the current
+                observation.
+
+        Returns:
+            ScreenDescriptionIndex: The index of the screen descriptions.
+        """
         if observation is None:
             observation = self.last_observation
-
-        y, x = SCREEN_DESCRIPTIONS_SHAPE[0:2]
-        for j in range(y):
-            for i in range(x):
-                des_arr = observation[self._scr_descr_index][j, i]
-                symb_len = np.where(des_arr == 0)[0][0]
-                if name in des_arr[:symb_len].tobytes().decode("utf-8"):
-                    return True
-        return False
+        screen = observation[self._scr_descr_index]
+        if self._screen_index is None or not self._screen_index.matches(
+            screen
+        ):
+            self._screen_index = ScreenDescriptionIndex(screen)
+        return self._screen_index
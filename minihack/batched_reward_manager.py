@@ -0,0 +1,225 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from minihack.reward_manager import (
+    CoordEvent,
+    LocActionEvent,
+    LocEvent,
+    MessageEvent,
+    RewardManager,
+    Y_cmd,
+)
+
+
+def batch_contains(strings: np.ndarray, pattern: bytes) -> np.ndarray:
+    """Returns whether the pattern is a substring of any string of each batch
+    element.
+
+    Args:
+        strings (np.ndarray):
+            An array of shape (B, ..., length) of byte strings, such as the
+            ``message`` or ``screen_descriptions`` observations.
+        pattern (bytes):
+            The pattern to search for.
+    Returns:
+        np.ndarray: A boolean array of shape (B,).
+    """
+    batch_size, length = strings.shape[0], strings.shape[-1]
+    if len(pattern) > length:
+        return np.zeros(batch_size, dtype=bool)
+    if not pattern:
+        return np.ones(batch_size, dtype=bool)
+    flat = np.ascontiguousarray(strings).reshape(-1)
+    # Find where the first byte of the pattern occurs in the whole batch, and
+    # then only check the following bytes at these (usually few) positions
+    index = np.flatnonzero(flat == pattern[0])
+    index = index[index % length <= length - len(pattern)]
+    for i in range(1, len(pattern)):
+        index = index[flat[index + i] == pattern[i]]
+    found = np.zeros(batch_size, dtype=bool)
+    found[index // (flat.size // batch_size)] = True
+    return found
+
+
+class BatchedRewardManager:
+    """Evaluates the events of a ``RewardManager`` on a batch of environments
+    at once.
+
+    The events of the reward manager act as a specification which is shared
+    by all environments, while whether each event has been achieved is kept
+    separately for every environment. Each step, the events are checked with
+    NumPy on observations stacked along a leading batch dimension (e.g. by a
+    vectorized environment), without a Python loop over the environments.
+
+    Only the events of a plain ``RewardManager`` which are created by its
+    ``add_*_event`` methods (i.e. ``MessageEvent``, ``CoordEvent``,
+    ``LocEvent`` and ``LocActionEvent``) are supported. The observations need
+    to contain the ``message``, ``blstats`` and ``screen_descriptions`` keys
+    for message, coordinate and location events respectively.
+
+    Args:
+        reward_manager (RewardManager):
+            The reward manager specifying the events.
+        batch_size (int):
+            The number of environments.
+        actions (Sequence[int] or None):
+            The action set of the environments, i.e. ``env.actions``. Required
+            if the reward manager has positional events.
+    """
+
+    def __init__(
+        self,
+        reward_manager: RewardManager,
+        batch_size: int,
+        actions: Optional[Sequence[int]] = None,
+    ):
+        if type(reward_manager) is not RewardManager:
+            raise ValueError(
+                "Only plain RewardManagers can be batched, got {}".format(
+                    type(reward_manager).__name__
+                )
+            )
+        if (
+            reward_manager.custom_reward_functions
+            or reward_manager.context_reward_functions
+        ):
+            raise ValueError("Custom reward functions cannot be batched")
+
+        self.events = list(reward_manager.events)
+        self.batch_size = batch_size
+        num_events = len(self.events)
+
+        self._message_patterns: Dict[bytes, np.ndarray] = {}
+        self._loc_patterns: Dict[bytes, np.ndarray] = {}
+        self._coord_mask = np.zeros(num_events, dtype=bool)
+        self._coordinates = np.zeros((num_events, 2), dtype=np.int64)
+        self._loc_mask = np.zeros(num_events, dtype=bool)
+        self._loc_action_mask = np.zeros(num_events, dtype=bool)
+        self._loc_action_actions = np.zeros(num_events, dtype=np.int64)
+        for i, event in enumerate(self.events):
+            if type(event) is MessageEvent:
+                for msg in event.messages:
+                    self._pattern_mask(self._message_patterns, msg)[i] = True
+            elif type(event) is CoordEvent:
+                self._coord_mask[i] = True
+                self._coordinates[i] = event.coordinates
+            elif type(event) is LocEvent:
+                self._pattern_mask(self._loc_patterns, event.loc)[i] = True
+                self._loc_mask[i] = True
+            elif type(event) is LocActionEvent:
+                self._pattern_mask(self._loc_patterns, event.loc)[i] = True
+                self._loc_action_mask[i] = True
+                self._loc_action_actions[i] = event.action
+            else:
+                raise ValueError(
+                    "Event {} cannot be batched".format(type(event).__name__)
+                )
+        if self._loc_action_mask.any() and actions is None:
+            raise ValueError(
+                "The action set is required for positional events"
+            )
+        self._actions = None if actions is None else np.asarray(actions)
+
+        self._rewards = np.array([e.reward for e in self.events], np.float64)
+        self._repeatable = np.array([e.repeatable for e in self.events], bool)
+        self._required = np.array(
+            [e.terminal_required for e in self.events], bool
+        )
+        self._sufficient = np.array(
+            [e.terminal_sufficient for e in self.events], bool
+        )
+
+        self.achieved = np.zeros((batch_size, num_events), dtype=bool)
+        # The status of positional events, see ``LocActionEvent``
+        self._status = np.zeros((batch_size, num_events), dtype=bool)
+
+    def _pattern_mask(self, patterns, pattern):
+        key = pattern.encode("utf-8")
+        if key not in patterns:
+            patterns[key] = np.zeros(len(self.events), dtype=bool)
+        return patterns[key]
+
+    def reset(self, mask: Optional[np.ndarray] = None) -> None:
+        """Reset all events of the given environments, to be called when
+        their new episodes start.
+
+        Args:
+            mask (np.ndarray or None):
+                A boolean array of shape (B,) of the environments to reset.
+                Defaults to all environments.
+        """
+        if mask is None:
+            mask = slice(None)
+        self.achieved[mask] = False
+        self._status[mask] = False
+
+    def _matches(self, patterns, strings) -> np.ndarray:
+        """Returns which events have any of their patterns in the strings, as
+        an array of shape (B, number of events)."""
+        result = np.zeros((self.batch_size, len(self.events)), dtype=bool)
+        for pattern, event_mask in patterns.items():
+            found = batch_contains(strings, pattern)
+            result |= found[:, None] & event_mask[None, :]
+        return result
+
+    def step(
+        self,
+        observations: Dict[str, np.ndarray],
+        actions: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Checks the events on a batch of observations, and returns the
+        reward of those which occured.
+
+        Args:
+            observations (dict):
+                The current observations, with arrays of shape (B, ...).
+            actions (np.ndarray or None):
+                The indices of the actions taken, of shape (B,). None if no
+                action was taken.
+        Returns:
+            tuple: The rewards, of shape (B,), and whether the episode of each
+            environment has ended, of shape (B,).
+        """
+        fired = np.zeros((self.batch_size, len(self.events)), dtype=bool)
+        if self._message_patterns:
+            fired |= self._matches(
+                self._message_patterns, observations["message"]
+            )
+        if self._coord_mask.any():
+            position = np.asarray(observations["blstats"])[:, None, :2]
+            fired |= self._coord_mask & np.all(
+                position == self._coordinates, axis=2
+            )
+        if self._loc_patterns:
+            on_top = ~self._matches(
+                self._loc_patterns, observations["screen_descriptions"]
+            )
+            fired |= on_top & self._loc_mask
+            if self._loc_action_mask.any():
+                fired |= self._check_loc_actions(on_top, actions)
+
+        fired &= ~self.achieved
+        rewards = fired.astype(np.float64) @ self._rewards
+        self.achieved |= fired & ~self._repeatable
+        return rewards, self._check_complete()
+
+    def _check_loc_actions(self, on_top, actions) -> np.ndarray:
+        # Achieved events are not checked, so their status is left untouched
+        checked = self._loc_action_mask & ~self.achieved
+        if actions is None:
+            self._status &= ~checked
+            return np.zeros_like(checked)
+        env_actions = self._actions[np.asarray(actions)][:, None]
+        start = (env_actions == self._loc_action_actions) & on_top
+        fired = ~start & (env_actions == Y_cmd) & self._status
+        self._status = np.where(checked, start | fired, self._status)
+        return checked & fired
+
+    def _check_complete(self) -> np.ndarray:
+        """Whether the episode of each environment is complete, following
+        ``RewardManager._check_complete``."""
+        sufficient = np.any(self.achieved & self._sufficient, axis=1)
+        required = np.all(self.achieved | ~self._required, axis=1)
+        return sufficient | required
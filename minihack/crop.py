@@ -0,0 +1,115 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+
+class ObservationCropper:
+    """Crops agent-centred windows out of the observations of an environment.
+
+    Every crop is written into an output buffer which is allocated once per
+    observation key and reused on every step, so no padded copy of the full
+    observation is made. Only the part of the window which lies inside the
+    observation is copied, and the rest is filled with the padding value.
+    The window bounds are computed once per step for all keys sharing the
+    same centre (the agent's position for map observations and the cursor
+    for tty observations).
+
+    As the buffers are reused, like the observation arrays of NLE, the crops
+    of a step are overwritten by the next one. Callers that need to keep them
+    can copy them, or provide their own buffers with ``set_buffers``.
+
+    Args:
+        height (int):
+            The height of the crops. Must be odd.
+        width (int):
+            The width of the crops. Must be odd.
+        pad (int):
+            The value of the cells outside of the observation.
+    """
+
+    def __init__(self, height: int, width: int, pad: int = 0):
+        assert height % 2 == 1
+        assert width % 2 == 1
+        self.height = height
+        self.width = width
+        self.pad = pad
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    def set_buffers(self, buffers: Dict[str, np.ndarray]) -> None:
+        """Sets the arrays the crops of the given keys are written into, e.g.
+        slices of the batched observations of a vectorized environment.
+
+        Args:
+            buffers (dict):
+                A mapping from crop keys (such as ``glyphs_crop``) to arrays
+                of the crop's shape and dtype.
+        """
+        for key, buffer in buffers.items():
+            if buffer.shape[:2] != (self.height, self.width):
+                raise ValueError(
+                    "Buffer of {} has shape {}, expected ({}, {}, ...)".format(
+                        key, buffer.shape, self.height, self.width
+                    )
+                )
+            self._buffers[key] = buffer
+
+    def _buffer(self, key: str, source: np.ndarray) -> np.ndarray:
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            shape = (self.height, self.width) + source.shape[2:]
+            buffer = np.empty(shape, dtype=source.dtype)
+            self._buffers[key] = buffer
+        return buffer
+
+    def _window(self, loc, shape) -> Tuple[Tuple[slice, slice], ...]:
+        """Returns the slices of the observation inside the window centred
+        on ``loc``, and the slices of the crop they are copied to."""
+        x0 = int(loc[0]) - self.width // 2
+        y0 = int(loc[1]) - self.height // 2
+        sy0, sy1 = max(y0, 0), min(y0 + self.height, shape[0])
+        sx0, sx1 = max(x0, 0), min(x0 + self.width, shape[1])
+        source = (slice(sy0, max(sy1, sy0)), slice(sx0, max(sx1, sx0)))
+        target = (
+            slice(sy0 - y0, max(sy1, sy0) - y0),
+            slice(sx0 - x0, max(sx1, sx0) - x0),
+        )
+        return source, target
+
+    def crop(
+        self, observation: Dict[str, np.ndarray], keys: Iterable[str]
+    ) -> Dict[str, np.ndarray]:
+        """Crops the observations of the given crop keys.
+
+        Args:
+            observation (dict):
+                The full observation of NLE, which includes ``blstats`` and
+                ``tty_cursor`` for locating the centres of the crops.
+            keys (Iterable[str]):
+                The crop keys, e.g. ``glyphs_crop``.
+        Returns:
+            dict: A mapping from the keys to the crops.
+        """
+        windows = {}
+        crops = {}
+        for key in keys:
+            orig_key = key.replace("_crop", "")
+            source = observation[orig_key]
+            is_tty = "tty" in orig_key
+            window_key = (is_tty, source.shape[:2])
+            if window_key not in windows:
+                if is_tty:
+                    loc = observation["tty_cursor"][::-1]
+                else:
+                    loc = observation["blstats"][:2]
+                windows[window_key] = self._window(loc, source.shape)
+            (sy, sx), (ty, tx) = windows[window_key]
+
+            buffer = self._buffer(key, source)
+            if ty.stop - ty.start < self.height or (
+                tx.stop - tx.start < self.width
+            ):
+                buffer.fill(self.pad)
+            buffer[ty, tx] = source[sy, sx]
+            crops[key] = buffer
+        return crops
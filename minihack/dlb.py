@@ -0,0 +1,156 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+
+import os
+from typing import Dict, Iterable, List, Optional
+
+from minihack.atomic_file import atomic_write
+
+DLB_VERSION = 1
+DLB_DIRECTORY = "Directory"
+ENC_NORMAL = "n"
+
+HEADER_FORMAT = "%3d %8d %8d %8d %8d\n"
+ENTRY_FORMAT = "%c%s %8d\n"
+
+
+class DlbArchive:
+    """An in-memory NetHack dlb archive (e.g. ``nhdat``).
+
+    The archive is an ordered collection of named files. It produces the
+    same bytes as the ``dlb cf`` tool of NetHack when given the same files
+    in the same order, so that individual entries (such as a freshly
+    compiled ``mylevel.lev``) can be replaced without repacking every file
+    from disk.
+
+    Args:
+        entries (dict or None):
+            A mapping from file names to file contents, in archive order.
+            Defaults to an empty archive.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, bytes]] = None):
+        self._entries = dict(entries) if entries is not None else {}
+
+    @classmethod
+    def read(cls, path: str) -> "DlbArchive":
+        """Reads a dlb archive from disk.
+
+        Args:
+            path (str): The path of the archive.
+        Returns:
+            DlbArchive: the archive.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        return cls.frombytes(data)
+
+    @classmethod
+    def frombytes(cls, data: bytes) -> "DlbArchive":
+        """Parses a dlb archive from its contents."""
+        lines = data.split(b"\n")
+        version, n_entries, _, _, total_size = map(int, lines[0].split())
+        if version != DLB_VERSION:
+            raise ValueError(f"Unsupported dlb version {version}")
+
+        names, offsets = [], []
+        for line in lines[1 : n_entries + 1]:
+            name, offset = line[1:].decode("ascii").split()
+            names.append(name)
+            offsets.append(int(offset))
+        offsets.append(total_size)
+
+        entries = {}
+        for i, name in enumerate(names):
+            if name == DLB_DIRECTORY:
+                continue
+            entries[name] = data[offsets[i] : offsets[i + 1]]
+        return cls(entries)
+
+    @classmethod
+    def from_files(cls, paths: Iterable[str]) -> "DlbArchive":
+        """Creates an archive from files on disk, in the given order, like
+        ``dlb cf <archive> <paths>`` does."""
+        entries = {}
+        for path in paths:
+            with open(path, "rb") as f:
+                entries[os.path.basename(path)] = f.read()
+        return cls(entries)
+
+    @classmethod
+    def from_dir(cls, dir_path: str) -> "DlbArchive":
+        """Creates an archive from all files of a directory, sorted by name,
+        like ``dlb cf <archive> *`` does inside that directory."""
+        return cls.from_files(
+            os.path.join(dir_path, fn) for fn in sorted(os.listdir(dir_path))
+        )
+
+    def names(self) -> List[str]:
+        """Returns the names of the files in the archive, in order."""
+        return list(self._entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def __getitem__(self, name: str) -> bytes:
+        return self._entries[name]
+
+    def replace(self, files: Dict[str, bytes]) -> "DlbArchive":
+        """Returns a copy of the archive with the given files replaced.
+
+        Files which are not in the archive yet are inserted keeping the
+        entries sorted by name, as in an archive created by ``from_dir``.
+        Only the entry table is copied, the contents of other files are
+        shared with this archive.
+
+        Args:
+            files (dict): A mapping from file names to new file contents.
+        Returns:
+            DlbArchive: the new archive.
+        """
+        entries = dict(self._entries)
+        new_names = [name for name in files if name not in entries]
+        entries.update(files)
+        if new_names:
+            entries = {name: entries[name] for name in sorted(entries)}
+        return DlbArchive(entries)
+
+    def _directory(self, dir_size: int) -> bytes:
+        names = list(self._entries)
+        str_size = (
+            sum(len(name) for name in names)
+            + len(DLB_DIRECTORY)
+            + len(names)
+            + 1
+        )
+        files_size = sum(len(data) for data in self._entries.values())
+        lines = [
+            HEADER_FORMAT
+            % (
+                DLB_VERSION,
+                len(names) + 1,
+                str_size,
+                dir_size,
+                files_size + dir_size,
+            ),
+            ENTRY_FORMAT % (ENC_NORMAL, DLB_DIRECTORY, 0),
+        ]
+        offset = dir_size
+        for name, data in self._entries.items():
+            lines.append(ENTRY_FORMAT % (ENC_NORMAL, name, offset))
+            offset += len(data)
+        return "".join(lines).encode("ascii")
+
+    def tobytes(self) -> bytes:
+        """Returns the contents of the archive."""
+        # The directory size is part of the directory itself
+        dir_size = 0
+        directory = self._directory(dir_size)
+        while len(directory) != dir_size:
+            dir_size = len(directory)
+            directory = self._directory(dir_size)
+        return directory + b"".join(self._entries.values())
+
+    def write(self, path: str) -> None:
+        """Writes the archive to disk, atomically replacing ``path``."""
+        data = self.tobytes()
+        atomic_write(path, lambda f: f.write(data))
@@ -1,10 +1,13 @@
 # Copyright (c) Facebook, Inc. and its affiliates.
+import json
 import os
 import random
+from functools import lru_cache
 
 import numpy as np
 import pkg_resources
 from nle import nethack
+from minihack.atomic_file import atomic_write
 from minihack.envs import register
 from minihack import LevelGenerator, MiniHackNavigation
 
@@ -12,27 +15,112 @@ LEVELS_PATH = os.path.join(
     pkg_resources.resource_filename("minihack", "dat"),
     "boxoban-levels-master",
 )
+# The packed levels of a directory of Boxoban levels, and their metadata
+PACKED_LEVELS_FILE = "levels.npy"
+PACKED_LEVELS_META_FILE = "levels.json"
 # The agent can only move towards 4 cardinal directions (instead of default 8)
 MOVE_ACTIONS = tuple(nethack.CompassCardinalDirection)
 
+# Maps the characters of Boxoban levels to the ones of the des-file maps
+MAP_LUT = np.arange(256, dtype=np.uint8)
+MAP_LUT[[ord(" "), ord("$"), ord("@")]] = ord(".")
+MAP_LUT[ord("#")] = ord("F")
 
-def load_boxoban_levels(cur_levels_path):
+
+def _level_files(cur_levels_path):
+    return sorted(f for f in os.listdir(cur_levels_path) if f.endswith(".txt"))
+
+
+def _read_level_file(path):
+    with open(path) as f:
+        cur_lines = f.readlines() + ["\n"]
     levels = []
-    for file in os.listdir(cur_levels_path):
-        if file.endswith(".txt"):
-            with open(os.path.join(cur_levels_path, file)) as f:
-                cur_lines = f.readlines()
+    cur_level = []
+    for el in cur_lines:
+        if el != "\n":
+            cur_level.append(el)
+        elif cur_level:
+            # 0th element is a level number, we don't need it
+            levels.append("".join(cur_level[1:]))
             cur_level = []
-            for el in cur_lines:
-                if el != "\n":
-                    cur_level.append(el)
-                else:
-                    # 0th element is a level number, we don't need it
-                    levels.append("".join(cur_level[1:]))
-                    cur_level = []
     return levels
 
 
+def load_boxoban_levels(cur_levels_path):
+    levels = []
+    for file in _level_files(cur_levels_path):
+        levels += _read_level_file(os.path.join(cur_levels_path, file))
+    return levels
+
+
+def _pack_levels(cur_levels_path):
+    files = _level_files(cur_levels_path)
+    rows, counts = [], []
+    for file in files:
+        levels = _read_level_file(os.path.join(cur_levels_path, file))
+        counts.append(len(levels))
+        rows += [level.rstrip("\n").split("\n") for level in levels]
+    height = max((len(level) for level in rows), default=0)
+    width = max((len(row) for level in rows for row in level), default=0)
+    packed = np.full((len(rows), height, width), ord(" "), dtype=np.uint8)
+    for i, level in enumerate(rows):
+        for j, row in enumerate(level):
+            packed[i, j, : len(row)] = np.frombuffer(row.encode(), np.uint8)
+    meta = dict(files=files, counts=counts, height=height, width=width)
+    return packed, meta
+
+
+def convert_boxoban_levels(cur_levels_path):
+    """Packs the levels of a directory of Boxoban level files into a single
+    ``(num_levels, height, width)`` uint8 array of their characters, saved
+    next to them along with the number of levels of every file.
+
+    This only needs to be done once, after downloading the levels.
+
+    Args:
+        cur_levels_path (str): The directory of the level files.
+    """
+    packed, meta = _pack_levels(cur_levels_path)
+    # The metadata is written last, as it marks the conversion as complete
+    atomic_write(
+        os.path.join(cur_levels_path, PACKED_LEVELS_FILE),
+        lambda f: np.save(f, packed),
+    )
+    atomic_write(
+        os.path.join(cur_levels_path, PACKED_LEVELS_META_FILE),
+        lambda f: json.dump(meta, f),
+        binary=False,
+    )
+
+
+@lru_cache(maxsize=None)
+def load_packed_levels(cur_levels_path):
+    """Returns the packed levels of a directory of Boxoban level files, as a
+    ``(num_levels, height, width)`` uint8 array which is loaded once per
+    process.
+
+    The array is memory-mapped read-only, so that its pages are shared by all
+    the processes using the levels. The levels are first packed with
+    ``convert_boxoban_levels`` if needed. The levels are packed in memory
+    instead if the packed levels can't be written or read.
+
+    Args:
+        cur_levels_path (str): The directory of the level files.
+    Returns:
+        np.ndarray: The packed levels.
+    """
+    meta_path = os.path.join(cur_levels_path, PACKED_LEVELS_META_FILE)
+    try:
+        if not os.path.exists(meta_path):
+            convert_boxoban_levels(cur_levels_path)
+        path = os.path.join(cur_levels_path, PACKED_LEVELS_FILE)
+        return np.load(path, mmap_mode="r")
+    except OSError:
+        # The packed levels can't be written (e.g. on a read-only or full
+        # file system) or read
+        return _pack_levels(cur_levels_path)[0]
+
+
 class BoxoHack(MiniHackNavigation):
     def __init__(self, *args, **kwargs):
         kwargs["max_episode_steps"] = kwargs.pop("max_episode_steps", 400)
@@ -45,7 +133,7 @@ class BoxoHack(MiniHackNavigation):
         self._time_penalty = kwargs.pop("penalty_time", 0)
         self._flags = tuple(kwargs.pop("flags", []))
         try:
-            self._levels = load_boxoban_levels(cur_levels_path)
+            self._levels = load_packed_levels(cur_levels_path)
         except FileNotFoundError:
             raise ModuleNotFoundError(
                 "To use Boxoban environments, please download maps using "
@@ -61,26 +149,23 @@ class BoxoHack(MiniHackNavigation):
         )
 
     def get_env_map(self, level):
-        info = {"fountains": [], "boulders": []}
-        level = level[:-1]
-        for row in range(0, len(level)):
-            for col in range(len(level[row])):
-                if level[row][col] == "$":
-                    info["boulders"].append((col, row))
-                if level[row][col] == ".":
-                    info["fountains"].append((col, row))
-            if "@" in level[row]:
-                py = level[row].index("@")
-                level[row] = level[row].replace("@", ".")
-                info["player"] = (py, row)
-            level[row] = level[row].replace(" ", ".")
-            level[row] = level[row].replace("#", "F")
-            level[row] = level[row].replace("$", ".")
-        return "\n".join(level), info
+        """Converts a packed level into a des-file map, along with the
+        positions of its boulders, fountains and player."""
+        height, width = level.shape
+        info = {}
+        chars = [("fountains", "."), ("boulders", "$"), ("player", "@")]
+        for key, char in chars:
+            indices = np.flatnonzero(level == ord(char)).tolist()
+            info[key] = [(i % width, i // width) for i in indices]
+        info["player"] = info["player"][0]
+        # The map is converted in one go, with a column of line breaks
+        lines = np.empty((height, width + 1), dtype=np.uint8)
+        lines[:, :width] = MAP_LUT[level]
+        lines[:, width] = ord("\n")
+        return lines.tobytes()[:-1].decode("ascii"), info
 
     def get_lvl_gen(self):
-        level = random.choice(self._levels)
-        level = level.split("\n")
+        level = self._levels[random.randrange(len(self._levels))]
         map, info = self.get_env_map(level)
         flags = list(self._flags)
         flags.append("noteleport")
@@ -93,15 +178,38 @@ class BoxoHack(MiniHackNavigation):
         lvl_gen.set_start_pos(info["player"])
         return lvl_gen
 
-    def reset(self, wizkit_items=None):
-        self.update(self.get_lvl_gen().get_des())
-        initial_obs = super().reset(wizkit_items=wizkit_items)
-        self._goal_pos_set = self._object_positions(self.last_observation, "{")
+    def _generate_des(self):
+        return self.get_lvl_gen().get_des()
+
+    def reset(self, *args, **kwargs):
+        self._update_generated_level()
+        # The goals are unknown until the new level is observed
+        self._fountain_mask = None
+        initial_obs = super().reset(*args, **kwargs)
+        # Fountains turn into boulders when covered, so they are only seen
+        # at the start of the episode
+        self._fountain_mask = self._chars(self.last_observation) == ord("{")
+        self._num_fountains = np.count_nonzero(self._fountain_mask)
+        self._num_boulders_on_fountains = 0
+        self._shaping_delta = 0
         return initial_obs
 
+    def _chars(self, observation):
+        return observation[self._original_observation_keys.index("chars")]
+
     def _is_episode_end(self, observation):
+        if self._fountain_mask is None:
+            return self.StepStatus.RUNNING
+        boulders = self._chars(observation) == ord("`")
+        count = np.count_nonzero(boulders & self._fountain_mask)
+        # The shaping reward only depends on the change of this count
+        self._shaping_delta = count - self._num_boulders_on_fountains
+        self._num_boulders_on_fountains = count
         # If every boulder is on a fountain, we're done
-        if self._goal_pos_set == self._object_positions(observation, "`"):
+        if (
+            count == self._num_fountains
+            and np.count_nonzero(boulders) == count
+        ):
             return self.StepStatus.TASK_SUCCESSFUL
         else:
             return self.StepStatus.RUNNING
@@ -113,24 +221,7 @@ class BoxoHack(MiniHackNavigation):
             return 0
         return (
             self._time_penalty
-            + (
-                self._count_boulders_on_fountains(observation)
-                - self._count_boulders_on_fountains(last_observation)
-            )
-            * self._reward_shaping_coefficient
-        )
-
-    def _count_boulders_on_fountains(self, observation):
-        return len(
-            self._goal_pos_set.intersection(
-                self._object_positions(observation, "`")
-            )
-        )
-
-    def _object_positions(self, observation, object_char):
-        char_obs = observation[self._original_observation_keys.index("chars")]
-        return set(
-            (x, y) for x, y in zip(*np.where(char_obs == ord(object_char)))
+            + self._shaping_delta * self._reward_shaping_coefficient
         )
 
 
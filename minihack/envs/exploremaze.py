@@ -38,7 +38,9 @@ class MiniHackExploreMaze(MiniHackNavigation):
             terminal_required=True,
             terminal_sufficient=True,
         )
-        reward_manager.add_custom_reward_fn(stairs_reward_function)
+        reward_manager.add_custom_reward_fn(
+            stairs_reward_function, previous_observation_keys=()
+        )
         super().__init__(
             *args,
             des_file=des_file,
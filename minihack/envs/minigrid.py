@@ -1,4 +1,8 @@
 # Copyright (c) Facebook, Inc. and its affiliates.
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
 from minihack import MiniHackNavigation, LevelGenerator
 from nle.nethack import Command, CompassDirection
 from minihack.envs import register
@@ -9,6 +13,93 @@ MOVE_AND_KICK_ACTIONS = tuple(
     list(CompassDirection) + [Command.OPEN, Command.KICK]
 )
 
+# The object indices of the grids encoded by gym_minigrid (OBJECT_TO_IDX)
+MINIGRID_OBJECT_TO_IDX = {
+    "unseen": 0,
+    "empty": 1,
+    "wall": 2,
+    "floor": 3,
+    "door": 4,
+    "key": 5,
+    "ball": 6,
+    "box": 7,
+    "goal": 8,
+    "lava": 9,
+    "agent": 10,
+}
+
+
+@lru_cache(maxsize=None)
+def _map_lut(wall):
+    """Maps the object indices of encoded grids to des-file map characters."""
+    lut = np.full(256, ord("."), dtype=np.uint8)
+    lut[MINIGRID_OBJECT_TO_IDX["wall"]] = ord(wall)
+    lut[MINIGRID_OBJECT_TO_IDX["door"]] = ord("+")
+    lut[MINIGRID_OBJECT_TO_IDX["lava"]] = ord("L")
+    return lut
+
+
+def minigrid_to_des_maps(grids, agent_positions, wall="|"):
+    """Converts a batch of MiniGrid layouts into des-file maps.
+
+    The layouts are given as the arrays returned by ``grid.encode()`` for
+    grids of the same size, which are converted together with a lookup
+    table. Leading empty rows and the last row are dropped, as well as
+    rows with no walls, doors or lava. Floor outside of the outermost walls,
+    doors or lava of a row becomes solid stone.
+
+    Args:
+        grids (np.ndarray): The ``(num_layouts, width, height, 3)`` encoded
+            grids.
+        agent_positions (Iterable): The ``(x, y)`` position of the agent in
+            every layout.
+        wall (str): The map character of walls. Defaults to "|".
+    Returns:
+        list: The map, start position, goal position (or None) and door
+        positions of every layout.
+    """
+    objects = np.asarray(grids)[..., 0].transpose(0, 2, 1)
+    num_layouts, height, width = objects.shape
+    chars = _map_lut(wall)[objects]
+
+    # Rows are counted from the first one with any object
+    offsets = np.argmax(
+        (objects > MINIGRID_OBJECT_TO_IDX["empty"]).any(axis=2), axis=1
+    )
+    rows = np.arange(height)
+    keep = (
+        (rows >= offsets[:, None])
+        & (rows < height - 1)
+        & (chars != ord(".")).any(axis=2)
+    )
+
+    # Floor outside of the outermost walls, doors or lava is solid stone
+    is_floor = chars == ord(".")
+    first = np.argmax(~is_floor, axis=2)[..., None]
+    last = width - 1 - np.argmax(~is_floor[..., ::-1], axis=2)[..., None]
+    cols = np.arange(width)
+    chars[is_floor & ((cols < first) | (cols > last))] = ord(" ")
+
+    # Maps are converted in one go, with a column of line breaks
+    lines = np.empty((num_layouts, height, width + 1), dtype=np.uint8)
+    lines[..., :width] = chars
+    lines[..., width] = ord("\n")
+
+    layouts = []
+    for k, (x, y) in enumerate(agent_positions):
+        offset = int(offsets[k])
+        map = lines[k][keep[k]].tobytes()[:-1].decode("ascii")
+        doors = np.argwhere(objects[k] == MINIGRID_OBJECT_TO_IDX["door"])
+        door_pos = [(i, j - offset) for j, i in doors.tolist()]
+        goals = np.argwhere(objects[k] == MINIGRID_OBJECT_TO_IDX["goal"])
+        goal_pos = None
+        if len(goals):
+            j, i = goals[-1].tolist()
+            goal_pos = (i, j - offset)
+        start_pos = (int(x), int(y) - offset)
+        layouts.append((map, start_pos, goal_pos, door_pos))
+    return layouts
+
 
 class MiniGridHack(MiniHackNavigation):
     def __init__(self, *args, **kwargs):
@@ -34,57 +125,33 @@ class MiniGridHack(MiniHackNavigation):
         else:
             self.wall = "|"
 
+        # Layouts are generated in batches of this size, and used in turn
+        self.layout_batch_size = kwargs.pop("layout_batch_size", 1)
+        self._layouts = deque()
+
         des_file = self.get_env_desc()
         super().__init__(*args, des_file=des_file, **kwargs)
 
     def get_env_map(self, env):
-        door_pos = []
-        goal_pos = None
-        empty_strs = 0
-        empty_str = True
-        env_map = []
-
-        for j in range(env.grid.height):
-            str = ""
-            for i in range(env.width):
-                c = env.grid.get(i, j)
-                if c is None:
-                    str += "."
-                    continue
-                empty_str = False
-                if c.type == "wall":
-                    str += self.wall
-                elif c.type == "door":
-                    str += "+"
-                    door_pos.append((i, j - empty_strs))
-                elif c.type == "floor":
-                    str += "."
-                elif c.type == "lava":
-                    str += "L"
-                elif c.type == "goal":
-                    goal_pos = (i, j - empty_strs)
-                    str += "."
-                elif c.type == "player":
-                    str += "."
-            if not empty_str and j < env.grid.height - 1:
-                if set(str) != {"."}:
-                    str = str.replace(".", " ", str.index(self.wall))
-                    inv = str[::-1]
-                    str = inv.replace(".", " ", inv.index(self.wall))[::-1]
-                    env_map.append(str)
-            elif empty_str:
-                empty_strs += 1
-
-        start_pos = (int(env.agent_pos[0]), int(env.agent_pos[1]) - empty_strs)
-        env_map = "\n".join(env_map)
-
-        return env_map, start_pos, goal_pos, door_pos
+        env = env.unwrapped
+        grids = env.grid.encode()[None]
+        return minigrid_to_des_maps(grids, [env.agent_pos], self.wall)[0]
+
+    def _generate_layouts(self):
+        """Generates a batch of MiniGrid layouts, converted together."""
+        env = self.minigrid_env.unwrapped
+        grids, agent_positions = [], []
+        for _ in range(self.layout_batch_size):
+            self.minigrid_env.reset()
+            grids.append(env.grid.encode())
+            agent_positions.append(tuple(env.agent_pos))
+        grids = np.stack(grids)
+        return minigrid_to_des_maps(grids, agent_positions, self.wall)
 
     def get_env_desc(self):
-        self.minigrid_env.reset()
-        env = self.minigrid_env
-
-        map, start_pos, goal_pos, door_pos = self.get_env_map(env)
+        if not self._layouts:
+            self._layouts.extend(self._generate_layouts())
+        map, start_pos, goal_pos, door_pos = self._layouts.popleft()
 
         lev_gen = LevelGenerator(map=map)
 
@@ -124,13 +191,19 @@ class MiniGridHack(MiniHackNavigation):
         Returns:
             [tuple] The seeds supplied, in the form (core, disp, reseed).
         """
+        # Levels generated with the previous seed are discarded, stopping
+        # the prefetching threads before the MiniGrid environment is seeded
+        self._stop_level_prefetcher()
         self.minigrid_env.seed(core)
+        self._layouts.clear()
         return super().seed(core, disp, reseed)
 
-    def reset(self, wizkit_items=None):
-        des_file = self.get_env_desc()
-        self.update(des_file)
-        return super().reset(wizkit_items=wizkit_items)
+    def _generate_des(self):
+        return self.get_env_desc()
+
+    def reset(self, *args, **kwargs):
+        self._update_generated_level()
+        return super().reset(*args, **kwargs)
 
 
 class MiniHackMultiRoomN2(MiniGridHack):
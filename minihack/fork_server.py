@@ -0,0 +1,402 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+
+import multiprocessing as mp
+import os
+import random
+import shutil
+import signal
+import socket
+from collections import deque
+from itertools import count
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import recv_handle, send_handle
+from typing import Any, Callable, Dict, Optional
+
+import gymnasium as gym
+
+_PROC_FD = "/proc/self/fd"
+
+
+class _Vardir:
+    """The directory of the game files of a template, of which every forked
+    child gets its own copy, so that the template can reset while its
+    children play.
+
+    NetHack only knows the path the directory had when the environment was
+    constructed, so the path is replaced with a link to a descriptor of the
+    directory. The link resolves in the process following it, and a child
+    switches to its copy by pointing the descriptor to it. The environment
+    itself is given the actual directory, e.g. for compiling levels in
+    other processes. This needs ``/proc``, without which children share the
+    files of their template.
+    """
+
+    def __init__(self, nethack):
+        self.nethack = nethack
+        self.path = nethack._vardir
+        self.fd = None
+        if not os.path.isdir(_PROC_FD):
+            return
+        self._copies = count()
+        template_path = f"{self.path}.template"
+        self.fd = os.open(self.path, os.O_RDONLY | os.O_DIRECTORY)
+        os.rename(self.path, template_path)
+        os.symlink(os.path.join(_PROC_FD, str(self.fd)), self.path)
+        nethack._vardir = template_path
+
+    def copy(self) -> Optional[str]:
+        """Returns a new copy of the directory, or None if children share
+        it."""
+        if self.fd is None:
+            return None
+        path = f"{self.path}.{next(self._copies)}"
+        # The prefetched levels are only used by the template
+        shutil.copytree(
+            self.nethack._vardir,
+            path,
+            symlinks=True,
+            ignore=shutil.ignore_patterns("prefetch"),
+        )
+        return path
+
+    def use(self, path: Optional[str]) -> None:
+        """Switches the process to a copy of the directory."""
+        if path is None:
+            return
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        os.dup2(fd, self.fd)
+        os.close(fd)
+        self.nethack._vardir = path
+
+    @staticmethod
+    def remove(path: Optional[str]) -> None:
+        if path is not None:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def close(self) -> None:
+        """Moves the directory back to its path, for the environment to
+        remove it when closed."""
+        if self.fd is None:
+            return
+        os.remove(self.path)
+        os.rename(self.nethack._vardir, self.path)
+        os.close(self.fd)
+        self.fd = None
+        self.nethack._vardir = self.path
+
+
+def _serve(env, conn: Connection, reset_result) -> None:
+    """Runs the game of a forked child, which starts with the result of the
+    reset it was forked after, until the parent closes the connection."""
+    try:
+        conn.send((True, reset_result))
+        while True:
+            name, args, kwargs = conn.recv()
+            if name is None:
+                break
+            try:
+                result = (True, getattr(env, name)(*args, **kwargs))
+            except Exception as e:
+                result = (False, e)
+            conn.send(result)
+    except (EOFError, OSError):
+        pass
+    finally:
+        # The environment belongs to the template, so it is not closed, and
+        # no cleanup of the template process is run either
+        os._exit(0)
+
+
+def _reap_children(children: Dict[int, Optional[str]]) -> None:
+    """Reaps the children of a template which have exited, and removes their
+    copies of its vardir."""
+    for pid in list(children):
+        if os.waitpid(pid, os.WNOHANG)[0]:
+            _Vardir.remove(children.pop(pid))
+
+
+def _kill_children(children: Dict[int, Optional[str]]) -> None:
+    """Kills the children of a template, and removes their copies of its
+    vardir."""
+    for pid, copy in children.items():
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+        _Vardir.remove(copy)
+
+
+def _run_template(
+    env_fn: Callable[[], gym.Env], conn: Connection, parent_conn: Connection
+) -> None:
+    """Runs a template process, which forks children at level start.
+
+    Exceptions raised when constructing or resetting the environment are
+    sent to the parent in place of the reply, like those of the children.
+    """
+    # Otherwise the template would never see the parent exiting
+    parent_conn.close()
+    try:
+        env = env_fn().unwrapped
+        # Before the first reset, which might start prefetching levels in
+        # the directory
+        vardir = _Vardir(env.nethack)
+    except Exception as e:
+        conn.send((False, e))
+        conn.close()
+        return
+    conn.send(
+        (True, (env.observation_space, env.action_space, env._level_seeds))
+    )
+    seed = None
+    reset_result = None
+    reset_error = None
+    # The copy of the vardir of every child
+    children = {}
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == "seed":
+                # The same level start is used by all the children
+                seed = message[1]
+                env.seed(seed, seed, reseed=False)
+                try:
+                    reset_result = env.reset(sample_seed=False)
+                    reset_error = None
+                except Exception as e:
+                    reset_error = e
+                continue
+            if message[0] != "fork":
+                break
+            _reap_children(children)
+            if seed is None:
+                try:
+                    reset_result = env.reset()
+                    reset_error = None
+                except Exception as e:
+                    reset_error = e
+            if reset_error is not None:
+                conn.send((False, reset_error))
+                continue
+            # Copied before forking, as the template might reset again
+            # before the child is done copying
+            try:
+                copy = vardir.copy()
+            except OSError as e:
+                conn.send((False, e))
+                continue
+            parent_end, child_end = socket.socketpair()
+            pid = os.fork()
+            if pid == 0:
+                conn.close()
+                parent_end.close()
+                vardir.use(copy)
+                _serve(env, Connection(child_end.detach()), reset_result)
+            child_end.close()
+            children[pid] = copy
+            conn.send((True, pid))
+            send_handle(conn, parent_end.fileno(), os.getppid())
+            parent_end.close()
+    except (EOFError, OSError):
+        # e.g. the parent closed the pool before receiving a child
+        pass
+    finally:
+        # Children not in use by the parent might never see it closing their
+        # connections, e.g. if they are inherited by other processes
+        _kill_children(children)
+        vardir.close()
+        conn.close()
+        env.close()
+
+
+class _Template:
+    """The parent's end of a template process."""
+
+    def __init__(self, ctx, env_fn: Callable[[], gym.Env]):
+        self.conn, remote = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_run_template,
+            args=(env_fn, remote, self.conn),
+            daemon=True,
+        )
+        self.process.start()
+        remote.close()
+        self.parked = deque()
+        self.pending = 0
+
+    def _reply(self):
+        ok, result = self.conn.recv()
+        if not ok:
+            raise result
+        return result
+
+    def info(self):
+        return self._reply()
+
+    def set_seed(self, seed: int) -> None:
+        self.conn.send(("seed", seed))
+
+    def request(self) -> None:
+        self.conn.send(("fork",))
+        self.pending += 1
+
+    def _receive(self) -> None:
+        self.pending -= 1
+        try:
+            self._reply()  # The pid of the child
+        except Exception:
+            # Another child replaces the one which couldn't be forked
+            self.request()
+            raise
+        fd = recv_handle(self.conn)
+        self.parked.append(Connection(fd))
+
+    def adopt(self) -> Connection:
+        """Returns the connection of a parked child, and requests another."""
+        while self.pending and self.conn.poll():
+            self._receive()
+        if not self.parked:
+            self._receive()
+        self.request()
+        return self.parked.popleft()
+
+    def close(self) -> None:
+        while self.parked:
+            self.parked.popleft().close()
+        try:
+            self.conn.send(("close",))
+        except OSError:
+            pass
+        self.conn.close()
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ForkServerResetPool(gym.Env):
+    """A MiniHack environment which resets by adopting a game process that
+    is already at the start of a level.
+
+    Template processes construct the environment, reset it and fork
+    children, which are parked at level start until they are needed. A
+    reset then only switches to a parked child, while the template forks
+    another one in the background. All other calls are forwarded to the
+    current child, so observations are sent between processes at every
+    step.
+
+    By default, a single template resets the environment before every fork,
+    so that levels are drawn as usual. With ``per_seed=True``, there is a
+    template for every seed in the ``seeds`` of the environment, which
+    resets once and forks all its children from the same level start, so
+    that resetting does not run the game at all. Procedurally generated
+    levels are then fixed per seed as well.
+
+    Every child plays from its own copy of the game files of its template,
+    which are thus not affected by the resets of the template. On systems
+    without ``/proc``, children share the files of their template instead.
+
+    Args:
+        env_fn (Callable[[], gym.Env]):
+            A function creating the MiniHack environment, which is called in
+            every template process. Any wrappers of the environment are not
+            used.
+        num_parked (int):
+            The number of children parked by every template. Defaults to 2.
+        per_seed (bool):
+            Whether to use a template per seed of the environment. Defaults
+            to False.
+    """
+
+    def __init__(
+        self,
+        env_fn: Callable[[], gym.Env],
+        num_parked: int = 2,
+        per_seed: bool = False,
+    ):
+        assert num_parked > 0
+        ctx = mp.get_context("fork")
+        self._conn: Optional[Connection] = None
+        self._seeds = None
+        first = _Template(ctx, env_fn)
+        self._templates: Dict[Optional[int], _Template] = {None: first}
+        try:
+            self.observation_space, self.action_space, seeds = first.info()
+            if per_seed and seeds:
+                self._seeds = list(dict.fromkeys(seeds))
+                self._templates = {self._seeds[0]: first}
+                for seed in self._seeds[1:]:
+                    self._templates[seed] = _Template(ctx, env_fn)
+                for seed, template in self._templates.items():
+                    if template is not first:
+                        template.info()
+                    template.set_seed(seed)
+            for template in self._templates.values():
+                for _ in range(num_parked):
+                    template.request()
+        except BaseException:
+            # e.g. the environment couldn't be constructed by a template
+            self.close()
+            raise
+
+    @staticmethod
+    def _release(conn: Optional[Connection]) -> None:
+        if conn is not None:
+            try:
+                conn.send((None, (), {}))
+            except OSError:
+                pass
+            conn.close()
+
+    def reset(self, seed: Optional[int] = None, options=None):
+        """Switches to a child at the start of a level.
+
+        Args:
+            seed (int or None): With per-seed templates, the seed of the
+                level, which is otherwise chosen uniformly at random among
+                the seeds of the environment. Must be None without per-seed
+                templates. Defaults to None.
+        Returns:
+            tuple: The observation and information of the reset.
+        """
+        if self._seeds is None:
+            if seed is not None:
+                raise ValueError(
+                    "Seeds can only be chosen with per-seed templates"
+                )
+        elif seed is None:
+            seed = random.choice(self._seeds)
+        elif seed not in self._templates:
+            raise ValueError(f"Seed {seed} is not a seed of the environment")
+        previous = self._conn
+        self._conn = self._templates[seed].adopt()
+        result = self._receive()
+        # The previous child exits only once the new one is in use
+        self._release(previous)
+        return result
+
+    def _receive(self):
+        ok, result = self._conn.recv()
+        if not ok:
+            raise result
+        return result
+
+    def call(self, name: str, *args, **kwargs) -> Any:
+        """Calls a method of the environment of the current child."""
+        if self._conn is None:
+            raise RuntimeError("The environment must be reset first")
+        self._conn.send((name, args, kwargs))
+        return self._receive()
+
+    def step(self, action: int):
+        return self.call("step", action)
+
+    def render(self):
+        return self.call("render")
+
+    def close(self) -> None:
+        self._release(self._conn)
+        self._conn = None
+        for template in self._templates.values():
+            template.close()
+        self._templates = {}
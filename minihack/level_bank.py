@@ -0,0 +1,87 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+
+import json
+import os
+import random
+from typing import Dict, List, Optional
+
+from minihack.atomic_file import atomic_link, atomic_write
+
+LEVEL_BANK_MANIFEST = "manifest.json"
+LEVEL_BANK_VERSION = 1
+
+
+def write_manifest(bank_dir: str, manifest: Dict) -> None:
+    """Writes the manifest of a level bank, which is atomically replaced.
+
+    The manifest is written last when baking a bank, as it marks the bank as
+    complete.
+    """
+    atomic_write(
+        os.path.join(bank_dir, LEVEL_BANK_MANIFEST),
+        lambda f: json.dump(manifest, f, indent=1),
+        binary=False,
+    )
+
+
+class LevelBank:
+    """A bank of levels generated and compiled ahead of time, as baked by
+    ``minihack.scripts.bake_levels``.
+
+    The bank is a directory holding the description file and the compiled
+    nhdat archive of every level, along with a manifest listing them.
+    Environments given a bank sample its levels instead of generating and
+    compiling new ones, so that resetting only swaps in an archive, and the
+    levels of different runs are drawn from the same set.
+
+    Args:
+        bank_dir (str):
+            The directory of the bank.
+        salt (str or None):
+            The identifier of the NetHack build the archives must have been
+            compiled by, as used by ``NhdatCache``. If None, it is not
+            checked. Defaults to None.
+    """
+
+    def __init__(self, bank_dir: str, salt: Optional[str] = None):
+        self.bank_dir = os.path.abspath(os.path.expanduser(bank_dir))
+        manifest_path = os.path.join(self.bank_dir, LEVEL_BANK_MANIFEST)
+        try:
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(
+                f"No level bank at {self.bank_dir}. Level banks can be "
+                "baked with the minihack/scripts/bake_levels.py script."
+            ) from e
+        version = self.manifest.get("version")
+        if version != LEVEL_BANK_VERSION:
+            raise ValueError(f"Unsupported level bank version {version}")
+        if salt is not None and self.manifest["salt"] != salt:
+            raise ValueError(
+                f"The level bank at {self.bank_dir} was compiled by another "
+                "version of NetHack, please bake it again."
+            )
+        self.levels: List[Dict[str, str]] = self.manifest["levels"]
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def des_file(self, index: int) -> str:
+        """Returns the description file of a level."""
+        with open(os.path.join(self.bank_dir, self.levels[index]["des"])) as f:
+            return f.read()
+
+    def sample(self) -> int:
+        """Returns the index of a level chosen uniformly at random."""
+        return random.randrange(len(self.levels))
+
+    def fetch(self, index: int, dest: str) -> None:
+        """Places the nhdat archive of a level at ``dest``.
+
+        The archive is hard-linked when possible and copied otherwise. The
+        destination is replaced atomically.
+        """
+        atomic_link(
+            os.path.join(self.bank_dir, self.levels[index]["nhdat"]), dest
+        )
@@ -0,0 +1,168 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+
+import os
+import queue
+import shutil
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+# How often (in seconds) blocked producers check whether they should stop
+_POLL_INTERVAL = 0.1
+
+
+class LevelPrefetcher:
+    """Generates and compiles the levels of upcoming episodes in background
+    threads.
+
+    Producer threads repeatedly generate a description file, compile it into
+    an nhdat archive inside ``staging_dir`` and put it in a bounded queue,
+    from which ``get`` takes the next ready level. Since compilation happens
+    in a ``lev_comp`` subprocess, several producers can compile in parallel.
+    Level generation itself is serialised by a lock, so ``generate_fn`` does
+    not need to be thread-safe.
+
+    A producer stops when generating or compiling a level raises an
+    exception, which is then raised by ``get`` instead of returning a level.
+    Once all producers have stopped, ``get`` raises a ``RuntimeError``
+    rather than waiting for levels which will never come.
+
+    The prefetcher keeps the following counters, which are useful for sizing
+    the queue and the number of producers:
+
+    - ``hits``: levels which were ready when requested.
+    - ``misses``: requests which had to wait for a producer.
+    - ``producer_stalls``: levels which could not be queued right away
+      because the queue was full.
+
+    Args:
+        generate_fn (Callable[[], str]):
+            A function returning the description file of a new level.
+        build_fn (Callable[[str, str, str], bool]):
+            A function taking a description file, the destination path of the
+            nhdat archive, and a working directory for compilation, which
+            returns whether the archive was built successfully.
+        staging_dir (str):
+            The directory in which prefetched archives are stored. It should
+            be on the same file system as the archives are moved to.
+        size (int):
+            The maximum number of prefetched levels. Defaults to 2.
+        num_workers (int):
+            The number of producer threads. Defaults to 1.
+    """
+
+    def __init__(
+        self,
+        generate_fn: Callable[[], str],
+        build_fn: Callable[[str, str, str], bool],
+        staging_dir: str,
+        size: int = 2,
+        num_workers: int = 1,
+    ):
+        assert size > 0 and num_workers > 0
+        self._generate_fn = generate_fn
+        self._build_fn = build_fn
+        self._staging_dir = staging_dir
+        self._queue = queue.Queue(maxsize=size)
+        self._generate_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.hits = 0
+        self.misses = 0
+        self.producer_stalls = 0
+
+        os.makedirs(self._staging_dir, exist_ok=True)
+        self._threads = [
+            threading.Thread(target=self._produce, args=(i,), daemon=True)
+            for i in range(num_workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _produce(self, worker_id: int):
+        work_dir = os.path.join(self._staging_dir, f"worker{worker_id}")
+        count = 0
+        try:
+            os.makedirs(work_dir, exist_ok=True)
+            while not self._stop.is_set():
+                with self._generate_lock:
+                    des_file = self._generate_fn()
+                nhdat_path = os.path.join(work_dir, f"{count}.nhdat")
+                count += 1
+                if not self._build_fn(des_file, nhdat_path, work_dir):
+                    # Let the consumer deal with the level synchronously
+                    nhdat_path = None
+                self._put((des_file, nhdat_path))
+        except Exception as e:
+            # The producer stops, and the consumer raises the exception
+            self._put(e)
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            with self._stats_lock:
+                self.producer_stalls += 1
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def get(self) -> Tuple[str, Optional[str]]:
+        """Returns the next prefetched level, waiting for it if necessary.
+
+        The exception of a producer which failed to generate or compile the
+        level is raised instead.
+
+        Returns:
+            tuple: The description file of the level and the path of its
+            compiled nhdat archive, which is None if compilation failed. The
+            caller takes ownership of the archive file.
+        """
+        try:
+            item = self._queue.get_nowait()
+            with self._stats_lock:
+                self.hits += 1
+        except queue.Empty:
+            with self._stats_lock:
+                self.misses += 1
+            item = self._wait()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def _wait(self):
+        while True:
+            try:
+                return self._queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+            if not any(t.is_alive() for t in self._threads):
+                # A producer may have queued an item right before stopping
+                try:
+                    return self._queue.get_nowait()
+                except queue.Empty:
+                    raise RuntimeError(
+                        "All the level prefetching threads have stopped"
+                    ) from None
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the counters of the prefetcher and the current number of
+        queued levels."""
+        with self._stats_lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                producer_stalls=self.producer_stalls,
+                queued=self._queue.qsize(),
+            )
+
+    def close(self):
+        """Stops the producer threads and removes the staged archives."""
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        shutil.rmtree(self._staging_dir, ignore_errors=True)
@@ -0,0 +1,126 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+
+import hashlib
+import os
+import shutil
+
+from minihack.atomic_file import atomic_link, atomic_write
+
+NHDAT_CACHE_DIR_ENV = "MINIHACK_NHDAT_CACHE_DIR"
+DEFAULT_NHDAT_CACHE_SIZE = 512 * 1024 * 1024  # 512 MiB
+NHDAT_SUFFIX = ".nhdat"
+
+
+class NhdatCache:
+    """An on-disk, content-addressed cache of compiled nhdat archives.
+
+    Entries are keyed by a hash of the description file text (plus a salt
+    describing the NetHack build used for compiling it), so that environments
+    which compile the same level can reuse the archive produced by an earlier
+    compilation instead of running ``lev_comp`` and ``dlb`` again.
+
+    The cache directory can be shared by many processes. Entries are written
+    to a temporary file and atomically renamed into place, and every process
+    tolerates entries disappearing under it due to concurrent eviction.
+    The total size of the cache is bounded by evicting the least recently
+    used entries, as tracked by their modification times.
+
+    Args:
+        cache_dir (str):
+            The directory storing the cached nhdat archives. Created if it
+            does not exist.
+        max_size (int):
+            The maximum total size of the cached archives in bytes. Defaults
+            to ``DEFAULT_NHDAT_CACHE_SIZE`` (512 MiB).
+        salt (str):
+            A string mixed into every key, used for separating archives
+            compiled by different versions of NetHack. Defaults to "".
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_size: int = DEFAULT_NHDAT_CACHE_SIZE,
+        salt: str = "",
+    ):
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_size = max_size
+        self.salt = salt
+
+    def key(self, des_text: str) -> str:
+        """Returns the cache key of the given description file text."""
+        digest = hashlib.sha256()
+        digest.update(self.salt.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(des_text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        """Returns the path of the cached archive with the given key."""
+        return os.path.join(self.cache_dir, key + NHDAT_SUFFIX)
+
+    def fetch(self, key: str, dest: str) -> bool:
+        """Places the cached archive with the given key at ``dest``.
+
+        The archive is hard-linked when possible and copied otherwise. The
+        destination is replaced atomically.
+
+        Args:
+            key (str):
+                The cache key, as returned by ``key``.
+            dest (str):
+                The path of the nhdat file to be replaced.
+
+        Returns:
+            bool: True on a cache hit, False otherwise.
+        """
+        src = self.path(key)
+        try:
+            atomic_link(src, dest)
+        except FileNotFoundError:
+            # Not cached, or evicted by another process in the meantime
+            return False
+        try:
+            # Mark the entry as recently used
+            os.utime(src)
+        except OSError:
+            pass
+        return True
+
+    def store(self, key: str, src: str) -> None:
+        """Adds the archive at ``src`` to the cache under the given key and
+        evicts the least recently used entries if the cache is too large.
+        """
+        with open(src, "rb") as g:
+            atomic_write(self.path(key), lambda f: shutil.copyfileobj(g, f))
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the total size of
+        the cache is at most ``max_size`` bytes."""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(NHDAT_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= self.max_size:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Already evicted by another process
+                pass
+            total -= size
+            if total <= self.max_size:
+                break
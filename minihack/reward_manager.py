@@ -2,11 +2,23 @@
 from __future__ import annotations
 
 import enum
+import re
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Any, Callable, List, Tuple
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 if TYPE_CHECKING:
     from minihack import MiniHack
+    from minihack.screen_index import ScreenDescriptionIndex
 
 from nle.nethack import Command, CompassDirection
 
@@ -38,12 +50,101 @@ COMESTIBLES = [
 ]
 
 
-class Event(ABC):
+class StepContext:
+    """The transition of a single step, shared by all the events and custom
+    reward functions evaluated on it.
+
+    Data derived from the observation, such as the decoded message, is
+    computed lazily on first access and then reused, so that it is computed
+    at most once per step no matter how many events use it.
+
+    Args:
+        env (MiniHack):
+            The MiniHack environment in question.
+        previous_observation (tuple):
+            The previous state observation.
+        action (int):
+            The action taken.
+        observation (tuple):
+            The current observation.
+    """
+
+    def __init__(self, env, previous_observation, action, observation):
+        self.env = env
+        self.previous_observation = previous_observation
+        self.action = action
+        self.observation = observation
+        self._message = None
+        self._agent_position = None
+        self._inventory = None
+        self._screen_index = None
+
+    @property
+    def message(self) -> str:
+        """The message of the current observation, without the trailing
+        null bytes."""
+        if self._message is None:
+            index = self.env._original_observation_keys.index("message")
+            message = self.observation[index].tobytes().split(b"\0", 1)[0]
+            self._message = message.decode("utf-8")
+        return self._message
+
+    @property
+    def agent_position(self) -> Tuple[int, int]:
+        """The (x,y) coordinates of the agent."""
+        if self._agent_position is None:
+            x, y = self.observation[self.env._blstats_index][:2]
+            self._agent_position = (int(x), int(y))
+        return self._agent_position
+
+    @property
+    def inventory(self) -> Dict[str, str]:
+        """A mapping from the letters of the inventory to the descriptions
+        of the items, in inventory order."""
+        if self._inventory is None:
+            keys = self.env._original_observation_keys
+            inv_letters = self.observation[keys.index("inv_letters")]
+            inv_strs = self.observation[keys.index("inv_strs")]
+            self._inventory = {}
+            for letter, line in zip(inv_letters, inv_strs):
+                if letter == 0:
+                    break
+                self._inventory[chr(letter)] = (
+                    line.tobytes().split(b"\0", 1)[0].decode("utf-8")
+                )
+        return self._inventory
+
+    @property
+    def screen_index(self) -> ScreenDescriptionIndex:
+        """The index of the screen descriptions of the current observation."""
+        if self._screen_index is None:
+            self._screen_index = self.env.screen_description_index(
+                self.observation
+            )
+        return self._screen_index
+
+    def screen_contains(self, name: str) -> bool:
+        """Whether an object with the given name is visible on the screen."""
+        return self.screen_index.contains(name)
+
+
+class Event:
     """An event which can occur in a MiniHack episode.
 
     This is the base class of all other events.
+
+    The environment only keeps the keys of the previous observation which are
+    listed in ``previous_observation_keys`` (e.g. ``("blstats",)``), or all
+    of them if it is None, as by default. Events which do not use the
+    previous observation should set it to an empty tuple.
+
+    The arrays of the previous observation are reused by the environment, and
+    are overwritten two steps later. Events keeping them for longer must copy
+    them.
     """
 
+    previous_observation_keys: Optional[Tuple[str, ...]] = None
+
     def __init__(
         self,
         reward: float,
@@ -70,11 +171,13 @@ class Event(ABC):
         self.terminal_sufficient = terminal_sufficient
         self.achieved = False
 
-    @abstractmethod
     def check(self, env, previous_observation, action, observation) -> float:
         """Check whether the environment is in the state such that this event
         has occured.
 
+        Subclasses implement either this method or ``check_context``. By
+        default, it calls ``check_context``.
+
         Args:
             env (MiniHack):
                 The MiniHack environment in question.
@@ -87,7 +190,30 @@ class Event(ABC):
         Returns:
             float: The reward.
         """
-        pass
+        return self.check_context(
+            StepContext(env, previous_observation, action, observation)
+        )
+
+    def check_context(self, context: StepContext) -> float:
+        """Check whether this event has occured in the transition described
+        by the given context.
+
+        Reward managers call this method rather than ``check``, unless a
+        subclass overrides ``check``, so that events can share the data
+        derived from the observation. By default, it calls ``check``.
+
+        Args:
+            context (StepContext):
+                The context of the current step.
+        Returns:
+            float: The reward.
+        """
+        return self.check(
+            context.env,
+            context.previous_observation,
+            context.action,
+            context.observation,
+        )
 
     def reset(self):
         """Reset the event, if there is any state necessary."""
@@ -99,8 +225,19 @@ class Event(ABC):
         return self.reward
 
 
-def _standing_on_top(env, location):
-    return not env.screen_contains(location)
+def _event_check(event: Event) -> Callable[[StepContext], float]:
+    """Returns the function checking an event on a step context.
+
+    Events overriding ``check``, the original extension point, are checked
+    through it, as ``Event.check_context`` does.
+    """
+    if type(event).check is Event.check:
+        return event.check_context
+    return partial(Event.check_context, event)
+
+
+def _standing_on_top(context, location):
+    return not context.screen_contains(location)
 
 
 class LocActionEvent(Event):
@@ -108,6 +245,8 @@ class LocActionEvent(Event):
     location.
     """
 
+    previous_observation_keys = ()
+
     def __init__(
         self,
         *args,
@@ -136,16 +275,17 @@ class LocActionEvent(Event):
         self.action = action
         self.status = False
 
-    def check(self, env, previous_observation, action, observation) -> float:
-        del previous_observation, observation
+    def check_context(self, context: StepContext) -> float:
+        action = context.action
         if action == None:
             self.status = False
         else:
-            if env.actions[action] == self.action and _standing_on_top(
-                env, self.loc
+            env_action = context.env.actions[action]
+            if env_action == self.action and _standing_on_top(
+                context, self.loc
             ):
                 self.status = True
-            elif env.actions[action] == Y_cmd and self.status:
+            elif env_action == Y_cmd and self.status:
                 return self._set_achieved()
             else:
                 self.status = False
@@ -159,6 +299,8 @@ class LocActionEvent(Event):
 class LocEvent(Event):
     """An event which checks whether a specified location is reached."""
 
+    previous_observation_keys = ()
+
     def __init__(self, *args, loc: str):
         super().__init__(*args)
         """Initialise the Event.
@@ -178,9 +320,8 @@ class LocEvent(Event):
         """
         self.loc = loc
 
-    def check(self, env, previous_observation, action, observation) -> float:
-        del previous_observation, action, observation
-        if _standing_on_top(env, self.loc):
+    def check_context(self, context: StepContext) -> float:
+        if _standing_on_top(context, self.loc):
             return self._set_achieved()
         return 0.0
 
@@ -188,6 +329,8 @@ class LocEvent(Event):
 class CoordEvent(Event):
     """An event which occurs when reaching certain coordinates."""
 
+    previous_observation_keys = ()
+
     def __init__(self, *args, coordinates: Tuple[int, int]):
         """Initialise the Event.
 
@@ -207,9 +350,8 @@ class CoordEvent(Event):
         super().__init__(*args)
         self.coordinates = coordinates
 
-    def check(self, env, previous_observation, action, observation) -> float:
-        coordinates = tuple(observation[env._blstats_index][:2])
-        if self.coordinates == coordinates:
+    def check_context(self, context: StepContext) -> float:
+        if self.coordinates == context.agent_position:
             return self._set_achieved()
         return 0.0
 
@@ -217,6 +359,8 @@ class CoordEvent(Event):
 class MessageEvent(Event):
     """An event which occurs when any of the `messages` appear."""
 
+    previous_observation_keys = ()
+
     def __init__(self, *args, messages: List[str]):
         """Initialise the Event.
 
@@ -236,19 +380,61 @@ class MessageEvent(Event):
         super().__init__(*args)
         self.messages = messages
 
-    def check(self, env, previous_observation, action, observation) -> float:
-        del previous_observation, action
-        curr_msg = (
-            observation[env._original_observation_keys.index("message")]
-            .tobytes()
-            .decode("utf-8")
-        )
+    def check_context(self, context: StepContext) -> float:
+        curr_msg = context.message
         for msg in self.messages:
             if msg in curr_msg:
                 return self._set_achieved()
         return 0.0
 
 
+class MessageMatcher:
+    """Finds which of many ``MessageEvent``s occur in a message with a single
+    scan of the message.
+
+    All the messages of the events are compiled into one regular expression,
+    which reports the longest message starting at every position of the
+    scanned message. Every message which is contained in a reported one is
+    then known to occur too, so overlapping messages are all found.
+
+    Args:
+        events (List[MessageEvent]):
+            The events to match.
+    """
+
+    def __init__(self, events: List[MessageEvent]):
+        self.events = list(events)
+        event_indices: Dict[str, List[int]] = {}
+        for i, event in enumerate(self.events):
+            for msg in event.messages:
+                event_indices.setdefault(msg, []).append(i)
+
+        # Longest first, so that the longest message at a position is found
+        messages = sorted(event_indices, key=len, reverse=True)
+        self._regex = None
+        if messages:
+            alternatives = "|".join(map(re.escape, messages))
+            self._regex = re.compile(f"(?=({alternatives}))")
+        # The events triggered by each message and all messages it contains
+        self._triggered: Dict[str, List[int]] = {}
+        for msg in messages:
+            indices = set()
+            for other, other_indices in event_indices.items():
+                if other in msg:
+                    indices.update(other_indices)
+            self._triggered[msg] = sorted(indices)
+
+    def match(self, message: str) -> List[MessageEvent]:
+        """Returns the events which have any of their messages in the given
+        message, in the order they were given."""
+        if self._regex is None:
+            return []
+        indices = set()
+        for match in self._regex.finditer(message):
+            indices.update(self._triggered[match.group(1)])
+        return [self.events[i] for i in sorted(indices)]
+
+
 class AbstractRewardManager(ABC):
     """This is the abstract base class for the ``RewardManager`` that is used
     for defining custom reward functions.
@@ -290,11 +476,42 @@ class AbstractRewardManager(ABC):
         """
         raise NotImplementedError
 
+    def check_episode_end_context(self, context: StepContext) -> bool:
+        """Same as ``check_episode_end_call``, for a transition described by
+        a context which is shared with other reward managers.
+
+        By default, it calls ``check_episode_end_call``.
+
+        Args:
+            context (StepContext):
+                The context of the current step.
+        Returns:
+            bool: Boolean whether the episode has ended.
+        """
+        return self.check_episode_end_call(
+            context.env,
+            context.previous_observation,
+            context.action,
+            context.observation,
+        )
+
     @abstractmethod
     def reset(self) -> None:
         """Reset all events, to be called when a new episode occurs."""
         raise NotImplementedError
 
+    def get_previous_observation_keys(self) -> Optional[Set[str]]:
+        """Returns the keys of the previous observation which are used to
+        check for termination and reward.
+
+        The environment only keeps a copy of these keys of the observation
+        before each step. By default, all keys are kept.
+
+        Returns:
+            set or None: The observation keys, or None for all of them.
+        """
+        return None
+
 
 class RewardManager(AbstractRewardManager):
     """This class is used for managing rewards, events and termination for
@@ -320,6 +537,13 @@ class RewardManager(AbstractRewardManager):
     The call of ``_is_episode_end`` in ``MiniHack`` will call
     ``check_episode_end_call`` in this class, which checks for termination and
     accumulates any reward, which is returned and zeroed in ``collect_reward``.
+    The transition is wrapped in a single ``StepContext`` which is passed to
+    every event, so that the data they derive from the observation is only
+    computed once per step. The messages of all ``MessageEvent``s which have
+    not been achieved yet are matched at once by a ``MessageMatcher``, which
+    is rebuilt when events are added or achieved, and on reset. Likewise,
+    ``CoordEvent``s are indexed by their coordinates, so that only the events
+    at the position of the agent are checked.
     """
 
     def __init__(self):
@@ -327,28 +551,60 @@ class RewardManager(AbstractRewardManager):
         self.custom_reward_functions: List[
             Callable[[MiniHack, Any, int, Any], float]
         ] = []
+        self.context_reward_functions: List[
+            Callable[[StepContext], float]
+        ] = []
         self._reward = 0.0
+        self._message_matcher = None
+        self._coord_events: Dict[Tuple[int, int], List[CoordEvent]] = {}
+        self._other_events: List[
+            Tuple[Event, Callable[[StepContext], float]]
+        ] = []
+        self._required_events: List[Event] = []
+        self._sufficient_events: List[Event] = []
+        self._num_compiled_events = 0
+        self._reward_fn_previous_keys: List[Optional[Tuple[str, ...]]] = []
 
         # Only used for GroupedRewardManager
         self.terminal_sufficient = None
         self.terminal_required = None
 
     def add_custom_reward_fn(
-        self, reward_fn: Callable[[MiniHack, Any, int, Any], float]
+        self,
+        reward_fn: Callable[..., float],
+        use_context: bool = False,
+        previous_observation_keys: Optional[Tuple[str, ...]] = None,
     ) -> None:
         """Add a custom reward function which is called every after step to
         calculate reward.
 
         The function should be a callable which takes the environment, previous
         observation, action and current observation and returns a float reward.
+        If ``use_context`` is True, it instead takes the ``StepContext`` of the
+        step, which is shared with the events of the reward manager.
+
+        The arrays of the previous observation are reused by the environment,
+        and are overwritten two steps later, so the function must copy any of
+        them it keeps for longer.
 
         Args:
-            reward_fn (Callable[[MiniHack, Any, int, Any], float]):
+            reward_fn (Callable[..., float]):
                 A reward function which takes an environment, previous
                 observation, action, next observation and returns a reward.
+            use_context (bool):
+                Whether the reward function takes a ``StepContext``. Defaults
+                to False.
+            previous_observation_keys (tuple or None):
+                The keys of the previous observation used by the reward
+                function, e.g. ``()`` if it does not use it. Defaults to None,
+                i.e. all keys.
 
         """
-        self.custom_reward_functions.append(reward_fn)
+        if use_context:
+            self.context_reward_functions.append(reward_fn)
+        else:
+            self.custom_reward_functions.append(reward_fn)
+        self._reward_fn_previous_keys.append(previous_observation_keys)
 
     def add_event(self, event: Event):
         """Add an event to be managed by the reward manager.
@@ -358,6 +614,7 @@ class RewardManager(AbstractRewardManager):
                 The event to be added.
         """
         self.events.append(event)
+        self._message_matcher = None
 
     def _add_message_event(
         self, msgs, reward, repeatable, terminal_required, terminal_sufficient
@@ -702,6 +959,22 @@ class RewardManager(AbstractRewardManager):
             )
         )
 
+    def get_previous_observation_keys(self) -> Optional[Set[str]]:
+        num_reward_fns = len(self.custom_reward_functions) + len(
+            self.context_reward_functions
+        )
+        if len(self._reward_fn_previous_keys) != num_reward_fns:
+            # Reward functions were added without declaring their keys
+            return None
+        keys = set()
+        for declared in self._reward_fn_previous_keys + [
+            event.previous_observation_keys for event in self.events
+        ]:
+            if declared is None:
+                return None
+            keys.update(declared)
+        return keys
+
     def _set_achieved(self, event: Event) -> float:
         if not event.repeatable:
             event.achieved = True
@@ -727,18 +1000,77 @@ class RewardManager(AbstractRewardManager):
     def check_episode_end_call(
         self, env, previous_observation, action, observation
     ) -> bool:
-        reward = 0.0
+        return self.check_episode_end_context(
+            StepContext(env, previous_observation, action, observation)
+        )
+
+    def _compile_events(self):
+        """Splits the events into plain message events, which are matched by
+        a single ``MessageMatcher``, plain coordinate events, which are
+        indexed by their coordinates, and all other events."""
+        message_events, self._other_events = [], []
+        self._coord_events = {}
+        self._required_events = [e for e in self.events if e.terminal_required]
+        self._sufficient_events = [
+            e for e in self.events if e.terminal_sufficient
+        ]
         for event in self.events:
+            # Subclasses may override check or check_context, so they are
+            # checked individually, through the method they override
+            if type(event) is MessageEvent:
+                if not event.achieved:
+                    message_events.append(event)
+            elif type(event) is CoordEvent:
+                if not event.achieved:
+                    coordinates = tuple(int(c) for c in event.coordinates)
+                    self._coord_events.setdefault(coordinates, []).append(
+                        event
+                    )
+            else:
+                self._other_events.append((event, _event_check(event)))
+        self._message_matcher = MessageMatcher(message_events)
+        self._num_compiled_events = len(self.events)
+
+    def check_episode_end_context(self, context: StepContext) -> bool:
+        if (
+            self._message_matcher is None
+            or self._num_compiled_events != len(self.events)
+        ):
+            self._compile_events()
+
+        reward = 0.0
+        for event, check in self._other_events:
             if event.achieved:
                 continue
-            reward += event.check(
-                env, previous_observation, action, observation
-            )
+            reward += check(context)
+
+        matcher = self._message_matcher
+        fired = matcher.match(context.message) if matcher.events else []
+        for event in fired:
+            if event.achieved:
+                continue
+            reward += event._set_achieved()
+            if event.achieved:
+                self._message_matcher = None
+
+        if self._coord_events:
+            coord_events = self._coord_events.get(context.agent_position)
+            for event in list(coord_events or ()):
+                if event.achieved:
+                    continue
+                reward += event._set_achieved()
+                if event.achieved:
+                    coord_events.remove(event)
 
         for custom_reward_function in self.custom_reward_functions:
             reward += custom_reward_function(
-                env, previous_observation, action, observation
+                context.env,
+                context.previous_observation,
+                context.action,
+                context.observation,
             )
+        for context_reward_function in self.context_reward_functions:
+            reward += context_reward_function(context)
         self._reward += reward
         return self._check_complete()
 
@@ -747,17 +1079,13 @@ class RewardManager(AbstractRewardManager):
 
         Requires any event which is sufficient to be achieved, OR all required
         events to be achieved."""
-        result = True
-        for event in self.events:
-            # This event is enough, we're done
-            if event.achieved and event.terminal_sufficient:
-                return True
-            # We need this event and we haven't done it, we're not done
-            if not event.achieved and event.terminal_required:
-                result = False
-
+        if self._num_compiled_events != len(self.events):
+            self._compile_events()
+        # An event which is enough, we're done
+        if any(event.achieved for event in self._sufficient_events):
+            return True
         # We've achieved all terminal_required events, we're done
-        return result
+        return all(event.achieved for event in self._required_events)
 
     def collect_reward(self) -> float:
         result = self._reward
@@ -766,6 +1094,7 @@ class RewardManager(AbstractRewardManager):
 
     def reset(self):
         self._reward = 0.0
+        self._message_matcher = None
         for event in self.events:
             event.reset()
 
@@ -780,11 +1109,9 @@ class SequentialRewardManager(RewardManager):
         self.current_event_idx = 0
         super().__init__()
 
-    def check_episode_end_call(
-        self, env, previous_observation, action, observation
-    ):
+    def check_episode_end_context(self, context: StepContext) -> bool:
         event = self.events[self.current_event_idx]
-        reward = event.check(env, previous_observation, action, observation)
+        reward = _event_check(event)(context)
         if event.achieved:
             self.current_event_idx += 1
         self._reward += reward
@@ -812,10 +1139,25 @@ class GroupedRewardManager(AbstractRewardManager):
     def check_episode_end_call(
         self, env, previous_observation, action, observation
     ) -> bool:
+        return self.check_episode_end_context(
+            StepContext(env, previous_observation, action, observation)
+        )
+
+    def check_episode_end_context(self, context: StepContext) -> bool:
         for reward_manager in self.reward_managers:
-            result = reward_manager.check_episode_end_call(
-                env, previous_observation, action, observation
-            )
+            if type(reward_manager).check_episode_end_call in (
+                RewardManager.check_episode_end_call,
+                GroupedRewardManager.check_episode_end_call,
+            ):
+                result = reward_manager.check_episode_end_context(context)
+            else:
+                # Overrides the original extension point, which is used
+                result = reward_manager.check_episode_end_call(
+                    context.env,
+                    context.previous_observation,
+                    context.action,
+                    context.observation,
+                )
             # This reward manager has completed and it's sufficient so we're
             # done
             if reward_manager.terminal_sufficient and result:
@@ -829,6 +1171,15 @@ class GroupedRewardManager(AbstractRewardManager):
         # we're done
         return True
 
+    def get_previous_observation_keys(self) -> Optional[Set[str]]:
+        keys = set()
+        for reward_manager in self.reward_managers:
+            declared = reward_manager.get_previous_observation_keys()
+            if declared is None:
+                return None
+            keys.update(declared)
+        return keys
+
     def add_reward_manager(
         self,
         reward_manager: AbstractRewardManager,
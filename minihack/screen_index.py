@@ -0,0 +1,71 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+
+from typing import Dict, FrozenSet, List, Tuple
+
+import numpy as np
+
+
+class ScreenDescriptionIndex:
+    """An index of the ``screen_descriptions`` observation.
+
+    The distinct descriptions of the screen are found in a single vectorized
+    pass over the observation, so that only these (usually a few dozen)
+    strings need to be decoded and searched, rather than every cell of the
+    screen. The index keeps a copy of the observation, as NLE updates its
+    observation arrays in place.
+
+    Args:
+        screen_descriptions (np.ndarray):
+            The ``screen_descriptions`` observation, i.e. an array of shape
+            (height, width, description length) of null-terminated strings.
+    """
+
+    def __init__(self, screen_descriptions: np.ndarray):
+        self._screen = screen_descriptions.copy()
+        h, w, length = self._screen.shape
+        cells = self._screen.reshape(h * w, length)
+        # View every cell as one opaque item so cells can be compared at once
+        keys = cells.view(np.dtype((np.void, length))).ravel()
+        _, first, inverse = np.unique(
+            keys, return_index=True, return_inverse=True
+        )
+        self._names = [
+            cells[i].tobytes().split(b"\0", 1)[0].decode("utf-8")
+            for i in first
+        ]
+        self._inverse = inverse.reshape(h, w)
+        self._coordinates = None
+        self.descriptions: FrozenSet[str] = frozenset(self._names)
+
+    def matches(self, screen_descriptions: np.ndarray) -> bool:
+        """Whether the index describes the given screen descriptions."""
+        return np.array_equal(self._screen, screen_descriptions)
+
+    def get(self, x: int, y: int) -> str:
+        """Returns the description of the screen on (x,y) coordinates."""
+        return self._names[self._inverse[y, x]]
+
+    def contains(self, name: str) -> bool:
+        """Whether any description on the screen includes the given name."""
+        return any(name in description for description in self.descriptions)
+
+    def coordinates(self, description: str) -> List[Tuple[int, int]]:
+        """Returns the (x,y) coordinates of all cells with the given
+        description, in row-major order."""
+        if self._coordinates is None:
+            self._coordinates = self._build_coordinates()
+        return self._coordinates.get(description, [])
+
+    def _build_coordinates(self) -> Dict[str, List[Tuple[int, int]]]:
+        flat = self._inverse.ravel()
+        order = np.argsort(flat, kind="stable")
+        bounds = np.searchsorted(flat[order], np.arange(len(self._names) + 1))
+        w = self._inverse.shape[1]
+        coordinates: Dict[str, List[Tuple[int, int]]] = {}
+        for k, name in enumerate(self._names):
+            cells = order[bounds[k] : bounds[k + 1]]
+            coords = coordinates.setdefault(name, [])
+            coords.extend(zip((cells % w).tolist(), (cells // w).tolist()))
+        for coords in coordinates.values():
+            coords.sort(key=lambda c: (c[1], c[0]))
+        return coordinates
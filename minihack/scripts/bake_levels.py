@@ -0,0 +1,179 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+"""Bakes banks of levels of procedurally generated environments, which can
+then be used with the ``level_bank`` argument of MiniHack environments.
+
+For every environment, the script generates the description files of a
+number of levels, compiles them in a pool of processes and writes a
+manifest of the compiled nhdat archives, e.g.
+
+    mh-bake-levels --env MiniHack-Boxoban-Unfiltered-v0 -n 10000
+
+bakes a bank into ``level_banks/MiniHack-Boxoban-Unfiltered-v0``.
+"""
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import gymnasium as gym
+import numpy as np
+from gymnasium.envs.registration import load_env_creator
+
+import minihack  # noqa: F401
+from minihack.base import MiniHack, _nhdat_cache_salt, compile_des_file
+from minihack.level_bank import LEVEL_BANK_VERSION, write_manifest
+
+LEVELS_DIR = "levels"
+
+
+def generates_levels(env_id):
+    """Returns whether a registered environment generates a new level when
+    resetting, i.e. whether it can be baked."""
+    entry_point = gym.spec(env_id).entry_point
+    if isinstance(entry_point, str):
+        entry_point = load_env_creator(entry_point)
+    return (
+        isinstance(entry_point, type)
+        and issubclass(entry_point, MiniHack)
+        and entry_point._generate_des is not MiniHack._generate_des
+    )
+
+
+def _compile(args):
+    des_path, nhdat_path, work_dir = args
+    try:
+        return compile_des_file(des_path, nhdat_path, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bake_levels(env, bank_dir, num_levels, seed=0, num_workers=None):
+    """Generates and compiles a bank of levels of an environment.
+
+    Levels are generated after seeding the environment and the ``random``
+    and ``numpy`` generators, so that baking is reproducible. Identical
+    levels are only compiled once.
+
+    Args:
+        env (MiniHack): The procedurally generated environment.
+        bank_dir (str): The directory of the bank, created if needed.
+        num_levels (int): The number of levels to generate.
+        seed (int): The seed used for generating the levels. Defaults to 0.
+        num_workers (int or None): The number of processes compiling the
+            levels. If None, the number of CPUs is used. Defaults to None.
+    Returns:
+        list: The entries of the levels in the manifest of the bank.
+    """
+    env = env.unwrapped
+    random.seed(seed)
+    np.random.seed(seed)
+    env.seed(seed, seed, reseed=False)
+    des_files = [env._generate_des() for _ in range(num_levels)]
+
+    os.makedirs(os.path.join(bank_dir, LEVELS_DIR), exist_ok=True)
+    levels, tasks = [], {}
+    for des_file in des_files:
+        key = hashlib.sha256(des_file.encode("utf-8")).hexdigest()[:16]
+        level = {
+            "des": os.path.join(LEVELS_DIR, key + ".des"),
+            "nhdat": os.path.join(LEVELS_DIR, key + ".nhdat"),
+        }
+        levels.append(level)
+        if key in tasks:
+            continue
+        des_path = os.path.join(bank_dir, level["des"])
+        with open(des_path, "w") as f:
+            f.write(des_file)
+        tasks[key] = (
+            os.path.abspath(des_path),
+            os.path.abspath(os.path.join(bank_dir, level["nhdat"])),
+            tempfile.mkdtemp(dir=bank_dir),
+        )
+
+    with ProcessPoolExecutor(num_workers) as pool:
+        results = list(pool.map(_compile, tasks.values()))
+    if not all(results):
+        raise RuntimeError(
+            f"{results.count(False)} levels couldn't be compiled"
+        )
+
+    write_manifest(
+        bank_dir,
+        dict(
+            version=LEVEL_BANK_VERSION,
+            env_id=env.spec.id if env.spec is not None else None,
+            seed=seed,
+            salt=_nhdat_cache_salt(),
+            levels=levels,
+        ),
+    )
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--env",
+        nargs="+",
+        default=None,
+        help="The IDs of the environments to bake. Defaults to all the "
+        "registered MiniHack environments which generate levels.",
+    )
+    parser.add_argument(
+        "-n",
+        "--num_levels",
+        type=int,
+        default=1000,
+        help="The number of levels of every environment.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        default="level_banks",
+        help="The directory of the banks, one per environment.",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="The seed of the levels."
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=None,
+        help="The number of compiling processes. Defaults to the number of "
+        "CPUs.",
+    )
+    flags = parser.parse_args()
+
+    env_ids = flags.env
+    if env_ids is None:
+        env_ids = [
+            env_id
+            for env_id in gym.envs.registry.keys()
+            if env_id.startswith("MiniHack") and generates_levels(env_id)
+        ]
+    for env_id in env_ids:
+        try:
+            env = gym.make(env_id)
+        except ModuleNotFoundError as e:
+            # e.g. gym_minigrid is not installed
+            print(f"Skipping {env_id}: {e}")
+            continue
+        bank_dir = os.path.join(flags.output_dir, env_id)
+        try:
+            bake_levels(
+                env,
+                bank_dir,
+                flags.num_levels,
+                seed=flags.seed,
+                num_workers=flags.num_workers,
+            )
+        finally:
+            env.close()
+        print(f"Baked {flags.num_levels} levels of {env_id} into {bank_dir}")
+
+
+if __name__ == "__main__":
+    main()
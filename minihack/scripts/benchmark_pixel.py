@@ -0,0 +1,121 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import argparse
+import functools
+import timeit
+
+import numpy as np
+
+from minihack.tiles import GlyphMapper
+from nle.nethack import MAX_GLYPH
+
+
+def loop_to_rgb(glyph_mapper, glyphs):
+    """Renders glyphs cell by cell, as GlyphMapper used to do."""
+    cols = None
+    col = None
+
+    for i in range(glyphs.shape[1]):
+        for j in range(glyphs.shape[0]):
+            rgb = glyph_mapper.glyph_id_to_rgb(glyphs[j, i])
+            if col is None:
+                col = rgb
+            else:
+                col = np.concatenate((col, rgb))
+
+        if cols is None:
+            cols = col
+        else:
+            cols = np.concatenate((cols, col), axis=1)
+        col = None
+
+    return cols
+
+
+def report(name, fn, number):
+    seconds = timeit.timeit(fn, number=number) / number
+    print("{:<32} {:10.3f} ms".format(name, seconds * 1000))
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the rendering of pixel observations."
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=32,
+        help="Number of observations in the batched benchmark.",
+    )
+    parser.add_argument(
+        "--number",
+        type=int,
+        default=20,
+        help="Number of times each rendering is repeated.",
+    )
+    flags = parser.parse_args()
+
+    glyph_mapper = GlyphMapper()
+    rng = np.random.RandomState(0)
+    for name, shape in [("pixel_crop", (9, 9)), ("pixel", (21, 79))]:
+        glyphs = rng.randint(0, MAX_GLYPH, size=shape)
+        out = np.empty((shape[0] * 16, shape[1] * 16, 3), dtype=np.uint8)
+        old = report(
+            f"{name} (cell by cell)",
+            functools.partial(loop_to_rgb, glyph_mapper, glyphs),
+            flags.number,
+        )
+        new = report(
+            f"{name} (atlas)",
+            functools.partial(glyph_mapper.to_rgb, glyphs),
+            flags.number,
+        )
+        report(
+            f"{name} (atlas, out)",
+            functools.partial(glyph_mapper.to_rgb, glyphs, out=out),
+            flags.number,
+        )
+        print("{:<32} {:10.1f}x".format("speedup", old / new))
+
+    # Downsampled and grayscale observations, once their atlases are built
+    glyphs = rng.randint(0, MAX_GLYPH, size=(21, 79))
+    for name, tile_size, gray in [
+        ("pixel_8", 8, False),
+        ("pixel_4", 4, False),
+        ("pixel_gray", 16, True),
+        ("pixel_4_gray", 4, True),
+    ]:
+        glyph_mapper.to_rgb(glyphs, tile_size=tile_size, gray=gray)
+        report(
+            f"{name} (atlas)",
+            functools.partial(
+                glyph_mapper.to_rgb, glyphs, tile_size=tile_size, gray=gray
+            ),
+            flags.number,
+        )
+
+    # Successive observations, which differ in a few cells
+    frames = [rng.randint(0, MAX_GLYPH, size=(21, 79))]
+    for _ in range(flags.number):
+        glyphs = frames[-1].copy()
+        cells = rng.choice(glyphs.size, 5, replace=False)
+        glyphs.flat[cells] = rng.randint(0, MAX_GLYPH, size=5)
+        frames.append(glyphs)
+    glyph_mapper.to_rgb_incremental(frames[0])
+    frames = iter(frames[1:])
+    report(
+        "pixel (incremental, 5 cells)",
+        lambda: glyph_mapper.to_rgb_incremental(next(frames)),
+        flags.number,
+    )
+
+    glyphs = rng.randint(0, MAX_GLYPH, size=(flags.batch_size, 21, 79))
+    report(
+        f"pixel batch of {flags.batch_size} (atlas)",
+        lambda: glyph_mapper.to_rgb(glyphs),
+        flags.number,
+    )
+
+
+if __name__ == "__main__":
+    main()
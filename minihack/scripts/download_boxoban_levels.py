@@ -4,6 +4,8 @@ import os
 import zipfile
 import pkg_resources
 
+from minihack.envs.boxohack import convert_boxoban_levels
+
 DESTINATION_PATH = pkg_resources.resource_filename("minihack", "dat")
 BOXOBAN_REPO_URL = (
     "https://github.com/deepmind/boxoban-levels/archive/refs/heads/master.zip"
@@ -24,6 +26,12 @@ def download_boxoban_levels():
 
     os.remove(zip_file)
 
+    print("Packing Boxoban levels...")
+    levels_path = os.path.join(DESTINATION_PATH, "boxoban-levels-master")
+    for dir_path, _, files in os.walk(levels_path):
+        if any(f.endswith(".txt") for f in files):
+            convert_boxoban_levels(dir_path)
+
 
 if __name__ == "__main__":
     download_boxoban_levels()
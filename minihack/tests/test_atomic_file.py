@@ -0,0 +1,49 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import os
+import stat
+
+import pytest
+
+from minihack.atomic_file import AtomicFile, atomic_link, atomic_write
+
+
+class TestAtomicFile:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_write(self):
+        atomic_write("file", lambda f: f.write(b"old"))
+        assert stat.S_IMODE(os.stat("file").st_mode) == 0o644
+        atomic_write("file", lambda f: f.write("new"), binary=False)
+        with open("file") as f:
+            assert f.read() == "new"
+
+        def write_fn(f):
+            f.write(b"partial")
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            atomic_write("file", write_fn)
+        with open("file") as f:
+            assert f.read() == "new"
+        assert os.listdir(".") == ["file"]
+
+    def test_discard(self):
+        atomic_file = AtomicFile("file", suffix=".db", mode=0o600)
+        assert atomic_file.tmp_path.endswith(".db")
+        atomic_file.discard()
+        assert os.listdir(".") == []
+        with AtomicFile("file", mode=0o600) as atomic_file:
+            assert os.path.isfile(atomic_file.tmp_path)
+        assert stat.S_IMODE(os.stat("file").st_mode) == 0o600
+
+    def test_link(self):
+        atomic_write("src", lambda f: f.write(b"level"))
+        atomic_link("src", "dest")
+        assert os.path.samefile("src", "dest")
+        with pytest.raises(FileNotFoundError):
+            atomic_link("missing", "dest")
+        assert sorted(os.listdir(".")) == ["dest", "src"]
@@ -0,0 +1,127 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import errno
+import os
+
+import numpy as np
+import pytest
+
+from minihack.envs import boxohack
+from minihack.envs.boxohack import (
+    BoxoHack,
+    load_boxoban_levels,
+    load_packed_levels,
+)
+
+LEVELS = [
+    [
+        "##########",
+        "##########",
+        "##  ######",
+        "## .$  ###",
+        "##  #@ ###",
+        "### #$ ###",
+        "###  . ###",
+        "##########",
+        "##########",
+        "##########",
+    ],
+    [
+        "##########",
+        "#    #####",
+        "# $$ . ###",
+        "#@ #   ###",
+        "#  # . ###",
+        "##########",
+        "##########",
+        "##########",
+        "##########",
+        "##########",
+    ],
+]
+
+
+def _reference_env_map(level):
+    """Converts a level like BoxoHack used to, character by character."""
+    info = {"fountains": [], "boulders": []}
+    level = list(level)
+    for row in range(len(level)):
+        for col in range(len(level[row])):
+            if level[row][col] == "$":
+                info["boulders"].append((col, row))
+            if level[row][col] == ".":
+                info["fountains"].append((col, row))
+        if "@" in level[row]:
+            info["player"] = (level[row].index("@"), row)
+        for old, new in [("@", "."), (" ", "."), ("#", "F"), ("$", ".")]:
+            level[row] = level[row].replace(old, new)
+    return "\n".join(level), info
+
+
+@pytest.fixture
+def levels_path(tmpdir):
+    path = tmpdir.mkdir("unfiltered").mkdir("train")
+    for i, level in enumerate(LEVELS):
+        # The last file does not end with an empty line
+        end = "\n" if i == 0 else ""
+        path.join(f"{i:03d}.txt").write(
+            f"; {i}\n" + "\n".join(level) + "\n" + end
+        )
+    return str(path)
+
+
+class TestBoxoHack:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_packed_levels(self, levels_path):
+        levels = load_packed_levels(levels_path)
+        assert isinstance(levels, np.memmap)
+        assert levels.shape == (2, 10, 10) and levels.dtype == np.uint8
+        assert load_packed_levels(levels_path) is levels
+        assert os.path.isfile(os.path.join(levels_path, "levels.json"))
+        for packed, level in zip(levels, load_boxoban_levels(levels_path)):
+            assert packed.tobytes().decode() == level.replace("\n", "")
+
+        for packed, level in zip(levels, LEVELS):
+            map, info = BoxoHack.get_env_map(None, packed)
+            expected_map, expected_info = _reference_env_map(level)
+            assert map == expected_map
+            assert info == expected_info
+
+    def test_packed_levels_fallback(self, levels_path, monkeypatch):
+        def convert_boxoban_levels(cur_levels_path):
+            raise OSError(errno.EROFS, "Read-only file system")
+
+        monkeypatch.setattr(
+            boxohack, "convert_boxoban_levels", convert_boxoban_levels
+        )
+        levels = load_packed_levels(levels_path)
+        assert not isinstance(levels, np.memmap)
+        assert levels.shape == (2, 10, 10)
+        assert not os.path.exists(os.path.join(levels_path, "levels.npy"))
+
+    def test_rollout(self, tmpdir, monkeypatch):
+        path = tmpdir.mkdir("single").mkdir("train")
+        path.join("000.txt").write("; 0\n" + "\n".join(LEVELS[0]) + "\n")
+        monkeypatch.setattr(boxohack, "LEVELS_PATH", str(tmpdir))
+        env = BoxoHack(
+            level_set="single",
+            level_mode="train",
+            reward_shaping_coefficient=0.1,
+            penalty_time=-0.001,
+        )
+        N, E, S, W = range(4)
+        for _ in range(2):
+            env.reset()
+            rewards = []
+            for action in [S, N, E, N, W, W]:
+                _, reward, done, _, info = env.step(action)
+                rewards.append(reward)
+            assert done
+            assert info["end_status"] == env.StepStatus.TASK_SUCCESSFUL
+            # Pushing the first boulder onto a fountain is rewarded
+            assert rewards == pytest.approx([0.099] + [-0.001] * 4 + [1])
+        env.close()
@@ -0,0 +1,94 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import gymnasium as gym
+import numpy as np
+import pytest
+
+import minihack  # noqa: F401
+from minihack.crop import ObservationCropper
+
+
+def _reference_crop(obs, loc, height, width, pad):
+    """Crops by padding the whole observation."""
+    dh, dw = height // 2, width // 2
+    pad_width = [(dh, dh), (dw, dw)] + [(0, 0)] * (obs.ndim - 2)
+    obs = np.pad(obs, pad_width, mode="constant", constant_values=pad)
+    x, y = loc
+    return obs[y : y + height, x : x + width]
+
+
+@pytest.mark.parametrize("height,width", [(9, 9), (5, 11), (45, 3)])
+def test_crop(height, width):
+    rng = np.random.RandomState(0)
+    observation = {
+        "glyphs": rng.randint(0, 5976, size=(21, 79)).astype(np.int16),
+        "screen_descriptions": rng.randint(
+            0, 128, size=(21, 79, 80)
+        ).astype(np.uint8),
+        "tty_chars": rng.randint(0, 256, size=(24, 80)).astype(np.uint8),
+        "blstats": np.zeros(27, dtype=np.int64),
+        "tty_cursor": np.zeros(2, dtype=np.uint8),
+    }
+    keys = ["glyphs_crop", "screen_descriptions_crop", "tty_chars_crop"]
+    cropper = ObservationCropper(height, width, pad=7)
+    for x, y in [(0, 0), (78, 20), (40, 10), (3, 19), (0, 20)]:
+        observation["blstats"][:2] = x, y
+        observation["tty_cursor"][:] = y, x
+        crops = cropper.crop(observation, keys)
+        for key in keys:
+            orig_key = key.replace("_crop", "")
+            expected = _reference_crop(
+                observation[orig_key], (x, y), height, width, 7
+            )
+            np.testing.assert_array_equal(crops[key], expected)
+
+
+def test_set_buffers():
+    cropper = ObservationCropper(3, 3)
+    observation = {
+        "glyphs": np.arange(21 * 79).reshape(21, 79),
+        "blstats": np.array([1, 1]),
+    }
+    batch = np.zeros((2, 3, 3), dtype=np.int64)
+    cropper.set_buffers({"glyphs_crop": batch[1]})
+    crops = cropper.crop(observation, ["glyphs_crop"])
+    assert crops["glyphs_crop"].base is batch
+    np.testing.assert_array_equal(batch[1], observation["glyphs"][:3, :3])
+    assert not batch[0].any()
+
+    with pytest.raises(ValueError):
+        cropper.set_buffers({"glyphs_crop": np.zeros((3, 5))})
+
+
+class TestCroppedObservations:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_screen_descriptions_crop(self):
+        env = gym.make(
+            "MiniHack-River-v0",
+            observation_keys=("screen_descriptions_crop", "blstats"),
+            obs_crop_h=5,
+            obs_crop_w=7,
+        )
+        obs, _ = env.reset()
+        assert env.observation_space.contains(obs)
+        unwrapped = env.unwrapped
+        x, y = obs["blstats"][:2]
+        for j in range(5):
+            for i in range(7):
+                description = (
+                    obs["screen_descriptions_crop"][j, i]
+                    .tobytes()
+                    .split(b"\0", 1)[0]
+                    .decode("utf-8")
+                )
+                expected = ""
+                if 0 <= y + j - 2 < 21 and 0 <= x + i - 3 < 79:
+                    expected = unwrapped.get_screen_description(
+                        x + i - 3, y + j - 2
+                    )
+                assert description == expected
+        env.close()
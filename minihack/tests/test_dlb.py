@@ -0,0 +1,79 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import os
+import shutil
+import subprocess
+
+import gymnasium as gym
+import pytest
+
+import minihack  # noqa: F401
+from minihack.base import HACKDIR, LEV_COMP, LIB_DIR, PATH_DAT_DIR
+from minihack.dlb import DlbArchive
+
+DLB = os.path.join(HACKDIR, "dlb")
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _dlb_tool_archive(lib_dir):
+    """Packs every file of lib_dir with the dlb tool of NetHack."""
+    files = sorted(os.listdir(lib_dir))
+    subprocess.check_call([DLB, "cf", "nhdat"] + files, cwd=lib_dir)
+    return _read(os.path.join(lib_dir, "nhdat"))
+
+
+@pytest.mark.parametrize("des_file", ["chest.des", "mazewalk.des"])
+class TestDlbArchive:
+    @pytest.fixture
+    def lib_dir(self, tmpdir, des_file):
+        """A copy of the minihack lib directory with a compiled level."""
+        lib_dir = str(tmpdir.join("lib"))
+        shutil.copytree(LIB_DIR, lib_dir)
+        subprocess.check_call(
+            [LEV_COMP, os.path.join(PATH_DAT_DIR, des_file)], cwd=lib_dir
+        )
+        return lib_dir
+
+    def test_same_as_dlb_tool(self, lib_dir):
+        archive = DlbArchive.from_dir(lib_dir)
+        assert archive.tobytes() == _dlb_tool_archive(lib_dir)
+
+    def test_replace_same_as_dlb_tool(self, lib_dir):
+        base = DlbArchive.from_dir(LIB_DIR)
+        level = {"mylevel.lev": _read(os.path.join(lib_dir, "mylevel.lev"))}
+        archive = base.replace(level)
+        assert archive.tobytes() == _dlb_tool_archive(lib_dir)
+        assert base.names() == sorted(os.listdir(LIB_DIR))
+
+    def test_read(self, lib_dir, tmpdir):
+        names = sorted(os.listdir(lib_dir))
+        data = _dlb_tool_archive(lib_dir)
+        archive = DlbArchive.read(os.path.join(lib_dir, "nhdat"))
+        assert archive.names() == names
+        for name in os.listdir(LIB_DIR):
+            assert archive[name] == _read(os.path.join(LIB_DIR, name))
+        assert archive.tobytes() == data
+
+        path = str(tmpdir.join("nhdat"))
+        archive.write(path)
+        assert _read(path) == data
+
+
+def test_read_nle_nhdat():
+    data = _read(os.path.join(HACKDIR, "nhdat"))
+    archive = DlbArchive.frombytes(data)
+    assert "dungeon" in archive
+    assert archive.tobytes() == data
+
+
+def test_env_nhdat(tmpdir):
+    with tmpdir.as_cwd():
+        env = gym.make("MiniHack-Room-5x5-v0")
+        nhdat = DlbArchive.read(
+            os.path.join(env.unwrapped.nethack._vardir, "nhdat")
+        )
+        assert nhdat.names() == ["dungeon", "mylevel.lev", "quest.dat"]
+        env.close()
@@ -0,0 +1,130 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import os
+import tempfile
+from types import SimpleNamespace
+
+import gymnasium as gym
+import numpy as np
+import pytest
+
+import minihack  # noqa: F401
+from minihack.envs import boxohack
+from minihack.fork_server import ForkServerResetPool
+from minihack.tests.test_boxohack import LEVELS
+
+ENV_ID = "MiniHack-Room-Random-5x5-v0"
+ACTIONS = [0, 1, 2, 3, 4, 5, 6, 7]
+
+
+def _make_env():
+    return gym.make(ENV_ID, seeds=[1, 2])
+
+
+class FailingEnv(gym.Env):
+    """An environment which can't be reset."""
+
+    observation_space = gym.spaces.Discrete(1)
+    action_space = gym.spaces.Discrete(1)
+    _level_seeds = [1, 2]
+
+    def __init__(self):
+        self.nethack = SimpleNamespace(_vardir=tempfile.mkdtemp(dir="."))
+
+    def seed(self, core=None, disp=None, reseed=False):
+        pass
+
+    def reset(self, *args, **kwargs):
+        raise ValueError("The level can't be reset")
+
+
+def _fail():
+    raise ValueError("The environment can't be made")
+
+
+def _rollout(env, **kwargs):
+    obs, _ = env.reset(**kwargs)
+    trajectory = [obs["glyphs"].copy()]
+    for action in ACTIONS:
+        obs, _, done, truncated, _ = env.step(action)
+        trajectory.append(obs["glyphs"].copy())
+        if done or truncated:
+            break
+    return trajectory
+
+
+class TestForkServerResetPool:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_per_seed(self):
+        pool = ForkServerResetPool(_make_env, num_parked=1, per_seed=True)
+        env = _make_env().unwrapped
+        assert pool.observation_space == env.observation_space
+        for seed in [1, 2, 1]:
+            env.seed(seed, seed, reseed=False)
+            expected = _rollout(env, sample_seed=False)
+            # Every child starts from the same level start
+            for _ in range(2):
+                trajectory = _rollout(pool, seed=seed)
+                assert len(trajectory) == len(expected)
+                for glyphs, expected_glyphs in zip(trajectory, expected):
+                    np.testing.assert_array_equal(glyphs, expected_glyphs)
+        with pytest.raises(ValueError):
+            pool.reset(seed=3)
+        env.close()
+        pool.close()
+
+    def test_rollout(self):
+        pool = ForkServerResetPool(_make_env)
+        with pytest.raises(RuntimeError):
+            pool.step(0)
+        for _ in range(4):
+            trajectory = _rollout(pool)
+            assert pool.observation_space["glyphs"].contains(trajectory[-1])
+        assert pool.call("get_prefetch_stats") is None
+        with pytest.raises(AttributeError):
+            pool.call("missing_method")
+        with pytest.raises(ValueError):
+            pool.reset(seed=1)
+        pool.close()
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match="can't be made"):
+            ForkServerResetPool(_fail)
+        for per_seed in [False, True]:
+            pool = ForkServerResetPool(FailingEnv, per_seed=per_seed)
+            # The template keeps running after failing to reset
+            for _ in range(3):
+                with pytest.raises(ValueError, match="can't be reset"):
+                    pool.reset()
+            pool.close()
+
+    def test_generated_levels(self, tmpdir, monkeypatch):
+        path = tmpdir.mkdir("single").mkdir("train")
+        path.join("000.txt").write("; 0\n" + "\n".join(LEVELS[0]) + "\n")
+        monkeypatch.setattr(boxohack, "LEVELS_PATH", str(tmpdir))
+        # The game files of the templates and children are created there
+        vardirs = tmpdir.mkdir("vardirs")
+        monkeypatch.setattr(tempfile, "tempdir", str(vardirs))
+        pool = ForkServerResetPool(
+            lambda: boxohack.BoxoHack(level_set="single", level_mode="train"),
+            num_parked=3,
+        )
+        N, E, S, W = range(4)
+        success = boxohack.BoxoHack.StepStatus.TASK_SUCCESSFUL
+        for _ in range(3):
+            pool.reset()
+            # The template regenerates the level for the next children
+            # while the current one plays
+            for action in [S, N, E, N, W, W]:
+                _, _, done, _, info = pool.step(action)
+            assert done
+            assert info["end_status"] == success
+        # The directory of the template, its link and the copies of the
+        # children
+        assert len(os.listdir(vardirs)) > 2
+        pool.close()
+        assert os.listdir(vardirs) == []
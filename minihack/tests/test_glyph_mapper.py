@@ -0,0 +1,181 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import os
+import stat
+
+import gymnasium as gym
+import numpy as np
+import pytest
+
+import minihack  # noqa: F401
+from minihack.scripts.benchmark_pixel import loop_to_rgb
+from minihack.tiles import GlyphMapper, MAXMONTILE, MAXOTHTILE
+from minihack.tiles import glyph_mapper as glyph_mapper_module
+from minihack.tiles.glyph_mapper import convert_tiles, get_tile_atlas
+from nle.nethack import MAX_GLYPH
+
+
+@pytest.fixture(scope="module")
+def glyph_mapper():
+    return GlyphMapper()
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (9, 9), (21, 79), (4, 7)])
+def test_to_rgb(glyph_mapper, shape):
+    glyphs = np.random.RandomState(0).randint(0, MAX_GLYPH, size=shape)
+    rgb = glyph_mapper.to_rgb(glyphs)
+    assert rgb.dtype == np.uint8
+    np.testing.assert_array_equal(rgb, loop_to_rgb(glyph_mapper, glyphs))
+
+
+def test_to_rgb_batch(glyph_mapper):
+    glyphs = np.random.RandomState(0).randint(0, MAX_GLYPH, size=(3, 5, 7))
+    out = np.zeros((3, 80, 112, 3), dtype=np.uint8)
+    assert glyph_mapper.to_rgb(glyphs, out=out) is out
+    for i in range(3):
+        np.testing.assert_array_equal(out[i], glyph_mapper.to_rgb(glyphs[i]))
+
+    with pytest.raises(ValueError):
+        glyph_mapper.to_rgb(glyphs, out=out[:2])
+
+
+def test_shared_atlas(glyph_mapper, tmpdir):
+    assert GlyphMapper().atlas is glyph_mapper.atlas
+    assert isinstance(glyph_mapper.atlas, np.memmap)
+    assert not glyph_mapper.atlas.flags.writeable
+
+    atlas_path = str(tmpdir.join("tiles.npy"))
+    convert_tiles(atlas_path=atlas_path)
+    atlas = np.load(atlas_path)
+    assert atlas.shape[1:] == (16, 16, 3)
+    assert len(atlas) > MAXOTHTILE
+    assert atlas.dtype == np.uint8
+    np.testing.assert_array_equal(atlas, glyph_mapper.atlas)
+
+    tiles = glyph_mapper.tiles
+    assert glyph_mapper.tiles is tiles
+    for tile_id in [0, MAXMONTILE, MAXOTHTILE]:
+        np.testing.assert_array_equal(tiles[tile_id], atlas[tile_id])
+
+
+def test_atlas_fallback(glyph_mapper, tmpdir, monkeypatch):
+    atlas_path = str(tmpdir.join("tiles.npy"))
+    convert_tiles(atlas_path=atlas_path)
+    assert stat.S_IMODE(os.stat(atlas_path).st_mode) == 0o644
+
+    # The atlas can't be written, and then can't be read
+    monkeypatch.setattr(
+        glyph_mapper_module,
+        "TILE_ATLAS_PATH",
+        str(tmpdir.join("missing", "tiles.npy")),
+    )
+    atlas = glyph_mapper_module._open_tile_atlas()
+    assert not isinstance(atlas, np.memmap)
+    np.testing.assert_array_equal(atlas, glyph_mapper.atlas)
+    monkeypatch.setattr(
+        glyph_mapper_module, "TILE_ATLAS_PATH", str(tmpdir.mkdir("atlas"))
+    )
+    atlas = glyph_mapper_module._open_tile_atlas()
+    np.testing.assert_array_equal(atlas, glyph_mapper.atlas)
+
+
+def test_to_rgb_incremental():
+    glyph_mapper = GlyphMapper()
+    rng = np.random.RandomState(0)
+    glyphs = rng.randint(0, MAX_GLYPH, size=(21, 79))
+    frame = glyph_mapper.to_rgb_incremental(glyphs)
+    np.testing.assert_array_equal(frame, glyph_mapper.to_rgb(glyphs))
+
+    for num_changed in [0, 1, 5, 500, 1659]:
+        glyphs = glyphs.copy()
+        cells = rng.choice(glyphs.size, num_changed, replace=False)
+        glyphs.flat[cells] = rng.randint(0, MAX_GLYPH, size=num_changed)
+        # The image is updated in place
+        assert glyph_mapper.to_rgb_incremental(glyphs) is frame
+        np.testing.assert_array_equal(frame, glyph_mapper.to_rgb(glyphs))
+
+    glyph_mapper.reset_incremental()
+    glyphs = rng.randint(0, MAX_GLYPH, size=(21, 79))
+    assert glyph_mapper.to_rgb_incremental(glyphs) is frame
+    np.testing.assert_array_equal(frame, glyph_mapper.to_rgb(glyphs))
+
+    glyphs = rng.randint(0, MAX_GLYPH, size=(9, 9))
+    frame = glyph_mapper.to_rgb_incremental(glyphs)
+    np.testing.assert_array_equal(frame, glyph_mapper.to_rgb(glyphs))
+
+
+@pytest.mark.parametrize("tile_size,gray", [(8, False), (4, True), (1, True)])
+def test_downsampled_atlas(glyph_mapper, tile_size, gray):
+    atlas = get_tile_atlas(tile_size, gray)
+    assert get_tile_atlas(tile_size, gray) is atlas
+    assert atlas.shape[1:] == (tile_size, tile_size, 1 if gray else 3)
+
+    # Each pixel is the mean of a block of pixels of the full tiles
+    k = 16 // tile_size
+    tile = glyph_mapper.atlas[MAXMONTILE].astype(np.float64)
+    if gray:
+        tile = tile @ [[0.299], [0.587], [0.114]]
+    block = tile[-k:, -k:].mean(axis=(0, 1))
+    np.testing.assert_allclose(atlas[MAXMONTILE, -1, -1], block, atol=1)
+
+    glyphs = np.random.RandomState(0).randint(0, MAX_GLYPH, size=(5, 7))
+    rgb = glyph_mapper.to_rgb(glyphs, tile_size=tile_size, gray=gray)
+    assert rgb.shape == (5 * tile_size, 7 * tile_size, atlas.shape[-1])
+    np.testing.assert_array_equal(
+        rgb[tile_size : 2 * tile_size, :tile_size],
+        atlas[glyph_mapper.glyph2tile[glyphs[1, 0]]],
+    )
+    frame = glyph_mapper.to_rgb_incremental(glyphs, tile_size, gray)
+    np.testing.assert_array_equal(frame, rgb)
+
+    with pytest.raises(ValueError):
+        get_tile_atlas(3)
+
+
+class TestPixelObservation:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_rollout(self, glyph_mapper):
+        env = gym.make(
+            "MiniHack-River-Monster-v0",
+            observation_keys=("glyphs", "pixel", "pixel_crop"),
+        )
+        for _ in range(2):
+            obs, _ = env.reset()
+            for _ in range(20):
+                np.testing.assert_array_equal(
+                    obs["pixel"], glyph_mapper.to_rgb(obs["glyphs"])
+                )
+                assert env.observation_space.contains(obs)
+                obs, _, done, _, _ = env.step(env.action_space.sample())
+                if done:
+                    break
+        env.close()
+
+    def test_downsampled(self, glyph_mapper):
+        keys = ("glyphs", "pixel_8", "pixel_gray", "pixel_crop_4_gray")
+        env = gym.make("MiniHack-River-Monster-v0", observation_keys=keys)
+        spaces = env.observation_space
+        assert spaces["pixel_8"].shape == (168, 632, 3)
+        assert spaces["pixel_gray"].shape == (336, 1264, 1)
+        assert spaces["pixel_crop_4_gray"].shape == (36, 36, 1)
+        obs, _ = env.reset()
+        for _ in range(10):
+            assert spaces.contains(obs)
+            for key, tile_size, gray in [
+                ("pixel_8", 8, False),
+                ("pixel_gray", 16, True),
+            ]:
+                np.testing.assert_array_equal(
+                    obs[key],
+                    glyph_mapper.to_rgb(
+                        obs["glyphs"], tile_size=tile_size, gray=gray
+                    ),
+                )
+            obs, _, done, _, _ = env.step(env.action_space.sample())
+            if done:
+                break
+        env.close()
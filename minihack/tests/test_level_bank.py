@@ -0,0 +1,94 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import filecmp
+import json
+import os
+import random
+
+import pytest
+
+import minihack.base
+from minihack import LevelGenerator, MiniHackNavigation
+from minihack.level_bank import LEVEL_BANK_MANIFEST, LevelBank
+from minihack.scripts.bake_levels import bake_levels, generates_levels
+
+
+class MiniHackRandomRoom(MiniHackNavigation):
+    """A procedurally generated room with a random size."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, des_file=self._generate_des(), **kwargs)
+
+    def _generate_des(self):
+        size = random.randint(3, 10)
+        lvl_gen = LevelGenerator(w=size, h=size)
+        lvl_gen.add_goal_pos()
+        return lvl_gen.get_des()
+
+    def reset(self, *args, **kwargs):
+        self._update_generated_level()
+        return super().reset(*args, **kwargs)
+
+
+class TestLevelBank:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_bake(self):
+        env = MiniHackRandomRoom()
+        levels = bake_levels(env, "bank", 6, seed=1, num_workers=2)
+        assert bake_levels(env, "bank2", 6, seed=1, num_workers=1) == levels
+        env.close()
+
+        bank = LevelBank("bank", salt=minihack.base._nhdat_cache_salt())
+        assert len(bank) == 6
+        for i, level in enumerate(levels):
+            assert os.path.isfile(os.path.join("bank", level["nhdat"]))
+            assert "MAZE" in bank.des_file(i)
+        # Only the archives remain next to the manifest
+        assert sorted(os.listdir("bank")) == ["levels", LEVEL_BANK_MANIFEST]
+
+        assert generates_levels("MiniHack-Boxoban-Unfiltered-v0")
+        assert not generates_levels("MiniHack-Room-5x5-v0")
+
+    def test_rollout(self, monkeypatch):
+        env = MiniHackRandomRoom()
+        bake_levels(env, "bank", 4, num_workers=1)
+        env.close()
+
+        def compile_des_file(*args):
+            raise AssertionError("Levels of a bank shouldn't be compiled")
+
+        monkeypatch.setattr(
+            minihack.base, "compile_des_file", compile_des_file
+        )
+        env = MiniHackRandomRoom(level_bank="bank")
+        bank = LevelBank("bank")
+        archives = [
+            os.path.join("bank", level["nhdat"]) for level in bank.levels
+        ]
+        for _ in range(3):
+            env.reset()
+            nhdat = os.path.join(env.nethack._vardir, "nhdat")
+            assert any(filecmp.cmp(nhdat, a, shallow=False) for a in archives)
+            for _ in range(5):
+                _, _, done, _, _ = env.step(env.action_space.sample())
+                if done:
+                    break
+        env.close()
+
+    def test_salt(self):
+        env = MiniHackRandomRoom()
+        bake_levels(env, "bank", 1, num_workers=1)
+        env.close()
+        with open(os.path.join("bank", LEVEL_BANK_MANIFEST)) as f:
+            manifest = json.load(f)
+        manifest["salt"] = "nle-0.0.0"
+        with open(os.path.join("bank", LEVEL_BANK_MANIFEST), "w") as f:
+            json.dump(manifest, f)
+        with pytest.raises(ValueError):
+            MiniHackRandomRoom(level_bank="bank")
+        with pytest.raises(FileNotFoundError):
+            LevelBank("missing")
@@ -0,0 +1,127 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from minihack import LevelGenerator, MiniHackNavigation
+from minihack.level_prefetch import LevelPrefetcher
+
+
+class MiniHackRandomRoom(MiniHackNavigation):
+    """A procedurally generated room with a random size."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, des_file=self._generate_des(), **kwargs)
+
+    def _generate_des(self):
+        size = random.randint(3, 10)
+        lvl_gen = LevelGenerator(w=size, h=size)
+        lvl_gen.add_goal_pos()
+        return lvl_gen.get_des()
+
+    def reset(self, *args, **kwargs):
+        self._update_generated_level()
+        return super().reset(*args, **kwargs)
+
+
+class TestLevelPrefetch:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    @pytest.mark.parametrize("prefetch_workers", [1, 3])
+    def test_rollout(self, prefetch_workers):
+        env = MiniHackRandomRoom(
+            prefetch_levels=2, prefetch_workers=prefetch_workers
+        )
+        assert env.get_prefetch_stats() is None
+        for _ in range(5):
+            obs, _ = env.reset()
+            assert env.observation_space.contains(obs)
+            env.step(0)
+
+        stats = env.get_prefetch_stats()
+        assert stats["hits"] + stats["misses"] == 5
+        prefetch_dir = os.path.join(env.nethack._vardir, "prefetch")
+        assert os.path.isdir(prefetch_dir)
+
+        env.close()
+        assert not os.path.exists(prefetch_dir)
+
+    def test_seed(self):
+        env = MiniHackRandomRoom(prefetch_levels=2)
+        env.reset()
+        prefetch_dir = os.path.join(env.nethack._vardir, "prefetch")
+        assert os.path.isdir(prefetch_dir)
+        # The prefetched levels are discarded, and prefetched again
+        env.seed(1, 1, reseed=False)
+        assert env.get_prefetch_stats() is None
+        assert not os.path.exists(prefetch_dir)
+        env.reset()
+        stats = env.get_prefetch_stats()
+        assert stats["hits"] + stats["misses"] == 1
+        env.close()
+
+    def test_no_prefetch(self):
+        env = MiniHackRandomRoom()
+        env.reset()
+        assert env.get_prefetch_stats() is None
+        env.close()
+
+
+def test_prefetcher_counters(tmpdir):
+    generated = threading.Semaphore(0)
+
+    def generate_fn():
+        generated.release()
+        return "des"
+
+    def build_fn(des_file, nhdat_path, work_dir):
+        with open(nhdat_path, "w") as f:
+            f.write(des_file)
+        return True
+
+    prefetcher = LevelPrefetcher(
+        generate_fn, build_fn, str(tmpdir.join("staging")), size=1
+    )
+    # One level is queued, the next one waits for space in the queue
+    for _ in range(2):
+        generated.acquire()
+    deadline = time.time() + 10
+    while prefetcher.stats()["producer_stalls"] == 0:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+    des_file, nhdat_path = prefetcher.get()
+    assert des_file == "des"
+    with open(nhdat_path) as f:
+        assert f.read() == "des"
+
+    stats = prefetcher.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 0
+    assert stats["producer_stalls"] >= 1
+    prefetcher.close()
+    assert not os.path.exists(str(tmpdir.join("staging")))
+
+
+def test_prefetcher_errors(tmpdir):
+    def generate_fn():
+        raise ValueError("No level")
+
+    prefetcher = LevelPrefetcher(
+        generate_fn, None, str(tmpdir.join("staging")), num_workers=2
+    )
+    # Every producer stops after queueing its exception
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            prefetcher.get()
+    with pytest.raises(RuntimeError):
+        prefetcher.get()
+    assert prefetcher.stats()["misses"] + prefetcher.stats()["hits"] == 3
+    prefetcher.close()
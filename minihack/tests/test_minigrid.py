@@ -0,0 +1,146 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+from collections import deque, namedtuple
+
+import numpy as np
+import pytest
+
+from minihack.envs.minigrid import (
+    MINIGRID_OBJECT_TO_IDX,
+    MiniGridHack,
+    minigrid_to_des_maps,
+)
+
+Cell = namedtuple("Cell", "type")
+
+
+class FakeGrid:
+    """The parts of a gym_minigrid grid used to convert it."""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.width, self.height = objects.shape
+
+    def get(self, i, j):
+        idx = self.objects[i, j]
+        if idx == MINIGRID_OBJECT_TO_IDX["empty"]:
+            return None
+        types = {v: k for k, v in MINIGRID_OBJECT_TO_IDX.items()}
+        return Cell(types[idx])
+
+    def encode(self):
+        grid = np.zeros((self.width, self.height, 3), dtype=np.uint8)
+        grid[..., 0] = self.objects
+        return grid
+
+
+class FakeMiniGridEnv:
+    def __init__(self, layouts):
+        self.layouts = list(layouts)
+        self.num_resets = 0
+
+    @property
+    def unwrapped(self):
+        return self
+
+    def reset(self):
+        objects, self.agent_pos = self.layouts[self.num_resets]
+        self.grid = FakeGrid(objects)
+        self.width = self.grid.width
+        self.num_resets += 1
+
+
+def _reference_env_map(env, wall):
+    """Converts a grid like MiniGridHack used to, cell by cell."""
+    door_pos = []
+    goal_pos = None
+    empty_strs = 0
+    empty_str = True
+    env_map = []
+    for j in range(env.grid.height):
+        str = ""
+        for i in range(env.width):
+            c = env.grid.get(i, j)
+            if c is None:
+                str += "."
+                continue
+            empty_str = False
+            if c.type == "wall":
+                str += wall
+            elif c.type == "door":
+                str += "+"
+                door_pos.append((i, j - empty_strs))
+            elif c.type in ("floor", "goal"):
+                str += "."
+                if c.type == "goal":
+                    goal_pos = (i, j - empty_strs)
+            elif c.type == "lava":
+                str += "L"
+        if not empty_str and j < env.grid.height - 1:
+            if set(str) != {"."}:
+                str = str.replace(".", " ", str.index(wall))
+                inv = str[::-1]
+                str = inv.replace(".", " ", inv.index(wall))[::-1]
+                env_map.append(str)
+        elif empty_str:
+            empty_strs += 1
+    start_pos = (int(env.agent_pos[0]), int(env.agent_pos[1]) - empty_strs)
+    return "\n".join(env_map), start_pos, goal_pos, door_pos
+
+
+def _random_layout(rng, size=25):
+    """Returns a chain of rooms sharing walls, like the MultiRoom tasks."""
+    idx = MINIGRID_OBJECT_TO_IDX
+    objects = np.full((size, size), idx["empty"], dtype=np.uint8)
+    x, y = rng.integers(0, 6, size=2)
+    for room in range(3):
+        w, h = rng.integers(4, 7, size=2)
+        objects[x : x + w, y : y + h] = idx["wall"]
+        objects[x + 1 : x + w - 1, y + 1 : y + h - 1] = idx["floor"]
+        if room:
+            objects[x, y + 1] = idx["door"]
+        if rng.random() < 0.5:
+            objects[x + 1, y + h - 2] = idx["lava"]
+        x, y = x + w - 1, y + rng.integers(0, 2)
+    objects[x - 2, y + 1] = idx["goal"]
+    return objects, (x - 3, y + 1)
+
+
+class TestMiniGridHack:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    @pytest.mark.parametrize("wall", ["|", "L"])
+    def test_des_maps(self, wall):
+        rng = np.random.default_rng(0)
+        layouts = [_random_layout(rng) for _ in range(20)]
+        env = FakeMiniGridEnv(layouts)
+        grids = np.stack([FakeGrid(o).encode() for o, _ in layouts])
+        converted = minigrid_to_des_maps(grids, [p for _, p in layouts], wall)
+        for layout in converted:
+            env.reset()
+            assert layout == _reference_env_map(env, wall)
+
+    def test_layout_batches(self):
+        rng = np.random.default_rng(1)
+        layouts = [_random_layout(rng) for _ in range(6)]
+        # The environment is not initialised, as gym_minigrid is optional
+        env = MiniGridHack.__new__(MiniGridHack)
+        env.minigrid_env = FakeMiniGridEnv(layouts)
+        env.wall = "|"
+        env.door_state = "closed"
+        env.num_mon = env.num_trap = 0
+        env.layout_batch_size = 3
+        env._layouts = deque()
+        des_files = [env.get_env_desc() for _ in range(4)]
+        # Layouts are generated 3 at a time, and used in order
+        assert env.minigrid_env.num_resets == 6
+        assert len(env._layouts) == 2
+        for des_file, (objects, agent_pos) in zip(des_files, layouts):
+            fake = FakeMiniGridEnv([(objects, agent_pos)])
+            fake.reset()
+            map, start_pos, _, _ = _reference_env_map(fake, "|")
+            assert map in des_file
+            assert "BRANCH:(%d,%d" % start_pos in des_file
@@ -0,0 +1,83 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import os
+import subprocess
+from unittest import mock
+
+import gymnasium as gym
+import numpy as np
+import pytest
+
+import minihack  # noqa: F401
+from minihack import LevelGenerator
+from minihack.nhdat_cache import NhdatCache
+
+
+def _nhdat_path(env):
+    return os.path.join(env.unwrapped.nethack._vardir, "nhdat")
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class TestNhdatCache:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_hit_skips_compilation(self, tmpdir):
+        cache_dir = str(tmpdir.join("cache"))
+        env0 = gym.make("MiniHack-Room-5x5-v0", nhdat_cache_dir=cache_dir)
+        assert len(os.listdir(cache_dir)) == 1
+
+        with mock.patch.object(subprocess, "call") as call:
+            env1 = gym.make("MiniHack-Room-5x5-v0", nhdat_cache_dir=cache_dir)
+            call.assert_not_called()
+
+        assert _read(_nhdat_path(env0)) == _read(_nhdat_path(env1))
+
+        env0.unwrapped.seed(123456, 789012)
+        env1.unwrapped.seed(123456, 789012)
+        obs0, _ = env0.reset()
+        obs1, _ = env1.reset()
+        np.testing.assert_equal(obs0, obs1)
+        env0.close()
+        env1.close()
+
+    def test_different_levels_are_not_shared(self, tmpdir):
+        cache_dir = str(tmpdir.join("cache"))
+        env = gym.make("MiniHack-Room-5x5-v0", nhdat_cache_dir=cache_dir)
+        env.unwrapped.update(LevelGenerator(w=3, h=3).get_des())
+        assert len(os.listdir(cache_dir)) == 2
+        env.close()
+
+    def test_env_var(self, tmpdir, monkeypatch):
+        cache_dir = str(tmpdir.join("cache"))
+        monkeypatch.setenv("MINIHACK_NHDAT_CACHE_DIR", cache_dir)
+        env = gym.make("MiniHack-Room-5x5-v0")
+        assert len(os.listdir(cache_dir)) == 1
+        env.close()
+
+    def test_lru_eviction(self, tmpdir):
+        cache = NhdatCache(str(tmpdir.join("cache")), max_size=250)
+        src = str(tmpdir.join("src"))
+        with open(src, "wb") as f:
+            f.write(b"x" * 100)
+
+        for i in range(3):
+            key = cache.key(str(i))
+            cache.store(key, src)
+            os.utime(cache.path(key), (i, i))
+        assert not os.path.exists(cache.path(cache.key("0")))
+
+        # A hit marks the entry as most recently used
+        dest = str(tmpdir.join("dest"))
+        assert cache.fetch(cache.key("1"), dest)
+        assert _read(dest) == b"x" * 100
+        cache.store(cache.key("3"), src)
+        assert os.path.exists(cache.path(cache.key("1")))
+        assert not os.path.exists(cache.path(cache.key("2")))
+        assert not cache.fetch(cache.key("2"), dest)
@@ -0,0 +1,458 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+from types import SimpleNamespace
+from typing import NamedTuple, Tuple
+
+import gymnasium as gym
+import numpy as np
+import pytest
+from nle.nethack import Command
+
+import minihack  # noqa: F401
+from minihack import RewardManager
+from minihack.batched_reward_manager import BatchedRewardManager
+from minihack.reward_manager import (
+    GroupedRewardManager,
+    LocEvent,
+    MessageEvent,
+    MessageMatcher,
+    SequentialRewardManager,
+    StepContext,
+    Y_cmd,
+)
+
+
+class FakeContext(NamedTuple):
+    message: str = ""
+    agent_position: Tuple[int, int] = (0, 0)
+
+
+class CountingEvent(MessageEvent):
+    """A message event recording the contexts it is checked with."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.contexts = []
+
+    def check_context(self, context):
+        self.contexts.append(context)
+        return super().check_context(context)
+
+
+class TestStepContext:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_properties(self):
+        env = gym.make("MiniHack-Eat-v0").unwrapped
+        env.reset()
+        obs = env.last_observation
+        context = StepContext(env, obs, None, obs)
+
+        blstats = obs[env._blstats_index]
+        assert context.agent_position == (blstats[0], blstats[1])
+        assert context.message == (
+            obs[env._original_observation_keys.index("message")]
+            .tobytes()
+            .decode("utf-8")
+            .rstrip("\0")
+        )
+        assert context.message is context.message
+        for letter, item in context.inventory.items():
+            assert env.key_in_inventory(item) == letter
+        assert context.screen_index is env.screen_description_index()
+        assert context.screen_contains("apple") == env.screen_contains("apple")
+        env.close()
+
+    def test_shared_context(self):
+        reward_manager = RewardManager()
+        events = [
+            CountingEvent(1, False, True, False, messages=["no such message"])
+            for _ in range(3)
+        ]
+        for event in events:
+            reward_manager.add_event(event)
+        contexts = []
+        reward_manager.add_custom_reward_fn(
+            lambda context: contexts.append(context) or 0, use_context=True
+        )
+        grouped = GroupedRewardManager()
+        grouped.add_reward_manager(reward_manager, True, False)
+        grouped.add_reward_manager(RewardManager(), True, False)
+
+        env = gym.make(
+            "MiniHack-Room-5x5-v0", reward_manager=grouped
+        ).unwrapped
+        env.reset()
+        del contexts[:]
+        for event in events:
+            del event.contexts[:]
+        for _ in range(3):
+            env.step(0)
+
+        # One context per step, shared by all events and reward functions
+        assert len(set(map(id, contexts))) == len(contexts) == 3
+        for event in events:
+            assert event.contexts == contexts
+        env.close()
+
+
+class TestMessageMatcher:
+    def test_overlapping_messages(self):
+        messages = [
+            ["Core dumped."],
+            ["dump"],
+            ["You kill the newt", "You kill the"],
+            ["kill"],
+            ["newt!"],
+            ["no such message"],
+        ]
+        events = [
+            MessageEvent(1, False, True, False, messages=msgs)
+            for msgs in messages
+        ]
+        matcher = MessageMatcher(events)
+        for message in [
+            "Core dumped.  You kill the newt!",
+            "You kill the newt!",
+            "kill",
+            "",
+            "Nothing happens.",
+        ]:
+            expected = [
+                event
+                for event in events
+                if any(msg in message for msg in event.messages)
+            ]
+            assert matcher.match(message) == expected
+
+    def test_reward_manager(self):
+        reward_manager = RewardManager()
+        reward_manager.add_kill_event("newt", reward=1)
+        reward_manager.add_kill_event(
+            "newt", reward=2, repeatable=True, terminal_required=False
+        )
+        reward_manager.add_eat_event("apple", reward=4)
+
+        kill = FakeContext("You kill the newt!")
+        assert not reward_manager.check_episode_end_context(kill)
+        assert reward_manager.collect_reward() == 3
+        assert not reward_manager.check_episode_end_context(kill)
+        assert reward_manager.collect_reward() == 2
+
+        eat = FakeContext("Core dumped.")
+        assert reward_manager.check_episode_end_context(eat)
+        assert reward_manager.collect_reward() == 4
+
+        reward_manager.reset()
+        assert not any(event.achieved for event in reward_manager.events)
+        reward_manager.check_episode_end_context(kill)
+        assert reward_manager.collect_reward() == 3
+
+
+class TestCoordinateEvents:
+    def test_dispatch(self):
+        reward_manager = RewardManager()
+        for x in range(100):
+            reward_manager.add_coordinate_event(
+                (x, 1), reward=1, terminal_required=False
+            )
+        reward_manager.add_coordinate_event(
+            (5, 1), reward=2, repeatable=True, terminal_required=False
+        )
+        reward_manager.add_coordinate_event((7, 3), reward=4)
+
+        context = FakeContext(agent_position=(5, 1))
+        assert not reward_manager.check_episode_end_context(context)
+        assert reward_manager.collect_reward() == 3
+        assert reward_manager.events[5].achieved
+        assert not reward_manager.events[100].achieved
+        assert not reward_manager.check_episode_end_context(context)
+        assert reward_manager.collect_reward() == 2
+
+        context = FakeContext(agent_position=(7, 3))
+        assert reward_manager.check_episode_end_context(context)
+        assert reward_manager.collect_reward() == 4
+
+        reward_manager.reset()
+        reward_manager.check_episode_end_context(FakeContext("", (5, 1)))
+        assert reward_manager.collect_reward() == 3
+
+
+def _batched_spec():
+    reward_manager = RewardManager()
+    reward_manager.add_message_event(
+        ["You see", "It's a wall"], reward=1, terminal_required=False
+    )
+    reward_manager.add_message_event(
+        ["wall"], reward=2, repeatable=True, terminal_required=False
+    )
+    for x in range(30, 50):
+        for y in range(5, 15):
+            reward_manager.add_coordinate_event(
+                (x, y), reward=0.5, terminal_required=False
+            )
+    reward_manager.add_location_event(
+        "staircase down", reward=3, terminal_sufficient=True
+    )
+    reward_manager.add_positional_event(
+        "staircase down", "search", reward=4, terminal_required=False
+    )
+    return reward_manager
+
+
+class FakeLocContext(SimpleNamespace):
+    def __init__(self, env, action, screen):
+        super().__init__(
+            message="",
+            agent_position=(0, 0),
+            env=env,
+            action=action,
+            screen=screen,
+        )
+
+    def screen_contains(self, name):
+        return name in self.screen
+
+
+class TestBatchedRewardManager:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_rollout(self):
+        batch_size = 3
+        envs = [
+            gym.make(
+                "MiniHack-Room-Random-5x5-v0",
+                observation_keys=(
+                    "glyphs",
+                    "blstats",
+                    "message",
+                    "screen_descriptions",
+                ),
+            )
+            for _ in range(batch_size)
+        ]
+        reward_managers = [_batched_spec() for _ in range(batch_size)]
+        batched = BatchedRewardManager(
+            _batched_spec(), batch_size, envs[0].unwrapped.actions
+        )
+
+        observations = [env.reset(seed=i)[0] for i, env in enumerate(envs)]
+        batched.reset()
+        for _ in range(30):
+            actions = np.random.randint(len(envs[0].unwrapped.actions), size=3)
+            env_done = np.zeros(batch_size, dtype=bool)
+            for i, env in enumerate(envs):
+                observations[i], _, term, trunc, _ = env.step(actions[i])
+                env_done[i] = term or trunc
+            stacked = {
+                key: np.stack([obs[key] for obs in observations])
+                for key in observations[0]
+            }
+            rewards, done = batched.step(stacked, actions)
+
+            for i, env in enumerate(envs):
+                env = env.unwrapped
+                context = StepContext(
+                    env, None, actions[i], env.last_observation
+                )
+                reward_manager = reward_managers[i]
+                assert (
+                    reward_manager.check_episode_end_context(context)
+                    == done[i]
+                )
+                assert reward_manager.collect_reward() == rewards[i]
+                assert [
+                    e.achieved for e in reward_manager.events
+                ] == batched.achieved[i].tolist()
+            done |= env_done
+            batched.reset(done)
+            for i in np.flatnonzero(done):
+                reward_managers[i].reset()
+                if env_done[i]:
+                    observations[i] = envs[i].reset()[0]
+        for env in envs:
+            env.close()
+
+    def test_positional_events(self):
+        def spec():
+            reward_manager = RewardManager()
+            reward_manager.add_positional_event(
+                "altar", "search", repeatable=True, reward=1
+            )
+            reward_manager.add_positional_event("altar", "eat", reward=2)
+            return reward_manager
+
+        env = SimpleNamespace(actions=(Command.SEARCH, Y_cmd, Command.EAT))
+        batched = BatchedRewardManager(spec(), 2, env.actions)
+        reward_managers = [spec(), spec()]
+        # The altar is only visible to the second environment, so the agent
+        # of the first one is standing on it
+        screens = ["", "altar"]
+        screen_descriptions = np.zeros((2, 2, 3, 80), dtype=np.uint8)
+        screen_descriptions[1, 1, 2, :5] = np.frombuffer(b"altar", np.uint8)
+
+        for step_actions in [None, 0, 1, 1, 2, 1, 0, 2, 1, 2, 1]:
+            if step_actions is not None:
+                step_actions = np.array([step_actions] * 2)
+            rewards, done = batched.step(
+                {"screen_descriptions": screen_descriptions}, step_actions
+            )
+            for i, reward_manager in enumerate(reward_managers):
+                action = None if step_actions is None else step_actions[i]
+                context = FakeLocContext(env, action, screens[i])
+                assert (
+                    reward_manager.check_episode_end_context(context)
+                    == done[i]
+                )
+                assert reward_manager.collect_reward() == rewards[i]
+                assert [
+                    e.achieved for e in reward_manager.events
+                ] == batched.achieved[i].tolist()
+        assert batched.achieved[0].tolist() == [False, True]
+        assert not batched.achieved[1].any()
+
+
+class TestPreviousObservation:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_declared_keys(self):
+        reward_manager = RewardManager()
+        reward_manager.add_message_event(["no such message"])
+        reward_manager.add_coordinate_event((1, 1))
+        assert reward_manager.get_previous_observation_keys() == set()
+
+        previous = []
+
+        def reward_fn(env, previous_observation, action, observation):
+            previous.append(previous_observation)
+            return 0
+
+        reward_manager.add_custom_reward_fn(
+            reward_fn, previous_observation_keys=("blstats",)
+        )
+        assert reward_manager.get_previous_observation_keys() == {"blstats"}
+
+        grouped = GroupedRewardManager()
+        grouped.add_reward_manager(reward_manager, True, False)
+        assert grouped.get_previous_observation_keys() == {"blstats"}
+
+        env = gym.make(
+            "MiniHack-Room-5x5-v0", reward_manager=grouped
+        ).unwrapped
+        env.reset()
+        del previous[:]
+        blstats = []
+        for _ in range(3):
+            blstats.append(env.last_observation[env._blstats_index].copy())
+            env.step(0)
+
+        for i, observation in enumerate(previous):
+            for key, array in zip(env._observation_keys, observation):
+                if key == "blstats":
+                    np.testing.assert_array_equal(array, blstats[i])
+                else:
+                    assert array is None
+        # Snapshots are taken into two sets of arrays used in turn
+        blstats_index = env._blstats_index
+        assert previous[0][blstats_index] is previous[2][blstats_index]
+        assert previous[0][blstats_index] is not previous[1][blstats_index]
+        env.close()
+
+    def test_undeclared_keys(self):
+        reward_manager = RewardManager()
+        reward_manager.add_custom_reward_fn(lambda *args: 0)
+        assert reward_manager.get_previous_observation_keys() is None
+
+        env = gym.make(
+            "MiniHack-Room-5x5-v0", reward_manager=reward_manager
+        ).unwrapped
+        env.reset()
+        env.step(0)
+        assert all(array is not None for array in env._previous_obs)
+        env.close()
+
+
+class AlwaysLocEvent(LocEvent):
+    def check(self, env, previous_observation, action, observation):
+        return self._set_achieved()
+
+
+class AlwaysMessageEvent(MessageEvent):
+    def check(self, env, previous_observation, action, observation):
+        if super().check(env, previous_observation, action, observation):
+            raise AssertionError("The message shouldn't be seen")
+        return self._set_achieved()
+
+
+class AlwaysRewardManager(RewardManager):
+    def check_episode_end_call(
+        self, env, previous_observation, action, observation
+    ):
+        # The episode end is also checked when resetting
+        if action is None:
+            return False
+        self._reward += 1
+        return True
+
+
+class TestOverriddenChecks:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_events(self):
+        reward_manager = RewardManager()
+        reward_manager.add_event(
+            AlwaysLocEvent(10, False, True, False, loc="no such location")
+        )
+        reward_manager.add_event(
+            AlwaysMessageEvent(
+                1, False, True, False, messages=["no such message"]
+            )
+        )
+        env = gym.make("MiniHack-Room-5x5-v0", reward_manager=reward_manager)
+        env.reset()
+        _, reward, done, _, _ = env.step(0)
+        assert done
+        assert reward == pytest.approx(11 + env.unwrapped.penalty_step)
+        env.close()
+
+    def test_sequential(self):
+        reward_manager = SequentialRewardManager()
+        reward_manager.add_event(
+            AlwaysLocEvent(1, False, True, False, loc="no such location")
+        )
+        reward_manager.add_event(
+            LocEvent(2, False, True, False, loc="no such location")
+        )
+        context = StepContext(None, None, None, None)
+        assert not reward_manager.check_episode_end_context(context)
+        assert reward_manager.collect_reward() == 1
+        assert reward_manager.current_event_idx == 1
+
+    def test_grouped(self):
+        grouped = GroupedRewardManager()
+        grouped.add_reward_manager(AlwaysRewardManager(), True, False)
+        reward_manager = RewardManager()
+        reward_manager.add_message_event(["no such message"])
+        grouped.add_reward_manager(reward_manager, False, False)
+
+        env = gym.make("MiniHack-Room-5x5-v0", reward_manager=grouped)
+        env.reset()
+        _, reward, done, _, _ = env.step(0)
+        assert done
+        assert reward == pytest.approx(1 + env.unwrapped.penalty_step)
+        env.close()
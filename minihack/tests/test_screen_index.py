@@ -0,0 +1,84 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import gymnasium as gym
+import numpy as np
+import pytest
+
+import minihack  # noqa: F401
+from minihack.screen_index import ScreenDescriptionIndex
+
+
+def _descriptions(screen_descriptions):
+    """Decodes every cell of the screen, as MiniHack used to do."""
+    h, w = screen_descriptions.shape[:2]
+    result = {}
+    for y in range(h):
+        for x in range(w):
+            des_arr = screen_descriptions[y, x]
+            symb_len = np.where(des_arr == 0)[0][0]
+            result[x, y] = des_arr[:symb_len].tobytes().decode("utf-8")
+    return result
+
+
+@pytest.mark.parametrize(
+    "env_name", ["MiniHack-Eat-v0", "MiniHack-River-Monster-v0"]
+)
+class TestScreenDescriptionIndex:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_rollout(self, env_name):
+        env = gym.make(env_name).unwrapped
+        env.reset()
+        for _ in range(20):
+            screen = env.last_observation[env._scr_descr_index]
+            expected = _descriptions(screen)
+            index = env.screen_description_index()
+            assert index is env.screen_description_index()
+
+            assert index.descriptions == set(expected.values())
+            for (x, y), description in expected.items():
+                assert index.get(x, y) == description
+                assert env.get_screen_description(x, y) == description
+            for description in index.descriptions:
+                assert index.coordinates(description) == sorted(
+                    (c for c, d in expected.items() if d == description),
+                    key=lambda c: (c[1], c[0]),
+                )
+                assert env.screen_contains(description)
+            assert not env.screen_contains("no such thing")
+
+            _, _, done, _, _ = env.step(env.action_space.sample())
+            if done:
+                break
+        env.close()
+
+    def test_updated_in_place(self, env_name):
+        env = gym.make(env_name).unwrapped
+        env.reset()
+        index = env.screen_description_index()
+        screen = env.last_observation[env._scr_descr_index]
+        screen[0, 0, :5] = np.frombuffer(b"altar", dtype=np.uint8)
+        screen[0, 0, 5] = 0
+
+        assert env.screen_description_index() is not index
+        assert env.screen_contains("altar")
+        index = env.screen_description_index()
+        assert env.screen_description_index() is index
+        env.close()
+
+    def test_other_observation(self, env_name):
+        env = gym.make(env_name).unwrapped
+        env.reset()
+        observation = tuple(a.copy() for a in env.last_observation)
+        screen = observation[env._scr_descr_index]
+        screen[:] = 0
+        screen[0, 0, :5] = np.frombuffer(b"altar", dtype=np.uint8)
+
+        assert env.screen_contains("altar", observation)
+        assert env.get_screen_description(0, 0, observation) == "altar"
+        assert env.get_screen_description(1, 0, observation) == ""
+        assert ScreenDescriptionIndex(screen).coordinates("altar") == [(0, 0)]
+        env.close()
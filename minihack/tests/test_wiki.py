@@ -0,0 +1,177 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import json
+import multiprocessing as mp
+import os
+import pickle
+
+import pytest
+
+import minihack.wiki
+from minihack.wiki import NetHackWiki, process_json, process_json_file
+from minihack.wiki_store import WikiStore, build_wiki_store
+
+RAW_PAGES = [
+    {
+        "wikipedia_title": "Newt",
+        "text": ["A newt is ", "a weak monster."],
+        "categories": "Monsters,Lizards",
+        "page_data": ["A newt is a weak monster!"],
+        "anchors": [
+            {"text": "Monster", "href": "Monster", "start": 12},
+            {
+                "text": "lizards",
+                "href": "Lizards",
+                "title": "Lizard",
+                "start": 20,
+            },
+        ],
+    },
+    {
+        "wikipedia_title": "Lizard",
+        "text": ["A lizard."],
+        "categories": "Monsters",
+        "page_data": ["A lizard (of some sort)."],
+        "anchors": [{"text": "newt", "href": "Newt", "start": 2}],
+    },
+    {
+        "wikipedia_title": "Monster",
+        "text": ["Monsters are creatures."],
+        "categories": "",
+        "page_data": ["Monsters are creatures."],
+        "anchors": [],
+    },
+]
+
+
+def _read_text(store, key, queue):
+    queue.put(store.get_text(key))
+
+
+class FakeTextProcessor:
+    """Maps descriptions to their last word, in the singular."""
+
+    def __init__(self):
+        self.batches = []
+
+    def process_batch(self, input_strs):
+        self.batches.append(list(input_strs))
+        return [s.split()[-1].rstrip("s") for s in input_strs]
+
+
+class TestNetHackWiki:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    @pytest.fixture
+    def raw_wiki(self, tmpdir):
+        path = str(tmpdir.join("raw.json"))
+        with open(path, "w") as f:
+            for page in RAW_PAGES:
+                f.write(json.dumps(page) + "\n")
+        return path
+
+    def test_store(self):
+        wiki = process_json(RAW_PAGES, ignore_inpage_anchors=True)
+        build_wiki_store(wiki, "wiki.db")
+        store = WikiStore("wiki.db", cache_size=2)
+
+        assert set(store) == set(wiki)
+        assert len(store) == len(wiki)
+        for key, page in wiki.items():
+            assert key in store
+            assert store[key] == json.loads(json.dumps(page))
+        # Redirects are aliases of their page
+        assert store["lizards"] == store["lizard"]
+        assert store.get_text("lizards") == "A lizard of some sort."
+        assert store.get_text("dragon") == ""
+        assert "dragon" not in store
+        with pytest.raises(KeyError):
+            store["dragon"]
+
+        store = pickle.loads(pickle.dumps(store))
+        assert store["newt"]["unique_anchors"] == {"monster": 1, "lizard": 1}
+
+    def test_store_after_fork(self):
+        wiki = process_json(RAW_PAGES, ignore_inpage_anchors=True)
+        build_wiki_store(wiki, "wiki.db")
+        store = WikiStore("wiki.db")
+        assert store.get_text("monster") == "Monsters are creatures."
+
+        ctx = mp.get_context("fork")
+        queue = ctx.Queue()
+        process = ctx.Process(target=_read_text, args=(store, "newt", queue))
+        process.start()
+        assert queue.get(timeout=10) == "A newt is a weak monster"
+        process.join()
+
+    @pytest.mark.parametrize("num_workers,chunk_size", [(1, 256), (2, 1)])
+    def test_process_json_file(self, raw_wiki, num_workers, chunk_size):
+        process_json_file(
+            raw_wiki,
+            "wiki.db",
+            num_workers=num_workers,
+            chunk_size=chunk_size,
+        )
+        store = WikiStore("wiki.db")
+        wiki = json.loads(json.dumps(process_json(RAW_PAGES, True)))
+        assert dict(store) == wiki
+        assert store["_global_counts"] == {
+            "monster": 1,
+            "lizard": 1,
+            "newt": 1,
+        }
+
+    def test_wiki(self, raw_wiki):
+        wiki = NetHackWiki(raw_wiki, "processed.json", preprocess_input=False)
+        assert isinstance(wiki.wiki, WikiStore)
+        assert wiki.wiki.path.endswith("processed.db")
+        assert wiki.get_page_text("newt") == "A newt is a weak monster"
+        assert wiki.get_page_data("lizard")["categories"] == ["Monsters"]
+        assert wiki.get_page_text("agent") == ""
+        with open("processed.json") as f:
+            assert json.load(f) == dict(wiki.wiki)
+        graph = wiki.link_graph
+        assert graph.titles[graph.out_links("lizard")[0][0]] == "newt"
+        assert os.path.isfile("processed_links.npz")
+        # The search index is built along with the store
+        assert os.path.isfile("processed_index.npz")
+        assert [t for t, _ in wiki.search("weak newt", k=2)] == ["newt"]
+
+        # The store is reused, even without the wiki files
+        wiki = NetHackWiki(
+            "missing.json",
+            "missing_processed.json",
+            store_file_name="processed.db",
+            preprocess_input=False,
+        )
+        assert wiki.get_page_text("monster") == "Monsters are creatures."
+
+    def test_page_keys(self, raw_wiki, monkeypatch):
+        monkeypatch.setattr(minihack.wiki, "PREPROCESSING_ALLOWED", True)
+        wiki = NetHackWiki(raw_wiki, "processed.json")
+        processor = wiki._text_processor = FakeTextProcessor()
+
+        descriptions = ["tame newt", "agent", "peaceful lizards", "tame newt"]
+        texts = wiki.get_pages_text(descriptions)
+        assert texts[0] == texts[3] == "A newt is a weak monster"
+        assert texts[1] == ""
+        assert texts[2] == "A lizard of some sort."
+        # Missing descriptions are processed once, in a single batch
+        assert processor.batches == [["peaceful lizards", "tame newt"]]
+        assert wiki.get_page_text("tame newt") == texts[0]
+        assert wiki.get_page_data("monsters")["title"] == "monster"
+        assert processor.batches[1:] == [["monsters"]]
+
+        wiki.prewarm(["monsters", "giant ants"])
+        assert processor.batches[2:] == [["giant ants"]]
+        assert wiki.page_keys_file_name.endswith("processed_page_keys.json")
+
+        # The saved table is used without preprocessing
+        monkeypatch.setattr(minihack.wiki, "PREPROCESSING_ALLOWED", False)
+        wiki = NetHackWiki(raw_wiki, "processed.json")
+        assert wiki.preprocess_input
+        assert wiki.page_keys["giant ants"] == "ant"
+        assert wiki.get_page_text("peaceful lizards") == texts[2]
@@ -0,0 +1,118 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import numpy as np
+import pytest
+
+from minihack.wiki import process_json
+from minihack.wiki_graph import WikiLinkGraph
+from minihack.wiki_store import WikiStore, build_wiki_store
+
+
+def _page(title, anchors):
+    return {
+        "wikipedia_title": title,
+        "text": [title],
+        "categories": "",
+        "page_data": [title],
+        "anchors": [
+            dict(text=a, href=a, start=0) if isinstance(a, str) else a
+            for a in anchors
+        ],
+    }
+
+
+RAW_PAGES = [
+    _page("Newt", ["Lizard", "Lizard", "Monster"]),
+    _page(
+        "Lizard",
+        [
+            "Newt",
+            {"text": "m", "href": "Monsters", "title": "Monster", "start": 0},
+        ],
+    ),
+    _page("Monster", ["Dragon"]),
+    _page("Dragon", []),
+    _page("Sword", ["Weapon", "Monster"]),
+]
+
+
+def _reference_neighbors(edges, start, hops):
+    visited = set(start)
+    frontier = set(start)
+    for _ in range(hops):
+        frontier = {j for i in frontier for j in edges.get(i, ())} - visited
+        visited |= frontier
+    return sorted(visited - set(start))
+
+
+class TestWikiLinkGraph:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_from_wiki(self):
+        wiki = process_json(RAW_PAGES, ignore_inpage_anchors=True)
+        build_wiki_store(wiki, "wiki.db")
+        graph = WikiLinkGraph.from_wiki(WikiStore("wiki.db"))
+        assert graph.titles == WikiLinkGraph.from_wiki(wiki).titles
+        # Pages without data are nodes without out-links
+        assert graph.titles[-1] == "weapon"
+
+        def titles(ids):
+            return sorted(graph.titles[i] for i in ids)
+
+        targets, counts = graph.out_links("newt")
+        assert dict(zip(titles(targets), counts[np.argsort(targets)])) == {
+            "lizard": 2,
+            "monster": 1,
+        }
+        # The redirect from "monsters" is resolved
+        assert titles(graph.in_links("monster")[0]) == [
+            "lizard",
+            "newt",
+            "sword",
+        ]
+        assert titles(graph.neighbors("newt", hops=2)) == [
+            "dragon",
+            "lizard",
+            "monster",
+        ]
+        assert titles(graph.neighbors("dragon", hops=2, direction="in")) == [
+            "lizard",
+            "monster",
+            "newt",
+            "sword",
+        ]
+        top, totals = graph.top_linked(2)
+        assert titles(top[:1]) == ["monster"] and totals[0] == 3
+        assert totals[1] == 2
+
+        graph.save("links.npz")
+        loaded = WikiLinkGraph.load("links.npz")
+        assert loaded.titles == graph.titles
+        np.testing.assert_array_equal(loaded.in_sources, graph.in_sources)
+
+    @pytest.mark.parametrize("direction", ["out", "in", "both"])
+    def test_neighbors(self, direction):
+        rng = np.random.RandomState(0)
+        n = 200
+        sources = np.sort(rng.randint(0, n, size=600))
+        targets = rng.randint(0, n, size=600)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+        graph = WikiLinkGraph(
+            [str(i) for i in range(n)], indptr, targets, np.ones(600)
+        )
+        edges = {}
+        for i, j in zip(sources, targets):
+            if direction in ("out", "both"):
+                edges.setdefault(i, set()).add(j)
+            if direction in ("in", "both"):
+                edges.setdefault(j, set()).add(i)
+        for hops in [1, 2, 3]:
+            start = rng.choice(n, 3, replace=False).tolist()
+            np.testing.assert_array_equal(
+                graph.neighbors(start, hops, direction),
+                _reference_neighbors(edges, start, hops),
+            )
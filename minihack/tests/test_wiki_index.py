@@ -0,0 +1,85 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+import math
+
+import numpy as np
+import pytest
+
+from minihack.wiki_index import (
+    BM25_B,
+    BM25_K1,
+    WikiSearchIndex,
+    WikiSearchIndexBuilder,
+    term_counts,
+    tokenize,
+)
+
+
+def _reference_scores(docs, query):
+    """Scores every document for the query with BM25, term by term."""
+    tokens = [tokenize(text) for text in docs]
+    average_length = sum(map(len, tokens)) / len(tokens)
+    scores = np.zeros(len(docs))
+    for term in tokenize(query):
+        df = sum(term in doc for doc in tokens)
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, doc in enumerate(tokens):
+            tf = doc.count(term)
+            norm = 1 - BM25_B + BM25_B * len(doc) / average_length
+            scores[i] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+    return scores
+
+
+class TestWikiSearchIndex:
+    @pytest.fixture(autouse=True)  # will be applied to all tests in class
+    def make_cwd_tmp(self, tmpdir):
+        """Makes cwd point to the test's tmpdir."""
+        with tmpdir.as_cwd():
+            yield
+
+    def test_scores(self):
+        rng = np.random.RandomState(0)
+        words = ["newt", "lizard", "wand", "death", "altar", "sink", "ring"]
+        docs = [
+            " ".join(rng.choice(words, size=rng.randint(1, 30)))
+            for _ in range(50)
+        ]
+        index = WikiSearchIndex.from_pages(
+            (f"page {i}", text) for i, text in enumerate(docs)
+        )
+        for query in ["newt", "wand of death", "Altar, altar!", "dragon"]:
+            np.testing.assert_allclose(
+                index.scores(query), _reference_scores(docs, query)
+            )
+
+        index.save("index.npz")
+        loaded = WikiSearchIndex.load("index.npz")
+        np.testing.assert_allclose(
+            loaded.scores("ring sink"), index.scores("ring sink")
+        )
+
+    def test_search(self):
+        index = WikiSearchIndex.from_pages(
+            [
+                ("newt", "The newt is a weak lizard-like monster."),
+                ("lizard", "A lizard corpse never rots. Lizards are slow."),
+                ("empty", ""),
+                ("wand of death", "Zapping a wand of death kills monsters."),
+            ]
+        )
+        assert len(index) == 3
+        results = index.search("lizard corpse", k=5)
+        assert [title for title, _ in results] == ["lizard", "newt"]
+        assert results[0][1] > results[1][1] > 0
+        assert index.search("lizard corpse", k=1) == results[:1]
+        assert index.search("dragon") == []
+        assert index.search("lizard", k=0) == []
+
+    def test_builder_replaces_pages(self):
+        builder = WikiSearchIndexBuilder()
+        builder.add("newt", term_counts("newt"))
+        builder.add("lizard", term_counts("lizard newt"))
+        builder.add("newt", term_counts("a small newt"))
+        index = builder.build()
+        assert index.titles == ["lizard", "newt"]
+        assert [t for t, _ in index.search("small")] == ["newt"]
+        np.testing.assert_array_equal(index.lengths, [2, 3])
@@ -1,56 +1,253 @@
 # Copyright (c) Facebook, Inc. and its affiliates.
 
+from minihack.atomic_file import atomic_write
 from minihack.tiles import glyph2tile, MAXOTHTILE
 from nle.nethack import MAX_GLYPH
 import numpy as np
 import pkg_resources
 import pickle
 import os
+import threading
+from functools import lru_cache
+
+TILE_SIZE = 16
+# ITU-R BT.601 luma weights of the grayscale tiles
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+# Above this fraction of changed glyphs, images are redrawn from scratch
+FULL_REDRAW_FRACTION = 0.25
+
+TILES_DIR = pkg_resources.resource_filename("minihack", "tiles")
+TILES_PICKLE_PATH = os.path.join(TILES_DIR, "tiles.pkl")
+TILE_ATLAS_PATH = os.path.join(TILES_DIR, "tiles.npy")
+
+GLYPH2TILE = np.array(glyph2tile, dtype=np.int16)
+assert len(GLYPH2TILE) == MAX_GLYPH
+
+_tile_atlas = None
+_tile_atlas_lock = threading.Lock()
+
+
+def _load_tiles_pickle(pickle_path):
+    with open(pickle_path, "rb") as f:
+        tiles = pickle.load(f)
+    return np.stack([tiles[i] for i in range(len(tiles))]).astype(np.uint8)
+
+
+def convert_tiles(pickle_path=TILES_PICKLE_PATH, atlas_path=TILE_ATLAS_PATH):
+    """Converts the pickled dictionary of tiles into a tile atlas, i.e. a
+    ``(num_tiles, 16, 16, 3)`` array saved as a .npy file.
+
+    This only needs to be done once, when the tiles change. The atlas is
+    readable by all users, who share the atlas of an installation.
+
+    Args:
+        pickle_path (str): The path of the pickled tiles.
+        atlas_path (str): The path of the atlas to write.
+    """
+    atlas = _load_tiles_pickle(pickle_path)
+    atomic_write(atlas_path, lambda f: np.save(f, atlas))
+
+
+def load_tile_atlas():
+    """Returns the tile atlas, which is loaded once per process.
+
+    The atlas is memory-mapped read-only, so that its pages are shared by all
+    the processes rendering pixel observations through the page cache. If the
+    atlas file is missing, it is first converted from the pickled tiles. The
+    tiles are loaded into memory instead if the atlas can't be written or
+    read.
+
+    Returns:
+        np.ndarray: The ``(num_tiles, 16, 16, 3)`` uint8 tile atlas.
+    """
+    global _tile_atlas
+    if _tile_atlas is None:
+        with _tile_atlas_lock:
+            if _tile_atlas is None:
+                _tile_atlas = _open_tile_atlas()
+    return _tile_atlas
+
+
+@lru_cache(maxsize=None)
+def get_tile_atlas(tile_size=TILE_SIZE, gray=False):
+    """Returns the tile atlas at the given resolution, downsampled from the
+    full atlas once per process.
+
+    Args:
+        tile_size (int): The size of the tiles in pixels, which must divide
+            16. Defaults to 16.
+        gray (bool): Whether the tiles are converted to grayscale, with a
+            single channel. Defaults to False.
+    Returns:
+        np.ndarray: The ``(num_tiles, tile_size, tile_size, channels)`` uint8
+        tile atlas.
+    """
+    if TILE_SIZE % tile_size != 0:
+        raise ValueError(
+            f"The tile size must divide {TILE_SIZE}, got {tile_size}"
+        )
+    atlas = load_tile_atlas()
+    if tile_size == TILE_SIZE and not gray:
+        return atlas
+
+    atlas = atlas.astype(np.float32)
+    if gray:
+        atlas = atlas @ GRAY_WEIGHTS[:, None]
+    # Average every block of pixels making up a downsampled pixel
+    k = TILE_SIZE // tile_size
+    n, c = len(atlas), atlas.shape[-1]
+    atlas = atlas.reshape(n, tile_size, k, tile_size, k, c).mean(axis=(2, 4))
+    return np.round(atlas).astype(np.uint8)
+
+
+def _open_tile_atlas():
+    try:
+        if not os.path.exists(TILE_ATLAS_PATH):
+            convert_tiles(TILES_PICKLE_PATH, TILE_ATLAS_PATH)
+        return np.load(TILE_ATLAS_PATH, mmap_mode="r")
+    except OSError:
+        # The atlas can't be written, or read (e.g. if it was written by
+        # another user)
+        return _load_tiles_pickle(TILES_PICKLE_PATH)
+
+
+class _IncrementalFrame:
+    """An image rendered by ``GlyphMapper.to_rgb_incremental``, along with
+    the glyphs it was rendered from."""
+
+    def __init__(self, shape, tile_size, channels):
+        h, w = shape
+        self.glyphs = None
+        self.image = np.empty(
+            (h * tile_size, w * tile_size, channels), dtype=np.uint8
+        )
+        self.tiles = self.image.reshape(
+            h, tile_size, w, tile_size, channels
+        ).transpose(0, 2, 1, 3, 4)
 
 
 class GlyphMapper:
-    """This class is used to map glyphs to rgb pixels."""
+    """This class is used to map glyphs to rgb pixels.
+
+    The tiles are stored in a single ``(num_tiles, 16, 16, 3)`` atlas, so
+    that rendering an array of glyphs is a single lookup of their tiles
+    followed by a gather from the atlas. The atlas is shared by all instances.
+
+    Images can also be rendered with smaller tiles, or in grayscale, from
+    atlases which are downsampled once from the full atlas.
+    """
 
     def __init__(self):
-        self.tiles = self.load_tiles()
+        self.atlas = load_tile_atlas()
+        self.glyph2tile = GLYPH2TILE
+        # Built on first access, as it is rarely used
+        self._tiles = None
+        # The images of to_rgb_incremental, for each resolution
+        self._frames = {}
+
+    @property
+    def tiles(self):
+        if self._tiles is None:
+            self._tiles = self.load_tiles()
+        return self._tiles
 
     def load_tiles(self):
-        """This function expects that tile.npy already exists.
-        If it doesn't, call make_tiles.py in win/
+        """Returns a dictionary from tile ids to their RGB arrays, which are
+        views of the tile atlas."""
+        return {i: tile for i, tile in enumerate(self.atlas)}
+
+    def glyph_id_to_rgb(self, glyph_id):
+        tile_id = self.glyph2tile[glyph_id]
+        assert 0 <= tile_id <= MAXOTHTILE
+        return self.atlas[tile_id]
+
+    def _glyph_to_rgb(self, glyphs, atlas, out=None):
+        # Expects glyphs as an ndarray of shape (..., H, W)
+        *batch, h, w = glyphs.shape
+        _, tile_size, _, channels = atlas.shape
+        shape = (*batch, h * tile_size, w * tile_size, channels)
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+        elif (
+            out.shape != shape
+            or out.dtype != np.uint8
+            or not out.flags.c_contiguous
+        ):
+            raise ValueError(
+                "Expected a contiguous uint8 array of shape {}, got {}".format(
+                    shape, out.shape
+                )
+            )
+        # View the image as tiles, i.e. (..., H, W, tile_size, tile_size, C)
+        n = len(batch)
+        tiles = out.reshape(*batch, h, tile_size, w, tile_size, channels)
+        tiles = tiles.transpose(*range(n), n, n + 2, n + 1, n + 3, n + 4)
+        # Tile ids are always valid, and clipping avoids buffering the output
+        tile_ids = self.glyph2tile[glyphs]
+        np.take(atlas, tile_ids, axis=0, out=tiles, mode="clip")
+        return out
+
+    def to_rgb(self, glyphs, out=None, tile_size=TILE_SIZE, gray=False):
+        """Renders glyphs as an RGB image.
+
+        Args:
+            glyphs (np.ndarray): The glyphs, of shape (H, W) or of shape
+                (N, H, W) for a batch of observations.
+            out (np.ndarray or None): An optional uint8 array of the shape of
+                the image in which it is rendered.
+            tile_size (int): The size of the tiles in pixels, which must
+                divide 16. Defaults to 16.
+            gray (bool): Whether to render a grayscale image. Defaults to
+                False.
+        Returns:
+            np.ndarray: The image, of shape (..., H * tile_size,
+            W * tile_size, C) where C is 1 for grayscale images and 3
+            otherwise.
         """
+        atlas = get_tile_atlas(tile_size, gray)
+        return self._glyph_to_rgb(glyphs, atlas, out)
 
-        tile_rgb_path = os.path.join(
-            pkg_resources.resource_filename("minihack", "tiles"),
-            "tiles.pkl",
-        )
+    def to_rgb_incremental(self, glyphs, tile_size=TILE_SIZE, gray=False):
+        """Renders glyphs as an RGB image, like ``to_rgb``, repainting only
+        the tiles whose glyphs changed since the previous call.
 
-        return pickle.load(open(tile_rgb_path, "rb"))
+        This is meant for rendering successive observations of the same
+        environment, which usually differ in a handful of cells. The image is
+        updated in place and returned on every call, so it must be copied to
+        be kept across calls. Images of different resolutions are tracked
+        separately.
 
-    def glyph_id_to_rgb(self, glyph_id):
-        tile_id = glyph2tile[glyph_id]
-        assert 0 <= tile_id <= MAXOTHTILE
-        return self.tiles[tile_id]
-
-    def _glyph_to_rgb(self, glyphs):
-        # Expects glhyphs as two-dimensional numpy ndarray
-        cols = None
-        col = None
-
-        for i in range(glyphs.shape[1]):
-            for j in range(glyphs.shape[0]):
-                rgb = self.glyph_id_to_rgb(glyphs[j, i])
-                if col is None:
-                    col = rgb
-                else:
-                    col = np.concatenate((col, rgb))
-
-            if cols is None:
-                cols = col
-            else:
-                cols = np.concatenate((cols, col), axis=1)
-            col = None
-
-        return cols
-
-    def to_rgb(self, glyphs):
-        return self._glyph_to_rgb(glyphs)
+        Args:
+            glyphs (np.ndarray): The glyphs, of shape (H, W).
+            tile_size (int): The size of the tiles in pixels, which must
+                divide 16. Defaults to 16.
+            gray (bool): Whether to render a grayscale image. Defaults to
+                False.
+        Returns:
+            np.ndarray: The image, of shape (H * tile_size, W * tile_size, C).
+        """
+        atlas = get_tile_atlas(tile_size, gray)
+        frame = self._frames.get((tile_size, gray))
+        if frame is None or frame.tiles.shape[:2] != glyphs.shape:
+            frame = _IncrementalFrame(glyphs.shape, tile_size, atlas.shape[-1])
+            self._frames[tile_size, gray] = frame
+
+        if frame.glyphs is None:
+            frame.glyphs = glyphs.copy()
+            return self._glyph_to_rgb(glyphs, atlas, out=frame.image)
+
+        changed = glyphs != frame.glyphs
+        num_changed = np.count_nonzero(changed)
+        if num_changed > FULL_REDRAW_FRACTION * glyphs.size:
+            self._glyph_to_rgb(glyphs, atlas, out=frame.image)
+        elif num_changed:
+            ys, xs = np.nonzero(changed)
+            frame.tiles[ys, xs] = atlas[self.glyph2tile[glyphs[ys, xs]]]
+        np.copyto(frame.glyphs, glyphs)
+        return frame.image
+
+    def reset_incremental(self):
+        """Makes the next calls of ``to_rgb_incremental`` redraw the whole
+        images, e.g. at the start of an episode."""
+        for frame in self._frames.values():
+            frame.glyphs = None
@@ -1,14 +1,33 @@
 # Copyright (c) Facebook, Inc. and its affiliates.
 
+import itertools
 import json
 import os
 import re
-from collections import defaultdict
+from collections import Counter, deque
+from collections.abc import Mapping
+from concurrent.futures import Future, ProcessPoolExecutor
 from functools import lru_cache
-from typing import List
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 from urllib.parse import unquote
 
 import pkg_resources
+from nle import nethack
+
+from minihack.atomic_file import atomic_write
+from minihack.wiki_store import (
+    DEFAULT_WIKI_CACHE_SIZE,
+    WikiStore,
+    WikiStoreWriter,
+    build_wiki_store,
+    encode_page,
+)
+from minihack.wiki_graph import WikiLinkGraph
+from minihack.wiki_index import (
+    WikiSearchIndex,
+    WikiSearchIndexBuilder,
+    term_counts,
+)
 
 try:
     import inflect
@@ -21,6 +40,12 @@ except ImportError as error:  # noqa
     import_error = error
 
 DATA_DIR_PATH = pkg_resources.resource_filename("nle", "minihack/dat")
+RAW_WIKI_PATH = os.path.join(DATA_DIR_PATH, "nethackwikidata.json")
+PROCESSED_WIKI_PATH = os.path.join(DATA_DIR_PATH, "nethackwiki_processed.json")
+WIKI_STORE_SUFFIX = ".db"
+PAGE_KEYS_SUFFIX = "_page_keys.json"
+LINK_GRAPH_SUFFIX = "_links.npz"
+SEARCH_INDEX_SUFFIX = "_index.npz"
 
 EXCEPTIONS = (
     "floor of a room",
@@ -51,9 +76,22 @@ class TextProcessor:
     @lru_cache(maxsize=None)
     def process(self, input_str: str) -> str:
         input_str = self.preprocess(input_str)
-
+        return self._select_noun(input_str, self.nlp(input_str))
+
+    def process_batch(self, input_strs: List[str]) -> List[str]:
+        """Processes several strings like ``process``, running the pipeline
+        once on all of them."""
+        input_strs = [self.preprocess(input_str) for input_str in input_strs]
+        texts = sorted(set(filter(None, input_strs)))
+        docs = self.nlp([stanza.Document([], text=text) for text in texts])
+        processed = {
+            text: self._select_noun(text, doc)
+            for text, doc in zip(texts, docs)
+        }
+        return [processed.get(text, text) for text in input_strs]
+
+    def _select_noun(self, input_str: str, result) -> str:
         # First find nouns in phrase
-        result = self.nlp(input_str)
         nouns = [
             word.text
             for sent in result.sentences
@@ -73,6 +111,21 @@ class TextProcessor:
             return singular
 
 
+def nethack_descriptions() -> List[str]:
+    """Returns the names of the monsters, objects and map features of
+    NetHack, as they appear in screen descriptions."""
+    descriptions = []
+    for i in range(nethack.NUMMONS):
+        name = nethack.permonst(i).mname
+        descriptions += [name, f"tame {name}", f"peaceful {name}"]
+    for i in range(nethack.NUM_OBJECTS):
+        objdescr = nethack.objdescr.from_idx(i)
+        descriptions += [objdescr.oc_name, objdescr.oc_descr]
+    for i in range(nethack.MAXPCHARS):
+        descriptions.append(nethack.symdef.from_idx(i).explanation)
+    return sorted(set(filter(None, descriptions)))
+
+
 class NetHackWiki:
     """A class representing Nethack Wiki Data - pages and links between them.
 
@@ -94,28 +147,221 @@ class NetHackWiki:
         exceptions (Tuple[str] or None):
             Name of entities in screen descriptions that are ingored. If None,
             there are no exceptions. Defaults to None.
+        store_file_name (str or None):
+            The path of the indexed store of the processed wiki, from which
+            pages are read on demand. If the store does not exist, it is
+            built from the processed (or raw) wiki the first time. If None,
+            the path of the processed file with a ``.db`` extension is used.
+            Defaults to None.
+        cache_size (int):
+            The maximum number of pages of the store kept in memory.
+            Defaults to ``DEFAULT_WIKI_CACHE_SIZE``.
+        page_keys_file_name (str or None):
+            The path of the table mapping screen descriptions to the page
+            names found by preprocessing them, as saved by
+            ``save_page_keys``. Descriptions found in the table are not
+            preprocessed again, and the preprocessing pipeline is only loaded
+            when a description is missing. If None, the path of the store
+            with a ``_page_keys.json`` suffix is used. Defaults to None.
+        num_workers (int or None):
+            The number of processes processing the raw wiki, if the store
+            is built from it. If None, the number of CPUs is used. Defaults
+            to None.
     """
 
     def __init__(
         self,
-        raw_wiki_file_name: str,
-        processed_wiki_file_name: str,
+        raw_wiki_file_name: str = RAW_WIKI_PATH,
+        processed_wiki_file_name: str = PROCESSED_WIKI_PATH,
         save_processed_json: bool = True,
         ignore_inpage_anchors: bool = True,
         preprocess_input: bool = True,
         exceptions: tuple = None,
+        store_file_name: Optional[str] = None,
+        cache_size: int = DEFAULT_WIKI_CACHE_SIZE,
+        page_keys_file_name: Optional[str] = None,
+        num_workers: Optional[int] = None,
+    ) -> None:
+        if store_file_name is None:
+            store_file_name = (
+                os.path.splitext(processed_wiki_file_name)[0]
+                + WIKI_STORE_SUFFIX
+            )
+        if not os.path.isfile(store_file_name):
+            self._build_store(
+                raw_wiki_file_name,
+                processed_wiki_file_name,
+                store_file_name,
+                save_processed_json,
+                ignore_inpage_anchors,
+                num_workers,
+            )
+        self.wiki = WikiStore(store_file_name, cache_size=cache_size)
+
+        if page_keys_file_name is None:
+            page_keys_file_name = (
+                os.path.splitext(store_file_name)[0] + PAGE_KEYS_SUFFIX
+            )
+        self.page_keys_file_name = page_keys_file_name
+        self.page_keys: Dict[str, str] = {}
+        if os.path.isfile(page_keys_file_name):
+            with open(page_keys_file_name, "r") as json_file:
+                self.page_keys = json.load(json_file)
+
+        self.exceptions = exceptions if exceptions is not None else EXCEPTIONS
+        self.preprocess_input = preprocess_input
+        self._text_processor = None
+        self._link_graph_file_name = (
+            os.path.splitext(store_file_name)[0] + LINK_GRAPH_SUFFIX
+        )
+        self._link_graph = None
+        self._search_index_file_name = (
+            os.path.splitext(store_file_name)[0] + SEARCH_INDEX_SUFFIX
+        )
+        self._search_index = None
+        if preprocess_input and not PREPROCESSING_ALLOWED:
+            print(
+                "To perform text preprocessing, `inflect` and `stanza`"
+                f"must be installed. See {import_error} for more information"
+            )
+            # Descriptions can still be looked up in the page keys table
+            self.preprocess_input = bool(self.page_keys)
+
+    @property
+    def text_processor(self) -> TextProcessor:
+        if self._text_processor is None:
+            self._text_processor = TextProcessor()
+        return self._text_processor
+
+    @property
+    def link_graph(self) -> WikiLinkGraph:
+        """The graph of the links between the pages of the wiki.
+
+        It is built from the anchors of the pages the first time it is
+        used, and saved next to the store for later use.
+        """
+        if self._link_graph is None:
+            if os.path.isfile(self._link_graph_file_name):
+                self._link_graph = WikiLinkGraph.load(
+                    self._link_graph_file_name
+                )
+            else:
+                self._link_graph = WikiLinkGraph.from_wiki(self.wiki)
+                try:
+                    self._link_graph.save(self._link_graph_file_name)
+                except OSError:
+                    pass
+        return self._link_graph
+
+    @property
+    def search_index(self) -> WikiSearchIndex:
+        """The full-text index of the texts of the pages of the wiki.
+
+        It is built along with the store when processing a raw wiki, or
+        from the store the first time it is used, and saved next to it.
+        """
+        if self._search_index is None:
+            if os.path.isfile(self._search_index_file_name):
+                self._search_index = WikiSearchIndex.load(
+                    self._search_index_file_name
+                )
+            else:
+                self._search_index = WikiSearchIndex.from_pages(
+                    self.wiki.texts()
+                )
+                try:
+                    self._search_index.save(self._search_index_file_name)
+                except OSError:
+                    pass
+        return self._search_index
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Searches the texts of the pages, e.g. for pages relevant to an
+        in-game message.
+
+        Args:
+            query (str): The free-text query.
+            k (int): The maximum number of pages returned. Defaults to 10.
+        Returns:
+            List[Tuple[str, float]]: The titles of the pages ranked highest
+            by BM25, along with their scores, in decreasing order of score.
+        """
+        return self.search_index.search(query, k)
+
+    def get_page_keys(self, pages: List[str]) -> List[str]:
+        """Returns the names of the wiki pages of screen descriptions.
+
+        Descriptions are looked up in the page keys table, and the missing
+        ones are preprocessed together and added to it.
+
+        Args:
+            pages (List[str]): The screen descriptions.
+        Returns:
+            List[str]: The page names.
+        """
+        if not self.preprocess_input:
+            return list(pages)
+        missing = sorted(set(pages) - self.page_keys.keys())
+        if missing and PREPROCESSING_ALLOWED:
+            processed = self.text_processor.process_batch(missing)
+            self.page_keys.update(zip(missing, processed))
+        return [self.page_keys.get(page, page) for page in pages]
+
+    def prewarm(self, descriptions: Optional[Iterable[str]] = None) -> None:
+        """Fills the page keys table with the given screen descriptions and
+        saves it, so that environments using the wiki can look them up
+        without preprocessing them.
+
+        Args:
+            descriptions (Iterable[str] or None):
+                The screen descriptions. If None, the names of all the
+                monsters, objects and map features of NetHack are used.
+                Defaults to None.
+        """
+        if descriptions is None:
+            descriptions = nethack_descriptions()
+        self.get_page_keys(list(descriptions))
+        self.save_page_keys()
+
+    def save_page_keys(self, file_name: Optional[str] = None) -> None:
+        """Saves the page keys table as a json file.
+
+        Args:
+            file_name (str or None): The path of the file. If None,
+                ``page_keys_file_name`` is used. Defaults to None.
+        """
+        if file_name is None:
+            file_name = self.page_keys_file_name
+        atomic_write(
+            file_name,
+            lambda f: json.dump(self.page_keys, f, sort_keys=True),
+            binary=False,
+        )
+
+    @staticmethod
+    def _build_store(
+        raw_wiki_file_name: str,
+        processed_wiki_file_name: str,
+        store_file_name: str,
+        save_processed_json: bool,
+        ignore_inpage_anchors: bool,
+        num_workers: Optional[int],
     ) -> None:
         if os.path.isfile(processed_wiki_file_name):
             with open(processed_wiki_file_name, "r") as json_file:
-                self.wiki = json.load(json_file)
+                build_wiki_store(json.load(json_file), store_file_name)
         elif os.path.isfile(raw_wiki_file_name):
-            raw_json = load_json(raw_wiki_file_name)
-            self.wiki = process_json(
-                raw_json, ignore_inpage_anchors=ignore_inpage_anchors
+            process_json_file(
+                raw_wiki_file_name,
+                store_file_name,
+                ignore_inpage_anchors=ignore_inpage_anchors,
+                num_workers=num_workers,
+                index_file_name=(
+                    os.path.splitext(store_file_name)[0] + SEARCH_INDEX_SUFFIX
+                ),
             )
             if save_processed_json:
-                with open(processed_wiki_file_name, "w+") as json_file:
-                    json.dump(self.wiki, json_file)
+                dump_json(WikiStore(store_file_name), processed_wiki_file_name)
         else:
             raise ValueError(
                 """One of `raw_wiki_file_name` or `processed_wiki_file_name`
@@ -124,18 +370,6 @@ class NetHackWiki:
                 data."""
             )
 
-        self.exceptions = exceptions if exceptions is not None else EXCEPTIONS
-        self.preprocess_input = preprocess_input
-        if preprocess_input:
-            if PREPROCESSING_ALLOWED:
-                self.text_processor = TextProcessor()
-            else:
-                print(
-                    "To perform text preprocessing, `inflect` and `stanza`"
-                    f"must be installed. See {import_error} for more information"
-                )
-                self.preprocess_input = False
-
     def get_page_text(self, page: str) -> str:
         """Get the text of a page.
 
@@ -144,11 +378,22 @@ class NetHackWiki:
         Returns:
             str: The text of the page.
         """
-        if page in self.exceptions:
-            return ""
-        if self.preprocess_input:
-            page = self.text_processor.process(page)
-        return self.wiki.get(page, {}).get("text", "")
+        return self.get_pages_text([page])[0]
+
+    def get_pages_text(self, pages: List[str]) -> List[str]:
+        """Get the texts of several pages, preprocessing their names at once.
+
+        Args:
+            pages (List[str]): The page names.
+        Returns:
+            List[str]: The texts of the pages.
+        """
+        queries = [page for page in pages if page not in self.exceptions]
+        page_keys = dict(zip(queries, self.get_page_keys(queries)))
+        return [
+            self.wiki.get_text(page_keys[page]) if page in page_keys else ""
+            for page in pages
+        ]
 
     def get_page_data(self, page: str) -> dict:
         """Get the data of a page.
@@ -160,8 +405,7 @@ class NetHackWiki:
         """
         if page in self.exceptions:
             return {}
-        if self.preprocess_input:
-            page = self.text_processor.process(page)
+        page = self.get_page_keys([page])[0]
         return self.wiki.get(page, {})
 
 
@@ -174,11 +418,29 @@ def load_json(file_name: str) -> list:
     return input_json
 
 
-def process_json(wiki_json: List[dict], ignore_inpage_anchors) -> dict:
-    """Process a list of json pages of the wiki into one dict of all pages."""
-    result: dict = {}
-    redirects = {}
-    result["_global_counts"] = defaultdict(int)
+def dump_json(wiki: Mapping, file_name: str) -> None:
+    """Writes a processed wiki into a json file, one page at a time."""
+    with open(file_name, "w+") as json_file:
+        json_file.write("{")
+        for i, (key, value) in enumerate(wiki.items()):
+            if i:
+                json_file.write(", ")
+            json_file.write(f"{json.dumps(key)}: {json.dumps(value)}")
+        json_file.write("}")
+
+
+def process_page(
+    page: dict, ignore_inpage_anchors: bool
+) -> Tuple[dict, Dict[str, str]]:
+    """Process a json page of the wiki.
+
+    Args:
+        page (dict): The raw page.
+        ignore_inpage_anchors (bool): Whether to ignore in-page anchors.
+    Returns:
+        Tuple[dict, Dict[str, str]]: The processed page, and the redirects
+        found in its anchors.
+    """
 
     def href_normalise(x: str):
         result = unquote(x.lower())
@@ -186,47 +448,155 @@ def process_json(wiki_json: List[dict], ignore_inpage_anchors) -> dict:
             result = result.split("#")[0]
         return result.replace("_", " ")
 
-    for page in wiki_json:
-        relevant_page_info = dict(
-            title=page["wikipedia_title"].lower(),
-            length=len("".join(page["text"])),
-            categories=page["categories"].split(","),
-            raw_text="".join(page["text"]),
-            text=clean_page_text(page["page_data"]),
+    relevant_page_info = dict(
+        title=page["wikipedia_title"].lower(),
+        length=len("".join(page["text"])),
+        categories=page["categories"].split(","),
+        raw_text="".join(page["text"]),
+        text=clean_page_text(page["page_data"]),
+    )
+    # noqa: E731
+    relevant_page_info["anchors"] = [
+        dict(
+            text=anchor["text"].lower(),
+            page=href_normalise(anchor.get("title", anchor.get("href"))),
+            start=anchor["start"],
         )
-        # noqa: E731
-        relevant_page_info["anchors"] = [
-            dict(
-                text=anchor["text"].lower(),
-                page=href_normalise(anchor.get("title", anchor.get("href"))),
-                start=anchor["start"],
-            )
-            for anchor in page["anchors"]
-        ]
-        redirect_anchors = [
-            anchor
-            for anchor in page["anchors"]
-            if anchor.get("title")
-            and href_normalise(anchor["href"])
-            != href_normalise(anchor["title"])
-        ]
-        redirects.update(
-            {
-                href_normalise(anchor["href"]): href_normalise(anchor["title"])
-                for anchor in redirect_anchors
-            }
+        for anchor in page["anchors"]
+    ]
+    redirect_anchors = [
+        anchor
+        for anchor in page["anchors"]
+        if anchor.get("title")
+        and href_normalise(anchor["href"]) != href_normalise(anchor["title"])
+    ]
+    redirects = {
+        href_normalise(anchor["href"]): href_normalise(anchor["title"])
+        for anchor in redirect_anchors
+    }
+    unique_anchors: dict = Counter()
+    for anchor in relevant_page_info["anchors"]:
+        unique_anchors[anchor["page"]] += 1
+    relevant_page_info["unique_anchors"] = dict(unique_anchors)
+    return relevant_page_info, redirects
+
+
+def process_json(wiki_json: List[dict], ignore_inpage_anchors) -> dict:
+    """Process a list of json pages of the wiki into one dict of all pages."""
+    result: dict = {}
+    redirects = {}
+    result["_global_counts"] = Counter()
+
+    for page in wiki_json:
+        relevant_page_info, page_redirects = process_page(
+            page, ignore_inpage_anchors
         )
-        unique_anchors: dict = defaultdict(int)
+        redirects.update(page_redirects)
         for anchor in relevant_page_info["anchors"]:
-            unique_anchors[anchor["page"]] += 1
             result["_global_counts"][anchor["page"]] += 1
-        relevant_page_info["unique_anchors"] = dict(unique_anchors)
         result[relevant_page_info["title"]] = relevant_page_info
     for alias, page in redirects.items():
         result[alias] = result[page]
     return result
 
 
+def _process_lines(lines: List[str], ignore_inpage_anchors: bool) -> list:
+    results = []
+    for line in lines:
+        if not line.strip():
+            continue
+        page, redirects = process_page(json.loads(line), ignore_inpage_anchors)
+        # Pages are encoded in the workers, as it is the costliest part
+        results.append(
+            (
+                page["title"],
+                encode_page(page),
+                page["unique_anchors"],
+                redirects,
+                term_counts(page["text"]),
+            )
+        )
+    return results
+
+
+def _read_chunks(file_name: str, chunk_size: int) -> Iterator[List[str]]:
+    with open(file_name, "r") as json_file:
+        while True:
+            chunk = list(itertools.islice(json_file, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+def process_json_file(
+    raw_wiki_file_name: str,
+    store_file_name: str,
+    ignore_inpage_anchors: bool = True,
+    num_workers: Optional[int] = None,
+    chunk_size: int = 256,
+    index_file_name: Optional[str] = None,
+) -> None:
+    """Processes a raw wiki file, with a json page per line, straight into
+    an indexed store of the processed wiki.
+
+    The file is streamed in chunks of lines, which are parsed and processed
+    by a pool of processes, so that processing scales with the number of
+    cores and the raw wiki is never fully loaded in memory. The pages are
+    written to the store as they are processed, and the anchor counts and
+    redirects are merged at the end. The result is the same as
+    ``build_wiki_store(process_json(load_json(raw_wiki_file_name)), ...)``.
+
+    Args:
+        raw_wiki_file_name (str): The path of the raw wiki.
+        store_file_name (str): The path of the store to write.
+        ignore_inpage_anchors (bool): Whether to ignore in-page anchors.
+            Defaults to True.
+        num_workers (int or None): The number of processes. If None, the
+            number of CPUs is used. Defaults to None.
+        chunk_size (int): The number of pages processed per task. Defaults
+            to 256.
+        index_file_name (str or None): If not None, the path where the
+            full-text search index of the pages is saved, which is built
+            from the term counts computed by the workers. Defaults to None.
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    global_counts: Dict[str, int] = Counter()
+    redirects: Dict[str, str] = {}
+    index_builder = WikiSearchIndexBuilder()
+
+    def write_pages(future: Future) -> None:
+        for page in future.result():
+            title, encoded, unique_anchors, page_redirects, counts = page
+            redirects.update(page_redirects)
+            for anchor, count in unique_anchors.items():
+                global_counts[anchor] += count
+            writer.add_encoded_page(title, *encoded)
+            if index_file_name is not None:
+                index_builder.add(title, counts)
+
+    with WikiStoreWriter(store_file_name) as writer, ProcessPoolExecutor(
+        num_workers
+    ) as executor:
+        # Only a bounded number of chunks are in flight, and they are written
+        # in order, so that later pages replace earlier ones like in a dict
+        pending: Deque[Future] = deque()
+        for chunk in _read_chunks(raw_wiki_file_name, chunk_size):
+            pending.append(
+                executor.submit(_process_lines, chunk, ignore_inpage_anchors)
+            )
+            if len(pending) >= 2 * num_workers:
+                write_pages(pending.popleft())
+        while pending:
+            write_pages(pending.popleft())
+
+        writer.add_page("_global_counts", global_counts)
+        for alias, page in redirects.items():
+            writer.add_alias(alias, page)
+        if index_file_name is not None:
+            index_builder.build().save(index_file_name)
+
+
 def clean_page_text(text: List[str]) -> str:
     """Clean Markdown text to make it more passable into an NLP model.
 
@@ -0,0 +1,224 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+
+import os
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+from minihack.atomic_file import atomic_write
+
+Page = Union[str, int]
+
+
+def _gather(
+    indptr: np.ndarray, values: np.ndarray, ids: np.ndarray
+) -> np.ndarray:
+    """Returns the concatenated rows of the given ids of a CSR array."""
+    starts = indptr[ids]
+    lengths = indptr[ids + 1] - starts
+    offsets = np.arange(lengths.sum()) + np.repeat(
+        starts - (np.cumsum(lengths) - lengths), lengths
+    )
+    return values[offsets]
+
+
+class WikiLinkGraph:
+    """The graph of the links between the pages of a processed wiki, in
+    compressed sparse row (CSR) form.
+
+    Pages are interned as integer ids, in the order of ``titles``. The links
+    of page ``i`` are ``targets[indptr[i]:indptr[i + 1]]``, with the number
+    of anchors linking to each target in ``counts``. The same arrays are
+    kept for the transposed graph, so that in-links are as cheap as
+    out-links. Redirects are resolved, and pages which are only linked to
+    (i.e. that have no page in the wiki) are nodes without out-links.
+
+    Queries take page titles or ids and return arrays of ids, which can be
+    converted back to titles with ``titles``.
+
+    Args:
+        titles (List[str]):
+            The titles of the pages.
+        indptr (np.ndarray):
+            The ``(num_pages + 1,)`` offsets of the out-links of every page.
+        targets (np.ndarray):
+            The ids of the pages linked to.
+        counts (np.ndarray):
+            The number of anchors of every link.
+    """
+
+    def __init__(
+        self,
+        titles: List[str],
+        indptr: np.ndarray,
+        targets: np.ndarray,
+        counts: np.ndarray,
+    ):
+        self.titles = list(titles)
+        self.ids: Dict[str, int] = {t: i for i, t in enumerate(self.titles)}
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.counts = np.asarray(counts, dtype=np.int32)
+
+        # The transposed graph, i.e. the in-links of every page
+        sources = np.repeat(
+            np.arange(len(self.titles), dtype=np.int32), np.diff(self.indptr)
+        )
+        order = np.argsort(self.targets, kind="stable")
+        self.in_indptr = np.zeros(len(self.titles) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.targets, minlength=len(self.titles)),
+            out=self.in_indptr[1:],
+        )
+        self.in_sources = sources[order]
+        self.in_counts = self.counts[order]
+
+    @classmethod
+    def from_wiki(cls, wiki: Mapping) -> "WikiLinkGraph":
+        """Builds the link graph of a processed wiki, as returned by
+        ``process_json`` or read from a ``WikiStore``."""
+        titles: List[str] = []
+        ids: Dict[str, int] = {}
+
+        def intern(title: str) -> int:
+            if title not in ids:
+                ids[title] = len(titles)
+                titles.append(title)
+            return ids[title]
+
+        pages = [
+            (key, value)
+            for key, value in wiki.items()
+            if isinstance(value, dict) and value.get("title") == key
+        ]
+        for key, _ in pages:
+            intern(key)
+
+        redirects: Dict[str, str] = {}
+
+        def resolve(name: str) -> str:
+            if name not in redirects:
+                value = wiki.get(name) if name not in ids else None
+                if isinstance(value, dict) and "title" in value:
+                    redirects[name] = value["title"]
+                else:
+                    redirects[name] = name
+            return redirects[name]
+
+        sources, targets, counts = [], [], []
+        for key, value in pages:
+            links: Dict[int, int] = {}
+            for name, count in value.get("unique_anchors", {}).items():
+                target = intern(resolve(name))
+                links[target] = links.get(target, 0) + count
+            sources += [ids[key]] * len(links)
+            targets += links.keys()
+            counts += links.values()
+
+        sources = np.array(sources, dtype=np.int64)
+        indptr = np.zeros(len(titles) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(titles)), out=indptr[1:])
+        return cls(titles, indptr, targets, counts)
+
+    def save(self, path: str) -> None:
+        """Saves the graph as a .npz file, which is atomically replaced."""
+        atomic_write(
+            path,
+            lambda f: np.savez(
+                f,
+                titles=np.array(self.titles, dtype=str),
+                indptr=self.indptr,
+                targets=self.targets,
+                counts=self.counts,
+            ),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "WikiLinkGraph":
+        """Loads a graph saved with ``save``."""
+        with np.load(path) as data:
+            return cls(
+                data["titles"].tolist(),
+                data["indptr"],
+                data["targets"],
+                data["counts"],
+            )
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def _ids(self, pages: Union[Page, Iterable[Page]]) -> np.ndarray:
+        if isinstance(pages, (str, int, np.integer)):
+            pages = [pages]
+        return np.array(
+            [self.ids[p] if isinstance(p, str) else p for p in pages],
+            dtype=np.int64,
+        )
+
+    def out_links(self, page: Page) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the ids of the pages a page links to, and the number of
+        anchors of every link."""
+        i = self._ids(page)[0]
+        span = slice(self.indptr[i], self.indptr[i + 1])
+        return self.targets[span], self.counts[span]
+
+    def in_links(self, page: Page) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the ids of the pages linking to a page, and the number of
+        anchors of every link."""
+        i = self._ids(page)[0]
+        span = slice(self.in_indptr[i], self.in_indptr[i + 1])
+        return self.in_sources[span], self.in_counts[span]
+
+    def neighbors(
+        self,
+        pages: Union[Page, Iterable[Page]],
+        hops: int = 1,
+        direction: str = "out",
+    ) -> np.ndarray:
+        """Returns the ids of the pages at most ``hops`` links away from the
+        given pages, excluding them.
+
+        Args:
+            pages (str, int or Iterable): The titles or ids of the pages.
+            hops (int): The maximum number of links. Defaults to 1.
+            direction (str): Whether to follow the links "out" of the
+                pages, "in" to them, or "both". Defaults to "out".
+        Returns:
+            np.ndarray: The sorted ids of the pages.
+        """
+        if direction not in ("out", "in", "both"):
+            raise ValueError(f"Unknown direction {direction}")
+        start = np.unique(self._ids(pages))
+        visited = np.zeros(len(self.titles), dtype=bool)
+        visited[start] = True
+        frontier = start
+        for _ in range(hops):
+            if not len(frontier):
+                break
+            reached = []
+            if direction in ("out", "both"):
+                reached.append(_gather(self.indptr, self.targets, frontier))
+            if direction in ("in", "both"):
+                reached.append(
+                    _gather(self.in_indptr, self.in_sources, frontier)
+                )
+            reached = np.unique(np.concatenate(reached))
+            frontier = reached[~visited[reached]]
+            visited[frontier] = True
+        visited[start] = False
+        return np.flatnonzero(visited)
+
+    def top_linked(self, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the ids of the ``k`` pages with the most anchors linking
+        to them, along with their numbers of anchors."""
+        totals = np.bincount(
+            self.targets, weights=self.counts, minlength=len(self.titles)
+        ).astype(np.int64)
+        k = min(k, len(totals))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        top = np.argpartition(-totals, k - 1)[:k]
+        # Ties are broken by id, for reproducibility
+        top = top[np.lexsort((top, -totals[top]))]
+        return top, totals[top]
@@ -0,0 +1,200 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from minihack.atomic_file import atomic_write
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits a text into lowercase alphanumeric terms."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def term_counts(text: str) -> Dict[str, int]:
+    """Returns the number of occurrences of every term of a text."""
+    return dict(Counter(tokenize(text)))
+
+
+class WikiSearchIndexBuilder:
+    """Accumulates the term counts of pages into a ``WikiSearchIndex``.
+
+    Pages can be added as they are processed, e.g. with term counts computed
+    by ``term_counts`` in other processes. A page added again replaces the
+    previous one with the same title. Pages without terms are skipped.
+    """
+
+    def __init__(self):
+        self._titles: List[str] = []
+        self._lengths: List[int] = []
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+
+    def add(self, title: str, counts: Dict[str, int]) -> None:
+        """Adds a page, given the counts of its terms."""
+        if title in self._ids:
+            # The postings of the previous page are dropped by build
+            self._lengths[self._ids.pop(title)] = -1
+        if not counts:
+            return
+        page_id = len(self._titles)
+        self._ids[title] = page_id
+        self._titles.append(title)
+        self._lengths.append(sum(counts.values()))
+        for term, count in counts.items():
+            pages, tfs = self._postings.setdefault(term, ([], []))
+            pages.append(page_id)
+            tfs.append(count)
+
+    def build(self) -> "WikiSearchIndex":
+        lengths = np.array(self._lengths, dtype=np.int64)
+        alive = lengths >= 0
+        new_ids = np.cumsum(alive) - 1
+        titles = [t for t, a in zip(self._titles, alive) if a]
+
+        terms, indptr, pages, tfs = [], [0], [], []
+        for term in sorted(self._postings):
+            term_pages, term_tfs = map(np.array, self._postings[term])
+            keep = alive[term_pages]
+            if keep.any():
+                terms.append(term)
+                pages.append(new_ids[term_pages[keep]])
+                tfs.append(term_tfs[keep])
+                indptr.append(indptr[-1] + int(keep.sum()))
+        return WikiSearchIndex(
+            titles,
+            lengths[alive],
+            terms,
+            np.array(indptr, dtype=np.int64),
+            np.concatenate(pages) if pages else np.zeros(0, np.int32),
+            np.concatenate(tfs) if tfs else np.zeros(0, np.int32),
+        )
+
+
+class WikiSearchIndex:
+    """An inverted index over the texts of the pages of a wiki, ranking
+    pages for free-text queries with BM25.
+
+    The posting lists of all terms are stored in CSR form: the pages
+    containing term ``i`` are ``pages[indptr[i]:indptr[i + 1]]``, and the
+    number of occurrences of the term in them is in ``tfs``. A query only
+    touches the posting lists of its terms, whose scores are accumulated
+    with a single ``np.bincount``.
+
+    Args:
+        titles (List[str]): The titles of the indexed pages.
+        lengths (List[int]): The number of terms of every page.
+        terms (List[str]): The sorted terms.
+        indptr (np.ndarray): The ``(num_terms + 1,)`` offsets of the posting
+            lists.
+        pages (np.ndarray): The page ids of the postings.
+        tfs (np.ndarray): The term frequencies of the postings.
+    """
+
+    def __init__(
+        self,
+        titles: List[str],
+        lengths: Iterable[int],
+        terms: List[str],
+        indptr: np.ndarray,
+        pages: np.ndarray,
+        tfs: np.ndarray,
+    ):
+        self.titles = list(titles)
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self.terms = {term: i for i, term in enumerate(terms)}
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.pages = np.asarray(pages, dtype=np.int32)
+        self.tfs = np.asarray(tfs, dtype=np.int32)
+        num_pages = len(self.titles)
+        # The length normalisation of every page, as used by BM25
+        average_length = self.lengths.mean() if num_pages else 0.0
+        self._norms = BM25_K1 * (
+            1 - BM25_B + BM25_B * self.lengths / max(average_length, 1e-9)
+        )
+        df = np.diff(self.indptr)
+        self.idf = np.log(1 + (num_pages - df + 0.5) / (df + 0.5))
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[Tuple[str, str]]) -> "WikiSearchIndex":
+        """Builds the index of the given (title, text) pairs."""
+        builder = WikiSearchIndexBuilder()
+        for title, text in pages:
+            builder.add(title, term_counts(text))
+        return builder.build()
+
+    def save(self, path: str) -> None:
+        """Saves the index as a .npz file, which is atomically replaced."""
+        terms = sorted(self.terms, key=self.terms.get)
+        atomic_write(
+            path,
+            lambda f: np.savez(
+                f,
+                titles=np.array(self.titles, dtype=str),
+                lengths=self.lengths.astype(np.int64),
+                terms=np.array(terms, dtype=str),
+                indptr=self.indptr,
+                pages=self.pages,
+                tfs=self.tfs,
+            ),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "WikiSearchIndex":
+        """Loads an index saved with ``save``."""
+        with np.load(path) as data:
+            return cls(
+                data["titles"].tolist(),
+                data["lengths"],
+                data["terms"].tolist(),
+                data["indptr"],
+                data["pages"],
+                data["tfs"],
+            )
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def scores(self, query: str) -> np.ndarray:
+        """Returns the BM25 scores of all the pages for a query."""
+        term_ids = [self.terms[t] for t in tokenize(query) if t in self.terms]
+        if not term_ids:
+            return np.zeros(len(self.titles))
+        term_ids = np.array(term_ids, dtype=np.int64)
+        starts = self.indptr[term_ids]
+        lengths = self.indptr[term_ids + 1] - starts
+        offsets = np.arange(lengths.sum()) + np.repeat(
+            starts - (np.cumsum(lengths) - lengths), lengths
+        )
+        pages = self.pages[offsets]
+        tfs = self.tfs[offsets]
+        weights = (
+            np.repeat(self.idf[term_ids], lengths)
+            * tfs
+            * (BM25_K1 + 1)
+            / (tfs + self._norms[pages])
+        )
+        return np.bincount(pages, weights=weights, minlength=len(self.titles))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Returns the titles and scores of the ``k`` pages ranked highest
+        for a query, in decreasing order of score. Pages not containing any
+        term of the query are never returned."""
+        if k <= 0:
+            return []
+        scores = self.scores(query)
+        matches = np.flatnonzero(scores > 0)
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        # Ties are broken by id, for reproducibility
+        matches = matches[np.lexsort((matches, -scores[matches]))]
+        return [(self.titles[i], float(scores[i])) for i in matches]
@@ -0,0 +1,255 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+
+import json
+import os
+import sqlite3
+import zlib
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from minihack.atomic_file import AtomicFile
+
+DEFAULT_WIKI_CACHE_SIZE = 1024
+
+_SCHEMA = """
+CREATE TABLE pages (
+    id INTEGER PRIMARY KEY,
+    title TEXT UNIQUE NOT NULL,
+    text TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE aliases (
+    alias TEXT PRIMARY KEY,
+    page_id INTEGER NOT NULL REFERENCES pages (id)
+);
+"""
+
+
+def _encode(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value).encode("utf-8"))
+
+
+def _decode(data: bytes) -> Any:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def encode_page(value: Any) -> Tuple[str, bytes]:
+    """Returns the text and the encoded data of a page, as stored by
+    ``WikiStoreWriter``."""
+    text = value.get("text", "") if isinstance(value, dict) else ""
+    return text, _encode(value)
+
+
+def _canonical_key(wiki: Mapping, key: str, value: Any) -> str:
+    """Returns the key of the page a redirect points to, or the given key if
+    the entry is a page of its own."""
+    title = value.get("title") if isinstance(value, dict) else None
+    if title is not None and title != key and wiki.get(title) == value:
+        return title
+    return key
+
+
+class WikiStoreWriter:
+    """Writes the pages of a processed wiki into an indexed SQLite store, as
+    read by ``WikiStore``.
+
+    Every page is stored once, as compressed JSON along with its text, and
+    the redirects to it are stored as aliases. Pages can be added as they
+    are processed, without holding the whole wiki in memory. The store is
+    written to a temporary file which is atomically renamed by ``close``,
+    so concurrent readers never see a partial store.
+
+    Args:
+        path (str):
+            The path of the store to write.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = AtomicFile(path, suffix=".db")
+        self._connection = sqlite3.connect(self._file.tmp_path)
+        self._connection.executescript(_SCHEMA)
+        self._aliases: Dict[str, str] = {}
+
+    def add_page(self, key: str, value: Any) -> None:
+        """Adds a page, replacing any page with the same name."""
+        self.add_encoded_page(key, *encode_page(value))
+
+    def add_encoded_page(self, key: str, text: str, data: bytes) -> None:
+        """Adds a page encoded by ``encode_page``, e.g. in another process."""
+        self._connection.execute(
+            "INSERT OR REPLACE INTO pages (title, text, data) "
+            "VALUES (?, ?, ?)",
+            (key, text, data),
+        )
+
+    def add_alias(self, alias: str, key: str) -> None:
+        """Makes ``alias`` a name of the page ``key``, which takes precedence
+        over any page named ``alias``. Aliases of missing pages are
+        ignored."""
+        self._aliases[alias] = key
+
+    def close(self) -> None:
+        """Writes the aliases and moves the store to its path."""
+        try:
+            self._connection.execute(
+                "CREATE TEMPORARY TABLE redirects (alias TEXT, title TEXT)"
+            )
+            self._connection.executemany(
+                "INSERT INTO redirects VALUES (?, ?)", self._aliases.items()
+            )
+            self._connection.execute(
+                "INSERT INTO aliases SELECT r.alias, p.id FROM redirects r "
+                "JOIN pages p ON p.title = r.title"
+            )
+            self._connection.commit()
+            self._connection.close()
+            self._file.commit()
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self) -> None:
+        """Discards the store."""
+        self._connection.close()
+        self._file.discard()
+
+    def __enter__(self) -> "WikiStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def build_wiki_store(wiki: Mapping, path: str) -> None:
+    """Writes a processed wiki, as returned by ``process_json``, into an
+    indexed SQLite store.
+
+    Args:
+        wiki (Mapping):
+            The processed wiki, mapping page names to page data.
+        path (str):
+            The path of the store to write.
+    """
+    with WikiStoreWriter(path) as writer:
+        for key, value in wiki.items():
+            canonical = _canonical_key(wiki, key, value)
+            if canonical != key:
+                writer.add_alias(key, canonical)
+            else:
+                writer.add_page(key, value)
+
+
+class WikiStore(Mapping):
+    """A read-only mapping from the page names of a processed wiki to their
+    data, backed by a store written by ``build_wiki_store``.
+
+    Pages are read from disk on demand, so opening a store is instant and
+    its memory use does not depend on the size of the wiki. Recently used
+    pages are kept in a bounded LRU cache. The texts of the pages can be
+    read without decoding the rest of their data with ``get_text``.
+
+    The store can be shared by any number of processes. Each process opens
+    its own read-only connection, including processes forked after the
+    store was opened.
+
+    Args:
+        path (str):
+            The path of the store.
+        cache_size (int):
+            The maximum number of pages, and of page texts, kept in memory.
+            Defaults to ``DEFAULT_WIKI_CACHE_SIZE``.
+    """
+
+    def __init__(self, path: str, cache_size: int = DEFAULT_WIKI_CACHE_SIZE):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No wiki store at {path}")
+        self.path = os.path.abspath(path)
+        self.cache_size = cache_size
+        self._connection_pid: Optional[int] = None
+        self._connection: Optional[sqlite3.Connection] = None
+        self._load_page = lru_cache(maxsize=cache_size)(self._load_page)
+        self._load_text = lru_cache(maxsize=cache_size)(self._load_text)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection_pid != os.getpid():
+            self._connection = sqlite3.connect(
+                f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+            )
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _query(self, column: str, key: str):
+        # Aliases take precedence, as redirects replaced pages in the wiki
+        row = self.connection.execute(
+            f"SELECT p.{column} FROM aliases a JOIN pages p "
+            "ON p.id = a.page_id WHERE a.alias = ? UNION ALL "
+            f"SELECT {column} FROM pages WHERE title = ? LIMIT 1",
+            (key, key),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def _load_page(self, key: str) -> Any:
+        data = self._query("data", key)
+        return None if data is None else _decode(data)
+
+    def _load_text(self, key: str) -> Optional[str]:
+        return self._query("text", key)
+
+    def get_text(self, key: str, default: str = "") -> str:
+        """Returns the text of a page, or ``default`` if there is no such
+        page."""
+        text = self._load_text(key)
+        return default if text is None else text
+
+    def texts(self) -> Iterator[Tuple[str, str]]:
+        """Iterates over the titles and texts of the pages, excluding the
+        aliases, in the order they were added."""
+        cursor = self.connection.execute(
+            "SELECT title, text FROM pages ORDER BY id"
+        )
+        return iter(cursor)
+
+    def __getitem__(self, key: str) -> Any:
+        page = self._load_page(key)
+        if page is None:
+            raise KeyError(key)
+        return page
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._query("id", key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        # Pages are iterated in the order they were added, then aliases
+        rows = self.connection.execute(
+            "SELECT title FROM pages ORDER BY id"
+        ).fetchall()
+        rows += self.connection.execute(
+            "SELECT alias FROM aliases WHERE alias NOT IN "
+            "(SELECT title FROM pages) ORDER BY rowid"
+        ).fetchall()
+        return (row[0] for row in rows)
+
+    def __len__(self) -> int:
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM "
+            "(SELECT title FROM pages UNION SELECT alias FROM aliases)"
+        ).fetchone()[0]
+
+    def __getstate__(self):
+        return {"path": self.path, "cache_size": self.cache_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["cache_size"])
+
+    def close(self) -> None:
+        """Closes the connection of the current process."""
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
+        self._connection_pid = None
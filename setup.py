@@ -33,6 +33,7 @@ entry_points = {
         "mh-play = minihack.scripts.play:main",
         "mh-guiplay = minihack.scripts.play_gui:main",
         "mh-envs = minihack.scripts.env_list:main",
+        "mh-bake-levels = minihack.scripts.bake_levels:main",
     ]
 }
 